@@ -0,0 +1,57 @@
+"""Benchmark the import time of the pyhomekit modules.
+
+Each module is imported in a fresh interpreter. Exits with an error if the
+median import time of a module exceeds the budget, or if it imports one of
+the heavy dependencies, which must only be imported on first use. Run from
+the repository root:
+
+    python -m benchmarks.bench_imports
+"""
+
+import statistics
+import subprocess
+import sys
+
+from typing import List, Set, Tuple  # NOQA pylint: disable=W0611
+
+modules = ('pyhomekit.pairing', 'pyhomekit.ble', 'pyhomekit.commissioning')
+heavy_modules = ('asyncio', 'bluepy', 'cryptography', 'ed25519', 'gmpy2',
+                 'libnacl', 'tenacity')
+budget_ms = 250
+
+_code = """
+import sys, time
+start = time.perf_counter()
+import {}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(' '.join(sys.modules))
+"""
+
+
+def measure(module: str) -> Tuple[float, Set[str]]:
+    """Import time in s of the module, and the top level packages imported."""
+    output = subprocess.check_output(
+        [sys.executable, '-c', _code.format(module)]).decode()
+    elapsed, imported = output.splitlines()
+    return float(elapsed), {name.split('.')[0] for name in imported.split()}
+
+
+def main(number: int=5) -> None:
+    failed = False
+    for module in modules:
+        times = []  # type: List[float]
+        for _ in range(number):
+            elapsed, imported = measure(module)
+            times.append(elapsed)
+        median = statistics.median(times) * 1000
+        heavy = sorted(imported.intersection(heavy_modules))
+        print("{:<25} {:8.1f} ms  heavy imports: {}".format(
+            module, median, ', '.join(heavy) or 'none'))
+        failed = failed or heavy or median > budget_ms
+    if failed:
+        sys.exit("Import budget of {} ms exceeded.".format(budget_ms))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Benchmark each step of pair setup, and the primitives it uses.
+
+The controller side of every step M1-M6 of SRPPairSetup is timed against
+the in-memory accessory of tests/accessory.py, whose own work is not
+counted. Prints ops/sec and latency percentiles per step, and for the
+primitives with each available crypto provider. Run from the repository
+root:
+
+    python -m benchmarks.bench_pairing
+"""
+
+import tempfile
+import time
+
+from typing import Any, Callable, Dict, List, Tuple  # NOQA pylint: disable=W0611
+
+from pyhomekit import crypto, pairing
+from pyhomekit.keystore import Keystore
+from pyhomekit.pairing import EphemeralKeyPool, SRPPairSetup
+from tests.accessory import Accessory, exchange
+
+steps = ('M1', 'M2', 'M3', 'M4', 'M5', 'M6')
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest rank percentile of sorted values."""
+    index = max(0, int(round(q / 100 * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+def report(name: str, latencies: List[float]) -> None:
+    latencies = sorted(latencies)
+    mean = sum(latencies) / len(latencies)
+    print("{:<34} {:>10.1f} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+        name, 1 / mean, *(percentile(latencies, q) * 1000
+                          for q in (50, 90, 99))))
+
+
+def timed(func: Callable[[], Any], number: int) -> List[float]:
+    latencies = []  # type: List[float]
+    for _ in range(number):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_pair_setup(number: int, ephemeral_pool: EphemeralKeyPool=None
+                     ) -> Dict[str, List[float]]:
+    """Latencies of the controller side of each pair setup step."""
+    latencies = {step: [] for step in steps}  # type: Dict[str, List[float]]
+    with tempfile.TemporaryDirectory() as storage_folder:
+        keystore = Keystore(storage_folder)
+        for _ in range(number):
+            accessory = Accessory(setup_code='111-22-333')
+            session = SRPPairSetup(
+                b'AA:BB:CC:DD:EE:FF', storage_folder, '111-22-333',
+                keystore=keystore, ephemeral_pool=ephemeral_pool)
+
+            start = time.perf_counter()
+            request = session.m1_generate_srp_start_request()
+            latencies['M1'].append(time.perf_counter() - start)
+            response = exchange(accessory.pair_setup(exchange(request)))
+
+            start = time.perf_counter()
+            session.m2_receive_srp_start_response(response)
+            latencies['M2'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            request = session.m3_generate_srp_verify_request()
+            latencies['M3'].append(time.perf_counter() - start)
+            response = exchange(accessory.pair_setup(exchange(request)))
+
+            start = time.perf_counter()
+            session.m4_receive_srp_verify_response(response)
+            latencies['M4'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            request = session.m5_generate_exchange_request()
+            latencies['M5'].append(time.perf_counter() - start)
+            response = exchange(accessory.pair_setup(exchange(request)))
+
+            start = time.perf_counter()
+            session.m6_receive_exchange_response(response)
+            latencies['M6'].append(time.perf_counter() - start)
+    return latencies
+
+
+def main(number: int=30, primitive_number: int=2000) -> None:
+    latencies = bench_pair_setup(number)
+    print("{:<34} {:>10} {:>9} {:>9} {:>9}".format(
+        "step", "ops/s", "p50 ms", "p90 ms", "p99 ms"))
+    for step in steps:
+        report("pair setup " + step, latencies[step])
+    ephemeral_pool = EphemeralKeyPool()
+    try:
+        report("pair setup M3, key pool",
+               bench_pair_setup(number, ephemeral_pool)['M3'])
+    finally:
+        ephemeral_pool.close()
+
+    key = bytes(32)
+    message = bytes(64)
+    nonce = pairing.pairing_nonce(b'PS-Msg05')
+    for provider in crypto.available_providers():
+        public_key = provider.public_key(key)
+        signature = provider.sign(key, message)
+        ciphertext = provider.encrypt(key, nonce, message)
+        primitives = [
+            ('HKDF-SHA-512',
+             lambda: provider.hkdf_sha512(key, b'salt', b'info', 32)),
+            ('ChaCha20-Poly1305 64B',
+             lambda: provider.encrypt(key, nonce, message)),
+            ('decrypt 64B', lambda: provider.decrypt(key, nonce, ciphertext)),
+            ('Ed25519 sign', lambda: provider.sign(key, message)),
+            ('Ed25519 verify',
+             lambda: provider.verify(public_key, signature, message)),
+        ]  # type: List[Tuple[str, Callable[[], Any]]]
+        for name, func in primitives:
+            report(provider.name + " " + name,
+                   timed(func, primitive_number))
+    print("default provider:", crypto.default_provider().name)
+    print("fastest provider:", crypto.select_provider().name)
+    x25519 = pairing.x25519.X25519PrivateKey
+    report('X25519 key agreement',
+           timed(lambda: x25519.generate().exchange(
+               x25519.generate().public_key()), primitive_number))
+
+
+if __name__ == '__main__':
+    main()
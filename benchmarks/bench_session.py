@@ -0,0 +1,47 @@
+"""Benchmark the encryption of HAP PDUs in a secure session, per PDU size.
+
+Compares the one-shot libnacl functions, building a new nonce for every
+PDU, with the preallocated buffers of SecureSession. Run from the
+repository root:
+
+    python -m benchmarks.bench_session
+"""
+
+import timeit
+
+from struct import pack
+
+from libnacl import crypto_aead_chacha20poly1305_ietf_encrypt
+
+from pyhomekit.session import SecureSession, tag_size
+
+pdu_sizes = (8, 32, 128, 256, 496)
+
+
+def main(number: int=20000) -> None:
+    key = bytes(range(32))
+    session = SecureSession(key, key)
+    counter = [0]
+
+    def one_shot(pdu: bytes) -> bytes:
+        nonce = b'\x00' * 4 + pack('<Q', counter[0])
+        counter[0] += 1
+        return crypto_aead_chacha20poly1305_ietf_encrypt(pdu, b'', nonce, key)
+
+    print("{:>6} {:>14} {:>14} {:>14}".format(
+        "bytes", "libnacl us", "encrypt us", "in place us"))
+    for size in pdu_sizes:
+        pdu = bytes(size)
+        buffer = bytearray(size + tag_size)
+        results = [
+            timeit.timeit(lambda: one_shot(pdu), number=number),
+            timeit.timeit(lambda: session.encrypt(pdu), number=number),
+            timeit.timeit(
+                lambda: session.encrypt_in_place(buffer, size), number=number),
+        ]
+        print("{:>6} {:>14.2f} {:>14.2f} {:>14.2f}".format(
+            size, *(elapsed / number * 1e6 for elapsed in results)))
+
+
+if __name__ == '__main__':
+    main()
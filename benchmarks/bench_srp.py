@@ -0,0 +1,44 @@
+"""Benchmark the SRP modular exponentiations of pair setup M3.
+
+Uses the SRP test vectors of tests/test_pairing.py. Run from the
+repository root:
+
+    python -m benchmarks.bench_srp
+"""
+
+import timeit
+
+from pyhomekit import bigint
+from pyhomekit.pairing import H, N, g
+from tests.test_pairing import (a, b, s, u, v, A, B, S, test_username,
+                                test_password)
+
+
+def main(number: int=20) -> None:
+    k = H(N, g, pad=True)
+    x = H(s, H(test_username, test_password, sep=b":"))
+    g_pow = bigint.FixedBasePow(g, N)
+
+    setup = timeit.timeit(lambda: g_pow._build_table(), number=1)
+    assert g_pow(a) == A
+    assert (k * v + g_pow(b)) % N == B
+    assert bigint.powmod((B - k * g_pow(x)) % N, a + u * x, N) == S
+
+    cases = [
+        ('g^a pow()', lambda: pow(g, a, N)),
+        ('g^a fixed base', lambda: g_pow(a)),
+        ('g^x pow()', lambda: pow(g, x, N)),
+        ('g^x fixed base', lambda: g_pow(x)),
+        ('S pow()', lambda: pow(B - k * pow(g, x, N), a + u * x, N)),
+        ('S powmod', lambda: bigint.powmod((B - k * g_pow(x)) % N, a + u * x, N)),
+    ]
+
+    print("Backend: {}, table setup: {:.1f} ms".format(
+        bigint.backend(), setup * 1000))
+    for name, func in cases:
+        elapsed = timeit.timeit(func, number=number) / number
+        print("{:<20} {:8.3f} ms".format(name, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
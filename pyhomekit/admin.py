@@ -0,0 +1,348 @@
+"""Administration of the pairings of a fleet of accessories.
+
+An admin controller lists, adds and removes the pairings of many
+accessories concurrently, e.g. to rotate the admin controller of a
+building. Each accessory is pair verified on an I/O thread, then the
+operations run over its secure session. A journal records each operation
+done, so that an interrupted batch resumes where it stopped, at the first
+operation not recorded. An operation interrupted before being recorded is
+run again: adding and removing pairings are idempotent. The exception is
+removing the pairing of this controller, after which the accessory rejects
+its pair verify: that rejection means the removal was done.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Any, Callable, Dict, List, Sequence, Set)  # NOQA pylint: disable=W0611
+from typing import (Tuple, Union, Optional, Iterator)  # NOQA pylint: disable=W0611
+from typing import NamedTuple
+
+from . import constants
+from .keystore import atomic_write
+from .pairing import PairingEntry, PairVerifyError, SessionCache
+
+logger = logging.getLogger(__name__)
+
+AdminResult = NamedTuple('AdminResult', [
+    ('address', str),
+    ('pairings', Optional[List[PairingEntry]]),
+    ('error', Optional[Exception]),
+    ('elapsed', float),
+    ('skipped', bool),
+])
+
+# An operation takes a pair verified HapAccessory, and returns the listed
+# pairings if any
+Operation = Callable[[Any], Optional[List[PairingEntry]]]
+
+
+def list_pairings() -> Operation:
+    """Operation listing the pairings of an accessory."""
+    return lambda accessory: accessory.list_pairings()
+
+
+def add_pairing(pairing_id: bytes,
+                public_key: bytes,
+                permissions: int=constants.PairingPermissions.Admin
+                ) -> Operation:
+    """Operation pairing another controller."""
+    return lambda accessory: accessory.add_pairing(
+        pairing_id, public_key, permissions)
+
+
+def remove_pairing(pairing_id: bytes) -> Operation:
+    """Operation removing the pairing of a controller."""
+    return lambda accessory: accessory.remove_pairing(pairing_id)
+
+
+class AdminReport:
+    """Results of a batch of pairing operations.
+
+    Parameters
+    ----------
+    results
+        Result of each accessory, in the order they were given.
+
+    elapsed
+        Wall clock duration of the batch in s.
+    """
+
+    def __init__(self, results: List[AdminResult], elapsed: float) -> None:
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self) -> List[AdminResult]:
+        """Results of the accessories done in this run."""
+        return [
+            result for result in self.results
+            if result.error is None and not result.skipped
+        ]
+
+    @property
+    def failed(self) -> List[AdminResult]:
+        """Results of the accessories whose operations raised an error."""
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def skipped(self) -> List[AdminResult]:
+        """Results of the accessories already done in a previous run."""
+        return [result for result in self.results if result.skipped]
+
+    @property
+    def throughput(self) -> float:
+        """Accessories done per minute."""
+        if not self.elapsed:
+            return 0.0
+        return len(self.succeeded) * 60 / self.elapsed
+
+    def pairings(self) -> Dict[str, List[PairingEntry]]:
+        """Listed pairings, by accessory address."""
+        return {
+            result.address: result.pairings
+            for result in self.results if result.pairings is not None
+        }
+
+    def __str__(self) -> str:
+        return ("{} accessories, {} failed, {} skipped, {:.3f}s, "
+                "{:.1f} accessories/min".format(
+                    len(self.results), len(self.failed), len(self.skipped),
+                    self.elapsed, self.throughput))
+
+
+class BatchJournal:
+    """Number of operations of a batch done on each accessory.
+
+    Stored in a file, rewritten atomically after each operation.
+
+    Parameters
+    ----------
+    path
+        Path of the journal file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'rb') as journal_file:
+                self._done = json.loads(
+                    journal_file.read().decode('utf-8'))  # type: Dict[str, int]
+        except FileNotFoundError:
+            self._done = {}
+
+    def operations_done(self, address: str) -> int:
+        """Number of operations done on the accessory, in order."""
+        return self._done.get(address, 0)
+
+    def record(self, address: str, operations_done: int) -> None:
+        with self._lock:
+            self._done[address] = operations_done
+            atomic_write(self.path, json.dumps(
+                self._done, sort_keys=True).encode('utf-8'))
+
+    def clear(self) -> None:
+        """Forget the batch, deleting the journal."""
+        with self._lock:
+            self._done = {}
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+
+class PairingAdmin:
+    """Runs pairing operations on many accessories concurrently.
+
+    Parameters
+    ----------
+    pairing_id
+        Pairing identifier of this admin controller.
+
+    storage_folder
+        Folder where the pairing keys are stored.
+
+    io_workers
+        Number of accessories handled at the same time.
+
+    session_cache
+        Cache of resumable sessions, to skip the full pair verify of the
+        accessories verified recently.
+
+    progress
+        Called from the I/O threads with the address of an accessory and its
+        stage: "connect", "pair_verify", "operations", then "done",
+        "failed" or "skipped".
+    """
+
+    def __init__(self,
+                 pairing_id: bytes,
+                 storage_folder: str,
+                 io_workers: int=8,
+                 session_cache: SessionCache=None,
+                 progress: Callable[[str, str], None]=None) -> None:
+        self.pairing_id = pairing_id
+        self.storage_folder = storage_folder
+        self.io_workers = io_workers
+        self.session_cache = session_cache
+        self.progress = progress
+        self._progress_lock = threading.Lock()
+
+    def journal(self, name: str) -> BatchJournal:
+        """Journal of the batch with this name, in the storage folder."""
+        return BatchJournal(
+            os.path.join(self.storage_folder, name + '.journal'))
+
+    def _report(self, address: str, stage: str) -> None:
+        logger.debug("Pairing admin %s: %s", address, stage)
+        if self.progress is not None:
+            with self._progress_lock:
+                self.progress(address, stage)
+
+    def _pair_verify(self, accessory: Any, own_pairing_removed: bool) -> bool:
+        """Pair verify the accessory.
+
+        Returns False if the accessory rejects this controller, and its
+        pairing may already have been removed by an interrupted run."""
+        try:
+            accessory.pair_verify(self.pairing_id, self.storage_folder,
+                                  self.session_cache)
+        except PairVerifyError as e:
+            if not own_pairing_removed or e.error_code != (
+                    constants.PairingKTLVErrorCodes.kTLVError_Authenticatio):
+                raise
+            logger.debug("Pairing with %s already removed.",
+                         accessory.address)
+            return False
+        return True
+
+    def _run_one(self, accessory: Any, operations: Sequence[Operation],
+                 journal: Optional[BatchJournal],
+                 removes_own_pairing: bool) -> AdminResult:
+        start = time.perf_counter()
+        done = 0
+        if journal is not None:
+            done = journal.operations_done(accessory.address)
+        if done == len(operations):
+            self._report(accessory.address, 'skipped')
+            return AdminResult(accessory.address, None, None, 0.0, True)
+        pairings = None  # type: Optional[List[PairingEntry]]
+        try:
+            self._report(accessory.address, 'connect')
+            accessory.connect()
+            try:
+                self._report(accessory.address, 'pair_verify')
+                if not self._pair_verify(
+                        accessory, removes_own_pairing and
+                        done == len(operations) - 1):
+                    # Only the removal of our own pairing was left
+                    done = len(operations)
+                    if journal is not None:
+                        journal.record(accessory.address, done)
+                self._report(accessory.address, 'operations')
+                for operation in operations[done:]:
+                    listed = operation(accessory)
+                    if listed is not None:
+                        pairings = listed
+                    done += 1
+                    if journal is not None:
+                        journal.record(accessory.address, done)
+            finally:
+                accessory.disconnect()
+        except Exception as e:  # pylint: disable=W0703
+            logger.debug(
+                "Error while administering %s", accessory.address,
+                exc_info=True)
+            self._report(accessory.address, 'failed')
+            return AdminResult(accessory.address, pairings, e,
+                               time.perf_counter() - start, False)
+        self._report(accessory.address, 'done')
+        return AdminResult(accessory.address, pairings, None,
+                           time.perf_counter() - start, False)
+
+    def run(self,
+            accessories: Sequence[Any],
+            operations: Sequence[Operation],
+            batch: str=None,
+            removes_own_pairing: bool=False) -> AdminReport:
+        """Run the operations, in order, on each accessory.
+
+        Parameters
+        ----------
+        accessories
+            The HapAccessory to administer, paired with this controller as
+            admin.
+
+        operations
+            Operations to run on each accessory, e.g. add_pairing(...).
+
+        batch
+            Name of the batch. The operations done are recorded in its
+            journal, and skipped if the batch is run again.
+
+        removes_own_pairing
+            Whether the last operation removes the pairing of this
+            controller. When the batch is run again, a rejected pair verify
+            then means this operation was done.
+        """
+        start = time.perf_counter()
+        journal = self.journal(batch) if batch is not None else None
+        with ThreadPoolExecutor(max_workers=self.io_workers) as io_pool:
+            futures = [
+                io_pool.submit(self._run_one, accessory, operations, journal,
+                               removes_own_pairing)
+                for accessory in accessories
+            ]
+            results = [future.result() for future in futures]
+        report = AdminReport(results, time.perf_counter() - start)
+        logger.debug("Pairing admin batch done: %s", report)
+        return report
+
+    def list_pairings(self, accessories: Sequence[Any]) -> AdminReport:
+        """List the pairings of each accessory, see AdminReport.pairings."""
+        return self.run(accessories, [list_pairings()])
+
+    def add_pairing(self,
+                    accessories: Sequence[Any],
+                    pairing_id: bytes,
+                    public_key: bytes,
+                    permissions: int=constants.PairingPermissions.Admin,
+                    batch: str=None) -> AdminReport:
+        """Pair another controller with each accessory."""
+        return self.run(accessories,
+                        [add_pairing(pairing_id, public_key, permissions)],
+                        batch)
+
+    def remove_pairing(self,
+                       accessories: Sequence[Any],
+                       pairing_id: bytes,
+                       batch: str=None) -> AdminReport:
+        """Remove the pairing of a controller from each accessory."""
+        return self.run(accessories, [remove_pairing(pairing_id)], batch)
+
+    def rotate_admin(self,
+                     accessories: Sequence[Any],
+                     pairing_id: bytes,
+                     public_key: bytes,
+                     batch: str=None) -> AdminReport:
+        """Hand the administration of each accessory to another controller.
+
+        The new admin is added, then the pairing of this controller is
+        removed: an accessory is never left without an admin.
+        """
+        return self.run(
+            accessories, [
+                add_pairing(pairing_id, public_key,
+                            constants.PairingPermissions.Admin),
+                remove_pairing(self.pairing_id)
+            ],
+            batch,
+            removes_own_pairing=True)
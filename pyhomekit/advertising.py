@@ -0,0 +1,220 @@
+"""Parsing of HAP-BLE advertisements and registry of advertising accessories."""
+
+import logging
+import threading
+import time
+
+from struct import unpack
+from typing import (Any, Callable, Dict, List)  # NOQA pylint: disable=W0611
+from typing import (Tuple, Union, Optional, Iterator)  # NOQA pylint: disable=W0611
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+apple_company_id = 0x004C
+hap_advertisement_type = 0x06
+manufacturer_data_length = 17
+encrypted_notification_type = 0x11
+encrypted_notification_length = 26
+
+advertising_interval_code_to_name = {
+    1: '10-25 ms',
+    2: '26-100 ms',
+    3: '101-300 ms',
+    4: '301-500 ms',
+    5: '501-1250 ms',
+    6: '1251-2500 ms',
+    7: '> 2500 ms'
+}
+
+HapAdvertisement = NamedTuple('HapAdvertisement', [
+    ('device_id', str),
+    ('status_flags', int),
+    ('category', int),
+    ('gsn', int),
+    ('config_number', int),
+    ('compatible_version', int),
+    ('advertising_interval', int),
+])
+
+EncryptedNotification = NamedTuple('EncryptedNotification', [
+    ('advertising_id', bytes),
+    ('payload', bytes),
+])
+
+
+def to_device_id(b: bytes) -> str:
+    """Format a 48-bit identifier as XX:XX:XX:XX:XX:XX."""
+    return ':'.join('{:02X}'.format(byte) for byte in b)
+
+
+def parse_manufacturer_data(data: bytes) -> Optional[HapAdvertisement]:
+    """Parse the manufacturer specific data of a HAP-BLE advertisement.
+
+    The data starts with the company identifier. Returns None if the data
+    is not a HAP advertisement.
+    """
+    if len(data) < manufacturer_data_length:
+        return None
+    company_id, type_, ail, status_flags = unpack('<HBBB', data[:5])
+    if company_id != apple_company_id or type_ != hap_advertisement_type:
+        return None
+
+    category, gsn, config_number, compatible_version = unpack(
+        '<HHBB', data[11:17])
+
+    return HapAdvertisement(
+        device_id=to_device_id(data[5:11]),
+        status_flags=status_flags,
+        category=category,
+        gsn=gsn,
+        config_number=config_number,
+        compatible_version=compatible_version,
+        advertising_interval=ail >> 5)
+
+
+def parse_encrypted_notification(data: bytes
+                                 ) -> Optional[EncryptedNotification]:
+    """Parse the manufacturer specific data of an encrypted notification.
+
+    The payload holds the encrypted GSN, characteristic instance ID and
+    value, followed by the truncated 4 byte authentication tag. Returns None
+    if the data is not an encrypted notification advertisement.
+    """
+    if len(data) < encrypted_notification_length:
+        return None
+    company_id, type_ = unpack('<HB', data[:3])
+    if company_id != apple_company_id or type_ != encrypted_notification_type:
+        return None
+    return EncryptedNotification(
+        advertising_id=data[4:10], payload=data[10:26])
+
+
+def next_gsn(gsn: int) -> int:
+    """Return the GSN following gsn, wrapping from 65535 to 1."""
+    return gsn % 65535 + 1
+
+
+def gsn_incremented(old: int, new: int) -> bool:
+    """Whether the Global State Number moved forward from old to new.
+
+    The GSN has a range of 1-65535 and wraps to 1. Values up to half of the
+    range behind are treated as stale advertisements, not as increments.
+    """
+    return 0 < (new - old) % 65535 < 32768
+
+
+class AdvertisedAccessory:
+    """Latest known state of an advertising accessory.
+
+    Parameters
+    ----------
+    address
+        MAC address of the accessory.
+
+    advertisement
+        The last advertisement received.
+    """
+
+    def __init__(self, address: str, advertisement: HapAdvertisement) -> None:
+        self.address = address
+        self.advertisement = advertisement
+        self.last_seen = time.monotonic()
+        self.dirty = False
+        self.config_changed = False
+
+    @property
+    def device_id(self) -> str:
+        return self.advertisement.device_id
+
+    @property
+    def paired(self) -> bool:
+        """Whether the accessory has been paired with a controller."""
+        return not self.advertisement.status_flags & 0x01
+
+    def __str__(self) -> str:
+        return "{} ({}) GSN: {}, CN: {}, dirty: {}".format(
+            self.device_id, self.address, self.advertisement.gsn,
+            self.advertisement.config_number, self.dirty)
+
+
+class AccessoryRegistry:
+    """Registry of the accessories seen advertising, keyed by device ID.
+
+    An accessory is marked dirty when its GSN increments, meaning one of its
+    characteristics supporting disconnected events changed. Pollers only need
+    to connect to dirty accessories, and mark them clean once read.
+    """
+
+    def __init__(self) -> None:
+        self._accessories = {}  # type: Dict[str, AdvertisedAccessory]
+        self._lock = threading.Lock()
+
+    def update(self, address: str, advertisement: HapAdvertisement) -> bool:
+        """Record an advertisement. Returns True if the accessory became dirty."""
+        with self._lock:
+            accessory = self._accessories.get(advertisement.device_id)
+            if accessory is None:
+                logger.debug("New accessory %s advertising at %s.",
+                             advertisement.device_id, address)
+                accessory = AdvertisedAccessory(address, advertisement)
+                self._accessories[advertisement.device_id] = accessory
+                return False
+
+            previous = accessory.advertisement
+            accessory.address = address
+            accessory.last_seen = time.monotonic()
+            # A firmware update resets the GSN to 1 and increments the CN
+            config_changed = (
+                advertisement.config_number != previous.config_number)
+            changed = config_changed or gsn_incremented(previous.gsn,
+                                                        advertisement.gsn)
+            if changed or previous.gsn == advertisement.gsn:
+                accessory.advertisement = advertisement
+            if config_changed:
+                logger.debug("Configuration of %s changed.",
+                             advertisement.device_id)
+                accessory.config_changed = True
+            if changed:
+                logger.debug("GSN of %s incremented to %s.",
+                             advertisement.device_id, advertisement.gsn)
+                accessory.dirty = True
+            return changed
+
+    def acknowledge_gsn(self, device_id: str, gsn: int) -> None:
+        """Record a GSN whose state change is already known.
+
+        Used for changes learned from broadcast notifications, so that the
+        next advertisement with this GSN does not mark the accessory dirty.
+        """
+        with self._lock:
+            accessory = self._accessories[device_id]
+            if gsn_incremented(accessory.advertisement.gsn, gsn):
+                accessory.advertisement = accessory.advertisement._replace(
+                    gsn=gsn)
+
+    def get(self, device_id: str) -> Optional[AdvertisedAccessory]:
+        """Return the accessory with this device ID, if it has been seen."""
+        return self._accessories.get(device_id)
+
+    def dirty(self) -> List[AdvertisedAccessory]:
+        """Return the accessories whose state changed since marked clean."""
+        with self._lock:
+            return [
+                accessory for accessory in self._accessories.values()
+                if accessory.dirty
+            ]
+
+    def mark_clean(self, device_id: str) -> None:
+        """Mark the accessory as up to date with its advertised state."""
+        with self._lock:
+            accessory = self._accessories[device_id]
+            accessory.dirty = False
+            accessory.config_changed = False
+
+    def __iter__(self) -> Iterator[AdvertisedAccessory]:
+        with self._lock:
+            return iter(list(self._accessories.values()))
+
+    def __len__(self) -> int:
+        return len(self._accessories)
@@ -0,0 +1,123 @@
+"""Big integer arithmetic for the SRP computations.
+
+gmpy2 is used when it is installed, otherwise plain Python ints. It is
+imported on first use. All the functions take and return Python ints.
+"""
+
+import importlib
+import logging
+import threading
+
+from functools import lru_cache
+from typing import Any, List  # NOQA pylint: disable=W0611
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def gmpy2_module() -> Any:
+    """Return the gmpy2 module, imported on first use, or None if it is not
+    installed."""
+    try:
+        return importlib.import_module('gmpy2')
+    except ImportError:
+        return None
+
+
+def backend() -> str:
+    """Name of the integer backend: gmpy2 or python."""
+    return 'python' if gmpy2_module() is None else 'gmpy2'
+
+
+def to_backend(value: int) -> Any:
+    """Convert the int to the integer type of the backend."""
+    gmpy2 = gmpy2_module()
+    if gmpy2 is None:
+        return value
+    return gmpy2.mpz(value)
+
+
+def powmod(base: int, exponent: int, modulus: int) -> int:
+    """Modular exponentiation: base ** exponent % modulus."""
+    gmpy2 = gmpy2_module()
+    if gmpy2 is None:
+        return pow(base, exponent, modulus)
+    return int(gmpy2.powmod(base, exponent, modulus))
+
+
+class FixedBasePow:
+    """Modular exponentiation of a fixed base, using precomputed tables.
+
+    The exponent is split in windows of `window` bits. Row i of the table
+    holds base ** (d * 2 ** (window * i)) for every window value d, so an
+    exponentiation is one multiplication per window, without squarings.
+    The tables are built on first use. Exponents longer than exponent_bits
+    fall back to powmod.
+
+    Parameters
+    ----------
+    base
+        The fixed base.
+
+    modulus
+        The fixed modulus.
+
+    exponent_bits
+        Maximum size of the exponents covered by the tables.
+
+    window
+        Window size in bits. Larger windows use exponentially more memory.
+    """
+
+    def __init__(self,
+                 base: int,
+                 modulus: int,
+                 exponent_bits: int=512,
+                 window: int=5) -> None:
+        self.base = base
+        self.modulus = modulus
+        self.exponent_bits = exponent_bits
+        self.window = window
+        self._table = []  # type: List[List[Any]]
+        self._modulus = None  # type: Any
+        self._lock = threading.Lock()
+
+    def _build_table(self) -> None:
+        """Precompute the windowed table."""
+        logger.debug("Building fixed base table for %s bit exponents.",
+                     self.exponent_bits)
+        modulus = self._modulus = to_backend(self.modulus)
+        row_base = to_backend(self.base)
+        table = []
+        for _ in range(-(-self.exponent_bits // self.window)):
+            row = [to_backend(1)]
+            for _ in range((1 << self.window) - 1):
+                row.append(row[-1] * row_base % modulus)
+            table.append(row)
+            row_base = row[-1] * row_base % modulus
+        self._table = table
+
+    def warm_up(self) -> None:
+        """Build the tables now, e.g. when a worker process starts."""
+        if not self._table:
+            with self._lock:
+                if not self._table:
+                    self._build_table()
+
+    def __call__(self, exponent: int) -> int:
+        """Return base ** exponent % modulus."""
+        if exponent < 0 or exponent.bit_length() > self.exponent_bits:
+            return powmod(self.base, exponent, self.modulus)
+        self.warm_up()
+
+        mask = (1 << self.window) - 1
+        modulus = self._modulus
+        result = to_backend(1)
+        for row in self._table:
+            if not exponent:
+                break
+            digit = exponent & mask
+            if digit:
+                result = result * row[digit] % modulus
+            exponent >>= self.window
+        return int(result)
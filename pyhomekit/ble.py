@@ -2,19 +2,49 @@
 
 import logging
 import random
+import threading
+import time
 
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
 from struct import pack, unpack
 from typing import (Any, Callable, Dict, List, Sequence)  # NOQA pylint: disable=W0611
 from typing import (Tuple, Union, Optional, Iterator)  # NOQA pylint: disable=W0611
-
-import bluepy.btle
-import tenacity
-
-from . import constants
+from typing import Generator, NamedTuple, TYPE_CHECKING
+
+from . import constants, registry
+from .advertising import (AccessoryRegistry, HapAdvertisement,
+                          parse_manufacturer_data,
+                          parse_encrypted_notification, to_device_id)
+from .model import (CharacteristicSignature, GattHandles, ServiceGraph,
+                    ServiceRecord)
+from .model import ValueEncoder, intern_uuid
+from .pairing import (BroadcastKeyManager, EphemeralKeyPool, PairingEntry,
+                      SessionCache, SessionTicket, SRPPairSetup, SRPPairVerify,
+                      add_pairing_request, list_pairings_request,
+                      parse_pairings_response, remove_pairing_request)
+from .pair_setup import ResumablePairSetup
+from .session import SecureSession, max_pdu_size, tag_size
 from .utils import prepare_tlv, iterate_tvl, HapBleError, parse_ktlvs
+from .utils import (AdaptiveConcurrencyLimit, AsyncIteratorInExecutor,
+                    LazyModule, TlvStreamParser)
+
+if TYPE_CHECKING:
+    import bluepy.btle
+    import tenacity
+else:
+    # Imported on first use
+    bluepy = LazyModule('bluepy')
+    bluepy.btle = LazyModule('bluepy.btle')
+    tenacity = LazyModule('tenacity')
 
 logger = logging.getLogger(__name__)
 
+_service_instance_ID_bytes = constants.uuid_bytes(
+    constants.service_instance_ID_characteristic_UUID)
+_service_signature_bytes = constants.uuid_bytes(
+    constants.service_signature_characteristic_UUID)
+
 
 class HapBlePduHeader:
     """Interface for HAP-BLE Headers.
@@ -101,6 +131,16 @@ class HapBlePduRequestHeader(HapBlePduHeader):
         of the request and is used to match a request/response pair.
         """
         if self._transaction_id is None:
+            self.new_transaction_id()
+        return self._transaction_id
+
+    def new_transaction_id(self) -> int:
+        """Generate a new transaction identifier, e.g. to replay the request.
+
+        It differs from the previous one, so that a late response to the
+        previous transaction cannot be matched to the new one."""
+        previous = self._transaction_id
+        while self._transaction_id == previous:
             self._transaction_id = random.SystemRandom().getrandbits(8)
         return self._transaction_id
 
@@ -178,7 +218,7 @@ class HapBlePduResponseHeader(HapBlePduHeader):
         return super(
             HapBlePduResponseHeader,
             self).__str__() + " status_code: {}, transaction_id: {}".format(
-                constants.HapBleStatusCodes()(self.status_code),
+                constants.status_code_names[self.status_code],
                 self.transaction_id)
 
 
@@ -232,84 +272,270 @@ class HapCharacteristic:
 
     retry_wait_time
         How long to wait in s between reconnection attempts.
+
+    backpressure_max_attempts
+        How many times to send a request rejected with Max_Procedures.
+
+    backpressure_wait_time
+        How long to wait in s before the first replay of a rejected
+        request. Doubles with every replay.
     """
 
+    __slots__ = ('uuid', 'accessory', 'retry', 'retry_max_attempts',
+                 'retry_wait_time', 'backpressure_max_attempts',
+                 'backpressure_wait_time', '_cid', '_signature', '_retrying')
+
     def __init__(self,
                  accessory: 'HapAccessory',
                  uuid: str,
                  retry: bool=False,
                  retry_max_attempts: int=1,
-                 retry_wait_time: int=2) -> None:
-        self.uuid = uuid
+                 retry_wait_time: int=2,
+                 backpressure_max_attempts: int=5,
+                 backpressure_wait_time: float=0.05) -> None:
+        self.uuid = intern_uuid(uuid)
         self.accessory = accessory
         self.retry = retry
         self.retry_max_attempts = retry_max_attempts
         self.retry_wait_time = retry_wait_time
+        self.backpressure_max_attempts = backpressure_max_attempts
+        self.backpressure_wait_time = backpressure_wait_time
 
         self._cid = None  # type: Optional[bytes]
-        self.hap_format_converter = constants.identity
-        self._signature = None  # type: Optional[Dict[str, Any]]
+        self._signature = None  # type: Optional[CharacteristicSignature]
+        self._retrying = None  # type: Optional[Callable[[Any], Any]]
 
         if self.retry:
             self._setup_tenacity(
                 max_attempts=self.retry_max_attempts,
                 wait_time=self.retry_wait_time)
 
+    @property
+    def secure_session(self) -> Optional[SecureSession]:
+        """Session securing the PDUs of this characteristic, if established.
+
+        The pairing characteristics are always accessed in the clear."""
+        if self.uuid in constants.unsecured_characteristic_UUIDs:
+            return None
+        return self.accessory.secure_session
+
     def _request(self,
                  header: HapBlePduRequestHeader,
                  body: List[Tuple[int, bytes]]=None) -> None:
-        """Perform a HAP read or write request."""
+        """Perform a HAP read or write request.
+
+        With a secure session, each fragment is encrypted separately."""
         logger.debug("HAP read/write request.")
+        session = self.secure_session
 
         if not body:
-            logger.debug("Writing header to characteristic: %s", header.data)
-            self._characteristic.write(header.data, withResponse=True)
+            fragments = iter([header.data])  # type: Iterator[bytes]
+        elif session is None:
+            fragments = fragment_tlvs(header, body)
         else:
-            for data in fragment_tlvs(header, body):
-                logger.debug("Writing header + data to characteristic: %s",
-                             data)
-                self._characteristic.write(data, withResponse=True)
+            fragments = fragment_tlvs(header, body, max_pdu_size - tag_size)
+
+        for data in fragments:
+            logger.debug("Writing PDU to characteristic: %s", data)
+            if session is not None:
+                data = session.encrypt(data)
+            self._write_pdu(data)
 
     def _read(self) -> bytes:
-        """Read the value of the characteristic."""
+        """Read a PDU from the characteristic, decrypted if secured."""
+        data = self._read_pdu()
+        session = self.secure_session
+        if session is not None:
+            data = session.decrypt(data)
+        return data
+
+    def _gatt(self, operation: Callable[[], Any]) -> Any:
+        """Run a GATT operation, retried after a reconnection if set up."""
+        if self._retrying is None:
+            return operation()
+        return self._retrying(operation)()
+
+    def _gatt_handles(self) -> GattHandles:
+        """Return the handles of the GATT characteristic."""
+        return self.accessory.gatt_handles(self.uuid)
+
+    def _write_pdu(self, data: bytes) -> None:
+        """Write a raw PDU fragment to the GATT characteristic."""
+        self._gatt(lambda: self.accessory.peripheral.writeCharacteristic(
+            self._gatt_handles().value_handle,
+            data,
+            withResponse=True))
+
+    def _read_pdu(self) -> bytes:
+        """Read a raw PDU fragment from the GATT characteristic."""
         logger.debug("Reading characteristic value.")
-        return self._characteristic.read()
+        return self._gatt(lambda: self.accessory.peripheral.readCharacteristic(
+            self._gatt_handles().value_handle))
 
     def write(self,
               request_header: HapBlePduRequestHeader,
               TLVs: List[Tuple[int, bytes]]) -> Dict[str, Any]:
         """Perform a HAP Characteristic write.
 
-        Fragmented read/write if required."""
+        Fragmented read/write if required. Requests rejected because the
+        accessory reached its maximum number of procedures are replayed
+        once a procedure slot is available again."""
         logger.debug("HAP read/write with OpCode: %s.",
-                     constants.HapBleOpCodes()(request_header.op_code))
+                     constants.op_code_names[request_header.op_code])
 
-        self._request(request_header, TLVs)
-
-        response = self._read()
-        logger.debug("Response data: %s", response)
-
-        response_header = self._check_read_response(
-            request_header=request_header, response=response)
-        logger.debug("Response header: %s", response_header)
-        response_parsed = self._parse_response(response)
-
-        if response_header.continuation:
-            # TODO: fragmented read
-            raise NotImplementedError("Fragmented read not yet supported")
+        body = b''.join(self._iter_response_body(request_header, TLVs))
+        response_parsed = self._parse_response(body)
 
         return response_parsed
 
+    def _iter_response_body(self,
+                            request_header: HapBlePduRequestHeader,
+                            TLVs: List[Tuple[int, bytes]]) -> Iterator[bytes]:
+        """Perform a HAP request and yield the response body fragment by fragment.
+
+        The procedure slot of the accessory is held until the last fragment
+        has been read. Requests rejected because the accessory reached its
+        maximum number of procedures are replayed once a procedure slot is
+        available again."""
+        limit = self.accessory.concurrency
+        attempt = 1
+        while True:
+            request_header.continuation = False
+            with self.accessory.procedure(self.uuid):
+                self._request(request_header, TLVs)
+                response = self._read()
+                logger.debug("Response data: %s", response)
+
+                try:
+                    response_header = self._check_read_response(
+                        request_header=request_header, response=response)
+                except HapBleError as e:
+                    if (e.status_code !=
+                            constants.HapBleStatusCodes.Max_Procedures
+                            or attempt >= self.backpressure_max_attempts):
+                        raise
+                    rejected = True
+                else:
+                    rejected = False
+                    limit.on_success()
+                    logger.debug("Response header: %s", response_header)
+                    yield from self._iter_continuation_fragments(
+                        request_header, response)
+            if not rejected:
+                return
+
+            limit.on_backpressure()
+            wait_time = self.backpressure_wait_time * 2**(attempt - 1)
+            logger.debug("Max procedures reached, replaying in %ss.",
+                         wait_time)
+            time.sleep(wait_time)
+            attempt += 1
+            # A replay is a new transaction
+            request_header.new_transaction_id()
+
+    def _iter_continuation_fragments(self,
+                                     request_header: HapBlePduRequestHeader,
+                                     response: bytes) -> Iterator[bytes]:
+        """Yield the body of the first response fragment, then read and yield
+        the continuation fragments until the whole body has been received."""
+        if len(response) <= 3:
+            return
+        body_length = unpack('<H', response[3:5])[0]
+        received = len(response) - 5
+        yield response[5:]
+
+        while received < body_length:
+            fragment = self._read()
+            logger.debug("Continuation fragment: %s", fragment)
+            control_field, tid = unpack('<BB', fragment[:2])
+            # bit 7: continuation, bit 1: response
+            if control_field != 0b10000010:
+                raise ValueError("Invalid control field {} for continuation.".
+                                 format(control_field), fragment)
+            if tid != request_header.transaction_id:
+                raise ValueError("Invalid transaction ID {}, expected {}.".
+                                 format(tid, request_header.transaction_id),
+                                 fragment)
+            received += len(fragment) - 2
+            if received > body_length:
+                raise ValueError("Invalid body length {}, expected {}.".format(
+                    received, body_length), fragment)
+            yield fragment[2:]
+
+    @contextmanager
+    def iter_value(self, request_header: HapBlePduRequestHeader=None
+                   ) -> Iterator[Iterator[bytes]]:
+        """Read the value of the characteristic, yielding it in fragments.
+
+        Meant for data values spanning several PDUs (logs, firmware, setup
+        data): the fragments are yielded as they are reassembled, so only one
+        PDU and at most one partial TLV are held in memory.
+
+        The procedure slot of the accessory is held until the last fragment
+        has been read, so the fragments are iterated in a with block, which
+        releases the slot even if the iteration stops early::
+
+            with characteristic.iter_value() as fragments:
+                for fragment in fragments:
+                    ...
+
+        Parameters
+        ----------
+        request_header
+            Header of the read request. A Characteristic Read by default.
+        """
+        fragments = self._iter_value(request_header)
+        try:
+            yield fragments
+        finally:
+            fragments.close()
+
+    def _iter_value(self, request_header: Optional[HapBlePduRequestHeader]
+                    ) -> Generator[bytes, None, None]:
+        """Generator of the value fragments, see iter_value."""
+        if request_header is None:
+            request_header = HapBlePduRequestHeader(
+                cid_sid=self.cid,
+                op_code=constants.HapBleOpCodes.Characteristic_Read)
+        parser = TlvStreamParser()
+        for body in self._iter_response_body(request_header, []):
+            for param_type, value in parser.feed(body):
+                if param_type == constants.HapParamTypes.Value:
+                    yield value
+        parser.close()
+
+    def aiter_value(self, request_header: HapBlePduRequestHeader=None
+                    ) -> 'AsyncIteratorInExecutor':
+        """Async version of iter_value.
+
+        The GATT reads run in the default executor of the event loop, one
+        fragment at a time. As with iter_value, the fragments are iterated in
+        an async with block, which releases the procedure slot::
+
+            async with characteristic.aiter_value() as fragments:
+                async for fragment in fragments:
+                    ...
+        """
+        return AsyncIteratorInExecutor(self._iter_value(request_header))
+
     def write_ktlvs(self,
                     request_header: HapBlePduRequestHeader,
                     kTLVs: Sequence[Tuple[int, bytes]]) -> Dict[str, Any]:
         """Perform a HAP Characteristic write for a pairing.
 
         Fragmented read/write if required."""
+        return parse_ktlvs(self.write_ktlvs_raw(request_header, kTLVs))
+
+    def write_ktlvs_raw(self, request_header: HapBlePduRequestHeader,
+                        kTLVs: Sequence[Tuple[int, bytes]]) -> bytes:
+        """Perform a HAP Characteristic write for a pairing.
+
+        Returns the response kTLVs unparsed, e.g. to keep the order of
+        repeated kTLVs. Fragmented read/write if required."""
         logger.debug("HAP write pairing with OpCode: %s.",
-                     constants.HapBleOpCodes()(request_header.op_code))
+                     constants.op_code_names[request_header.op_code])
 
-        assembled = {}  # type: Dict[str, Any]
+        fragments = b''
 
         while True:
             logger.debug("Preparing message with kTLVs: %s", kTLVs)
@@ -317,7 +543,8 @@ class HapCharacteristic:
                 data for ktlv in kTLVs for data in prepare_tlv(*ktlv))
 
             TLVs = [(constants.HapParamTypes.Return_Response, pack('<B', 1)),
-                    (constants.HapParamTypes.Value, prepared_ktlvs)]
+                    (constants.HapParamTypes.Value, prepared_ktlvs)
+                    ]  # type: List[Tuple[int, bytes]]
 
             response_parsed = self.write(request_header, TLVs)
             if 'value' not in response_parsed:
@@ -329,26 +556,18 @@ class HapCharacteristic:
             # Check fragmentation
             if 'kTLVType_FragmentData' in parsed_ktlvs:
                 logger.debug("Found kTLV FragmentData - appending")
-                assembled['kTLVType_FragmentData'] = assembled.get(
-                    'kTLVType_FragmentData',
-                    b'') + parsed_ktlvs['kTLVType_FragmentData']
+                fragments += parsed_ktlvs['kTLVType_FragmentData']
                 # send new ktlv fragmentdata empty
                 kTLVs = [(constants.PairingKTlvValues.kTLVType_FragmentData,
                           b'')]
             elif 'kTLVType_FragmentLast' in parsed_ktlvs:
                 logger.debug(
                     "Found kTLV FragmentLast - appending final fragment")
-                assembled['kTLVType_FragmentData'] = (
-                    assembled['kTLVType_FragmentData'] +
-                    parsed_ktlvs['kTLVType_FragmentLast'])
-                # This is the last part of the fragment. Now parse the contents and return
-                assembled = parse_ktlvs(assembled['kTLVType_FragmentData'])
-                break
+                # This is the last part of the fragment
+                return fragments + parsed_ktlvs['kTLVType_FragmentLast']
             else:
-                logger.debug("Unfragmented kTLVS - returning parsed data.")
-                assembled = parsed_ktlvs
-                break
-        return assembled
+                logger.debug("Unfragmented kTLVS - returning data.")
+                return response_parsed['value']
 
     def read(self, request_header: HapBlePduRequestHeader) -> Dict[str, Any]:
         """Perform a HAP Characteristic read.
@@ -359,27 +578,69 @@ class HapCharacteristic:
 
         return response_parsed
 
+    def read_value(self) -> Dict[str, Any]:
+        """Perform a HAP Characteristic Read of the current value.
+
+        The value is also published to the value listeners of the accessory."""
+        read_header = HapBlePduRequestHeader(
+            cid_sid=self.cid,
+            op_code=constants.HapBleOpCodes.Characteristic_Read)
+        response_parsed = self.read(read_header)
+        if 'value' in response_parsed:
+            self.accessory.publish_value(self.cid, response_parsed['value'])
+        return response_parsed
+
+    def write_value(self, value: Any) -> Dict[str, Any]:
+        """Perform a HAP Characteristic Write of a value.
+
+        The value is validated and encoded in the format of the type
+        signature, see value_encoder. Raises ValueError if it is invalid."""
+        write_header = HapBlePduRequestHeader(
+            cid_sid=self.cid,
+            op_code=constants.HapBleOpCodes.Characteristic_Write)
+        return self.write(write_header,
+                          [(constants.HapParamTypes.Value,
+                            self.value_encoder(value))])
+
     def _setup_tenacity(self, max_attempts: int, wait_time: int) -> None:
         """Adds automatic retrying to functions that need to read from device."""
         reconnect_callback = reconnect_callback_factory(
             accessory=self.accessory)
 
-        retry = reconnect_tenacity_retry(reconnect_callback, max_attempts,
-                                         wait_time)
-
-        retry_functions = [
-            self._read_cid, self._request, self._read, self._characteristic
-        ]
-
-        for func in retry_functions:
-            name = func.__name__
-            setattr(self, name, retry(func))
+        self._retrying = reconnect_tenacity_retry(reconnect_callback,
+                                                  max_attempts, wait_time)
 
     @property
-    def _characteristic(self) -> bluepy.btle.Characteristic:
+    def _characteristic(self) -> 'bluepy.btle.Characteristic':
         """Returns the underlying GATT characteristic."""
         return self.accessory.charateristic(self.uuid)
 
+    @property
+    def hap_format_converter(self) -> Callable[[bytes], Any]:
+        """Decodes values in the format of the signature.
+
+        The signature of the registry is used for the Apple-defined types
+        until the signature is read."""
+        signature = self._signature or registry.known_signature(self.uuid)
+        if signature is None:
+            return constants.identity
+        return signature.hap_format_converter
+
+    @property
+    def value_encoder(self) -> ValueEncoder:
+        """Validates and encodes values in the format of the type signature."""
+        return self.type_signature.value_encoder
+
+    @property
+    def type_signature(self) -> CharacteristicSignature:
+        """Returns the format, unit, properties and valid range.
+
+        Taken from the registry for the Apple-defined types, without a
+        signature read. Unlike the read signature, it has no service fields."""
+        if self._signature is not None:
+            return self._signature
+        return registry.known_signature(self.uuid) or self.signature
+
     @property
     def cid(self) -> bytes:
         """Get the Characteristic ID, reading it from the device if required."""
@@ -388,22 +649,27 @@ class HapCharacteristic:
         return self._cid
 
     @property
-    def signature(self) -> Dict[str, Any]:
-        """Returns the signature, and adds the attributes."""
+    def signature(self) -> CharacteristicSignature:
+        """Returns the signature, read from the device if required."""
         if self._signature is None:
             signature_read_header = HapBlePduRequestHeader(
                 cid_sid=self.cid,
                 op_code=constants.HapBleOpCodes.Characteristic_Signature_Read,
             )
-            self._signature = self.read(signature_read_header)
+            self._signature = CharacteristicSignature.from_attributes(
+                self.read(signature_read_header))
         return self._signature
 
     def _read_cid(self) -> bytes:
         """Read the Characteristic ID descriptor."""
         logger.debug("Read characteristic ID descriptor.")
-        cid_descriptor = self._characteristic.getDescriptors(
-            constants.characteristic_ID_descriptor_UUID)[0]
-        return cid_descriptor.read()
+        handles = self._gatt_handles()
+        if handles.cid_handle is None:
+            handles.cid_handle = self._gatt(
+                lambda: self._characteristic.getDescriptors(
+                    constants.characteristic_ID_descriptor_UUID)[0].handle)
+        return self._gatt(lambda: self.accessory.peripheral.readCharacteristic(
+            handles.cid_handle))
 
     @staticmethod
     def _check_read_response(request_header: HapBlePduRequestHeader,
@@ -424,27 +690,35 @@ class HapCharacteristic:
 
         if len(response) > 3:
             body_length = unpack('<H', response[3:5])[0]
-            if len(response[5:]) != body_length:
+            # The body continues in the next fragments if it is shorter
+            if len(response[5:]) > body_length:
                 raise ValueError("Invalid body length {}, expected {}.".format(
                     len(response[5:]), body_length), response)
 
         return response_header
 
-    def _parse_response(self, response: bytes) -> Dict[str, Any]:
-        """Parse read response and set attributes."""
+    def _parse_response(self, body: bytes) -> Dict[str, Any]:
+        """Parse the reassembled read response body.
+
+        Values are decoded with the format of the signature, or of the
+        presentation format descriptor of the response itself."""
 
         logger.debug("Parse read response.")
         attributes = {}  # type: Dict[str, Any]
-        for body_type, length, bytes_ in iterate_tvl(response[5:]):
+        value_converter = self.hap_format_converter
+        for body_type, length, bytes_ in iterate_tvl(body):
             if len(bytes_) != length:
                 raise HapBleError(name="Invalid response length")
-            name = constants.HAP_param_type_code_to_name[body_type]
+            name = constants.HAP_param_type_names[body_type]
+            if name is None:
+                raise HapBleError(
+                    name="Unknown parameter type {}".format(body_type))
 
             if name in ('GATT_Valid_Range', 'HAP_Step_Value_Descriptor',
                         'Value'):
-                converter = self.hap_format_converter
+                converter = value_converter
             else:
-                converter = constants.HAP_param_name_to_converter[name]
+                converter = constants.HAP_param_converters[body_type]
 
             # Treat GATT_Presentation_Format_Descriptor specially
             if name == 'GATT_Presentation_Format_Descriptor':
@@ -453,10 +727,13 @@ class HapCharacteristic:
                 format_converter = constants.format_name_to_converter[
                     format_name]
                 unit_name = constants.unit_code_to_name[unit_code]
+                value_converter = format_converter
                 new_attrs = {
                     'HAP_Format': format_name,
+                    'HAP_Format_Code': format_code,
                     'HAP_Format_Converter': format_converter,
-                    'HAP_Unit': unit_name
+                    'HAP_Unit': unit_name,
+                    'HAP_Unit_Code': unit_code
                 }
 
             # List of values received in the HAP Format
@@ -478,12 +755,49 @@ class HapCharacteristic:
                     logger.debug(
                         "Duplicate TLV Param Type found: %s. Appending.", key)
                     val = attributes[key] + val
-                setattr(self, key, val)
                 attributes[key] = val
 
         return attributes
 
 
+class HapServiceCharacteristic(HapCharacteristic):
+    """A HAP characteristic of a given GATT service.
+
+    The accessory caches its characteristics by UUID, but the Service
+    Signature characteristic is found in every service that has one, so
+    this characteristic is bound to its GATT handles instead.
+
+    Parameters
+    ----------
+    accessory
+        The accessory this characteristic belongs to.
+
+    uuid
+        The UUID of the underlying GATT characteristic
+
+    value_handle
+        Handle of the value of the GATT characteristic.
+    """
+
+    __slots__ = ('_handles', )
+
+    def __init__(self, accessory: 'HapAccessory', uuid: str,
+                 value_handle: int, **kwargs: Any) -> None:
+        super(HapServiceCharacteristic, self).__init__(accessory, uuid,
+                                                       **kwargs)
+        self._handles = GattHandles(value_handle)
+
+    def _gatt_handles(self) -> GattHandles:
+        return self._handles
+
+    @property
+    def _characteristic(self) -> 'bluepy.btle.Characteristic':
+        # The declaration precedes the value
+        return self.accessory.peripheral.getCharacteristics(
+            startHnd=self._handles.value_handle - 1,
+            endHnd=self._handles.value_handle)[0]
+
+
 class HapAccessory:
     """HAP Accesory.
 
@@ -494,31 +808,444 @@ class HapAccessory:
 
     address_type
         Type of the address: static or random
+
+    max_procedures
+        Maximum number of concurrent HAP procedures to attempt. The actual
+        limit adapts to the Max_Procedures status codes of the accessory.
+        Only the procedures on different characteristics of an unsecured
+        link run concurrently, see procedure.
+
+    peripheral
+        The bluepy peripheral, a new one by default.
     """
 
-    def __init__(self, address: str, address_type: str='static') -> None:
+    def __init__(self,
+                 address: str,
+                 address_type: str='static',
+                 max_procedures: int=1,
+                 peripheral: 'bluepy.btle.Peripheral'=None) -> None:
         self.address = address
         self.address_type = address_type
-        self.peripheral = bluepy.btle.Peripheral()
-        self._characteristics = {
-        }  # type: Dict[str, bluepy.btle.Characteristic]
+        self.concurrency = AdaptiveConcurrencyLimit(max_limit=max_procedures)
+        if peripheral is None:
+            peripheral = bluepy.btle.Peripheral()
+        self.peripheral = peripheral
+        self._characteristics = {}  # type: Dict[str, GattHandles]
+        self._hap_characteristics = {}  # type: Dict[str, HapCharacteristic]
+        # HAP characteristics by short type name, see get_characteristic
+        self._characteristic_map = {}  # type: Dict[str, HapCharacteristic]
+        # Last published value of each characteristic, by CID
+        self.values = {}  # type: Dict[bytes, Any]
+        self.service_graph = None  # type: Optional[ServiceGraph]
+        self.pair_verify_session = None  # type: Optional[SRPPairVerify]
+        self.secure_session = None  # type: Optional[SecureSession]
+        self._session_lock = threading.Lock()
+        # Serializes the procedures on each characteristic, by UUID bytes
+        self._characteristic_locks = {}  # type: Dict[bytes, threading.Lock]
+        self._value_listeners = [
+        ]  # type: List[Callable[[HapAccessory, bytes, Any], None]]
 
     def connect(self) -> None:
-        """Connect to BLE peripheral."""
+        """Connect to BLE peripheral.
+
+        The secure session does not survive a disconnection."""
+        self.secure_session = None
         self.peripheral.connect(self.address, self.address_type)
 
-    def charateristic(self, uuid: str) -> bluepy.btle.Characteristic:
-        """Return the GATT characteristic for the given UUID."""
+    def disconnect(self) -> None:
+        """Disconnect from the BLE peripheral, ending the secure session."""
+        self.secure_session = None
+        self.peripheral.disconnect()
+
+    def charateristic(self, uuid: str) -> 'bluepy.btle.Characteristic':
+        """Discover the GATT characteristic for the given UUID.
+
+        Only its handles are cached, see gatt_handles."""
+        characteristic = self.peripheral.getCharacteristics(uuid=uuid)[0]
+        if uuid not in self._characteristics:
+            self._characteristics[intern_uuid(uuid)] = GattHandles(
+                characteristic.getHandle())
+        return characteristic
+
+    def gatt_handles(self, uuid: str) -> GattHandles:
+        """Return the handles of the GATT characteristic for the given UUID.
+
+        The characteristic is discovered on first use."""
         if uuid not in self._characteristics:
-            characteristic = self.peripheral.getCharacteristics(uuid=uuid)[0]
-            self._characteristics[uuid] = characteristic
+            self.charateristic(uuid)
         return self._characteristics[uuid]
 
-    def pair(self) -> None:
-        pass
+    def hap_characteristic(self, uuid: str) -> HapCharacteristic:
+        """Return the HAP characteristic for the given UUID.
+
+        The instance is cached so that its CID and signature are only
+        read once per accessory."""
+        if uuid not in self._hap_characteristics:
+            characteristic = HapCharacteristic(accessory=self, uuid=uuid)
+            self._hap_characteristics[characteristic.uuid] = characteristic
+        return self._hap_characteristics[uuid]
+
+    def services(self) -> List[ServiceRecord]:
+        """Group the characteristics whose signature was read by service."""
+        services = {}  # type: Dict[Tuple[str, int], List[str]]
+        for uuid, characteristic in self._hap_characteristics.items():
+            signature = characteristic._signature
+            if (signature is None or signature.service_type is None
+                    or signature.service_instance_id is None):
+                continue
+            services.setdefault(
+                (signature.service_type, signature.service_instance_id),
+                []).append(uuid)
+        return [
+            ServiceRecord(service_type, instance_id, tuple(uuids))
+            for (service_type, instance_id), uuids in services.items()
+        ]
 
-    def pair_verify(self) -> None:
-        pass
+    def discover_services(self) -> ServiceGraph:
+        """Discover the HAP services of the accessory and their links.
+
+        The instance ID of every HAP service is read, and the properties and
+        linked services of the services with a Service Signature
+        characteristic with a Service Signature Read. The graph is kept as
+        service_graph."""
+        records = []  # type: List[ServiceRecord]
+        for service in self.peripheral.getServices():
+            record = self.read_service(service)
+            if record is not None:
+                records.append(record)
+        self.service_graph = ServiceGraph(records)
+        return self.service_graph
+
+    def read_service(self, service: 'bluepy.btle.Service'
+                     ) -> Optional[ServiceRecord]:
+        """Read the instance ID and signature of a GATT service.
+
+        Returns None if it is not a HAP service, i.e. it has no Service
+        Instance ID characteristic."""
+        sid = None  # type: Optional[bytes]
+        signature_handle = None  # type: Optional[int]
+        uuids = []  # type: List[str]
+        for characteristic in service.getCharacteristics():
+            uuid = str(characteristic.uuid)
+            raw_uuid = constants.uuid_bytes(uuid)
+            if raw_uuid == _service_instance_ID_bytes:
+                # Read with a GATT read, in the clear
+                sid = characteristic.read()
+                continue
+            if raw_uuid == _service_signature_bytes:
+                signature_handle = characteristic.getHandle()
+            uuids.append(uuid)
+        if sid is None:
+            return None
+
+        attributes = {}  # type: Dict[str, Any]
+        if signature_handle is not None:
+            signature_characteristic = HapServiceCharacteristic(
+                self, constants.service_signature_characteristic_UUID,
+                signature_handle)
+            attributes = signature_characteristic.read(
+                HapBlePduRequestHeader(
+                    cid_sid=sid,
+                    op_code=constants.HapBleOpCodes.Service_Signature_Read))
+        return ServiceRecord(
+            str(service.uuid),
+            constants.to_uint16(sid),
+            tuple(uuids),
+            properties=attributes.get('hap_service_properties', 0),
+            linked_services=attributes.get('hap_linked_services', ()))
+
+    def add_value_listener(
+            self, listener: Callable[['HapAccessory', bytes, Any], None]) -> None:
+        """Register a callback for the characteristic values of the accessory.
+
+        The callback receives the accessory, the characteristic ID and the
+        value, for values from connected reads and broadcast notifications."""
+        self._value_listeners.append(listener)
+
+    def publish_value(self, cid: bytes, value: Any) -> None:
+        """Keep a characteristic value and pass it to the value listeners."""
+        self.values[cid] = value
+        for listener in self._value_listeners:
+            listener(self, cid, value)
+
+    def publish_broadcast_value(self, cid: bytes, value: bytes) -> None:
+        """Decode a value from a broadcast notification and publish it.
+
+        Broadcast values are padded to 8 bytes, they are decoded with the
+        format from the signature of the characteristic if it is known."""
+        for characteristic in self._hap_characteristics.values():
+            if characteristic._cid == cid:
+                signature = (characteristic._signature or
+                             registry.known_signature(characteristic.uuid))
+                format_name = signature.hap_format if signature else None
+                if format_name in constants.format_name_to_size:
+                    size = constants.format_name_to_size[format_name]
+                    value = characteristic.hap_format_converter(value[:size])
+                break
+        self.publish_value(cid, value)
+
+    @contextmanager
+    def procedure(self, uuid: str) -> Iterator[None]:
+        """Context manager held for the duration of a HAP procedure on a
+        characteristic.
+
+        The procedures on one characteristic run one at a time: the response
+        to a request is read from the characteristic it was written to. An
+        accessory only processes a limited number of HAP procedures at a
+        time (one by default), so requests beyond the current concurrency
+        limit wait for a slot. While a secure session is established all the
+        procedures run one at a time: the session nonces count the PDUs in
+        each direction, so a request and its response must not interleave
+        with the PDUs of another procedure."""
+        lock = self._characteristic_locks.setdefault(
+            constants.uuid_bytes(uuid), threading.Lock())
+        with lock, self.concurrency.slot():
+            if self.secure_session is None:
+                yield
+            else:
+                with self._session_lock:
+                    yield
+
+    @property
+    def concurrency_limit(self) -> int:
+        """Current adaptive limit on concurrent HAP procedures."""
+        return self.concurrency.limit
+
+    def read_many(self, characteristics: Sequence[Union[HapCharacteristic, str]]
+                  ) -> 'BulkReadResult':
+        """Read the values of several characteristics of this accessory.
+
+        Characteristics can be given as HapCharacteristic or UUID. Duplicates
+        are read once, whatever the case of their UUID. Characteristics whose
+        GATT characteristic and CID are already cached are read first, the
+        ones that still require discovery round trips last. Errors are
+        reported per characteristic.
+        """
+        start = time.perf_counter()
+        # By UUID bytes, as the UUIDs may differ in case
+        unique = {}  # type: Dict[bytes, HapCharacteristic]
+        for characteristic in characteristics:
+            if isinstance(characteristic, str):
+                characteristic = self.hap_characteristic(characteristic)
+            unique.setdefault(
+                constants.uuid_bytes(characteristic.uuid), characteristic)
+
+        ordered = sorted(
+            unique.values(),
+            key=lambda c: (c._cid is None, c.uuid not in self._characteristics))
+
+        results = [_timed_read(characteristic) for characteristic in ordered]
+        return BulkReadResult(results, time.perf_counter() - start)
+
+    def pair(self,
+             pairing_id: bytes,
+             storage_folder: str,
+             setup_code: str,
+             executor: Executor=None,
+             on_stage: Callable[[str], None]=None,
+             ephemeral_pool: EphemeralKeyPool=None,
+             max_retries: int=3,
+             checkpoint: bool=False) -> SRPPairSetup:
+        """Pair with the accessory, storing its keys in the keystore.
+
+        If the link drops during the exchange, the accessory is reconnected
+        and only the failed step is retried, see
+        pair_setup.ResumablePairSetup. HAP errors of the accessory are not
+        transient: they end the pair setup, or restart it after a backoff.
+
+        Parameters
+        ----------
+        pairing_id
+            Pairing identifier of the controller.
+
+        storage_folder
+            Folder where the pairing keys are stored.
+
+        setup_code
+            Setup code of the accessory, formatted as XXX-XX-XXX.
+
+        executor
+            Executor for the SRP computation of M3, e.g. a process pool
+            shared by several pairings.
+
+        on_stage
+            Called with the name of each stage of the pairing as it starts.
+
+        ephemeral_pool
+            Pool of precomputed SRP ephemeral keys, e.g. shared by several
+            pairings. Not used with an executor, which generates the key
+            pair along with the proof.
+
+        max_retries
+            Number of retries after lost links and backoff errors.
+
+        checkpoint
+            Also keep the state of the pair setup in an encrypted checkpoint
+            of the keystore, so that it can resume in another process.
+        """
+        characteristic = self.hap_characteristic(
+            constants.pair_setup_characteristic_UUID)
+        session = SRPPairSetup(
+            pairing_id,
+            storage_folder,
+            setup_code,
+            ephemeral_pool=ephemeral_pool)
+
+        def send(ktlvs: List[Tuple[int, bytes]]) -> Dict[str, Any]:
+            return characteristic.write_ktlvs(
+                HapBlePduRequestHeader(
+                    cid_sid=characteristic.cid,
+                    op_code=constants.HapBleOpCodes.Characteristic_Write),
+                ktlvs)
+
+        ResumablePairSetup(
+            session,
+            send,
+            executor,
+            on_stage,
+            reconnect=self.connect,
+            checkpoint=self.address if checkpoint else None,
+            max_retries=max_retries,
+            transient_errors=(bluepy.btle.BTLEException, OSError)).run()
+        logger.debug("Paired with %s.", self.address)
+        return session
+
+    def pair_verify(self,
+                    pairing_id: bytes,
+                    storage_folder: str,
+                    session_cache: SessionCache=None,
+                    key_manager: BroadcastKeyManager=None,
+                    advertisement: HapAdvertisement=None) -> SRPPairVerify:
+        """Verify the pairing with the accessory and establish a session.
+
+        If the session cache holds a session with this accessory, it is
+        resumed in a single round trip. Otherwise, or if resuming fails, a
+        full pair verify is performed. The new session is stored in the cache,
+        and secures all the following PDUs. The broadcast encryption key
+        derived from the session is added to the key manager, if given.
+
+        Parameters
+        ----------
+        pairing_id
+            Pairing identifier of the controller.
+
+        storage_folder
+            Folder where the pairing keys are stored.
+
+        session_cache
+            Cache of resumable sessions.
+
+        key_manager
+            Broadcast encryption keys, to decrypt the broadcast notifications
+            of the accessory.
+
+        advertisement
+            Latest advertisement of the accessory, for its advertising
+            identifier and current GSN. Required with a key manager.
+        """
+        if key_manager is not None and advertisement is None:
+            raise ValueError(
+                "The advertisement of the accessory is required to add its "
+                "broadcast key.")
+        # The accessory tears down the current session on a new pair verify
+        self.secure_session = None
+        ticket = None
+        if session_cache is not None:
+            ticket = session_cache.pop(self.address)
+
+        try:
+            session = self._pair_verify(pairing_id, storage_folder, ticket)
+        except ValueError:
+            if ticket is None:
+                raise
+            logger.debug("Pair resume failed, falling back to pair verify.",
+                         exc_info=True)
+            session = self._pair_verify(pairing_id, storage_folder, None)
+
+        if session_cache is not None:
+            session_cache.put(self.address, session.session_ticket())
+        self.pair_verify_session = session
+        self.secure_session = SecureSession.from_shared_secret(
+            session.shared_secret)
+        if key_manager is not None and advertisement is not None:
+            controller_ltpk = session.keystore.controller_signing_key(
+            ).get_verifying_key().to_bytes()
+            key_manager.add_key(
+                bytes.fromhex(advertisement.device_id.replace(':', '')),
+                session.shared_secret, controller_ltpk, advertisement.gsn)
+        return session
+
+    def _pair_verify(self, pairing_id: bytes, storage_folder: str,
+                     ticket: Optional[SessionTicket]) -> SRPPairVerify:
+        """Run the pair verify (or pair resume) exchange."""
+        characteristic = self.hap_characteristic(
+            constants.pair_verify_characteristic_UUID)
+        session = SRPPairVerify(
+            pairing_id, storage_folder, resume_ticket=ticket)
+
+        response = characteristic.write_ktlvs(
+            HapBlePduRequestHeader(
+                cid_sid=characteristic.cid,
+                op_code=constants.HapBleOpCodes.Characteristic_Write),
+            session.m1_generate_verify_start_request())
+        if session.m2_receive_start_response(response):
+            logger.debug("Resumed session with %s.", self.address)
+            return session
+
+        response = characteristic.write_ktlvs(
+            HapBlePduRequestHeader(
+                cid_sid=characteristic.cid,
+                op_code=constants.HapBleOpCodes.Characteristic_Write),
+            session.m3_generate_verify_finish_request())
+        session.m4_receive_verify_finish_response(response)
+        return session
+
+    def _write_pairings(self, ktlvs: List[Tuple[int, bytes]]
+                        ) -> List[PairingEntry]:
+        """Send a request to the Pairings characteristic."""
+        if self.secure_session is None:
+            raise HapBleError(
+                name="Pairing Error",
+                message="Pairings can only be managed after pair verify.")
+        characteristic = self.hap_characteristic(
+            constants.pairings_characteristic_UUID)
+        return parse_pairings_response(
+            characteristic.write_ktlvs_raw(
+                HapBlePduRequestHeader(
+                    cid_sid=characteristic.cid,
+                    op_code=constants.HapBleOpCodes.Characteristic_Write),
+                ktlvs))
+
+    def add_pairing(self,
+                    pairing_id: bytes,
+                    public_key: bytes,
+                    permissions: int=constants.PairingPermissions.Admin
+                    ) -> None:
+        """Pair another controller with the accessory.
+
+        Requires an admin pairing, and a pair verified session.
+
+        Parameters
+        ----------
+        pairing_id
+            Pairing identifier of the added controller.
+
+        public_key
+            Long term public key of the added controller.
+
+        permissions
+            PairingPermissions of the added controller.
+        """
+        self._write_pairings(
+            add_pairing_request(pairing_id, public_key, permissions))
+
+    def remove_pairing(self, pairing_id: bytes) -> None:
+        """Remove the pairing of a controller, possibly this one."""
+        self._write_pairings(remove_pairing_request(pairing_id))
+
+    def list_pairings(self) -> List[PairingEntry]:
+        """Return the pairings of the accessory."""
+        return self._write_pairings(list_pairings_request())
 
     def save_key(self) -> None:
         pass
@@ -527,48 +1254,331 @@ class HapAccessory:
         """Discovers all of the HAP Characteristics and performs a signature read on each one."""
         pass
 
-    def get_characteristic(self, name: str, uuid: str) -> HapCharacteristic:
-        pass
+    def get_characteristic(self, name: str,
+                           uuid: str=None) -> HapCharacteristic:
+        """Return the HAP characteristic of a type, by short type name.
+
+        The characteristic is resolved once and kept in the characteristic
+        map of the accessory, with its CID and signature once read.
+
+        Parameters
+        ----------
+        name
+            Short type name, e.g. 'lock-mechanism.current-state'.
+
+        uuid
+            UUID of the characteristic. Defaults to the UUID of the
+            Apple-defined type of this name.
+        """
+        characteristic = self._characteristic_map.get(name)
+        if characteristic is None:
+            if uuid is None:
+                uuid = registry.characteristic_uuids.get(name)
+                if uuid is None:
+                    raise ValueError(
+                        "Unknown characteristic type {}".format(name))
+            characteristic = self.hap_characteristic(uuid)
+            self._characteristic_map[name] = characteristic
+        return characteristic
+
+
+LockCommandResult = NamedTuple('LockCommandResult', [
+    ('target_state', int),
+    ('response', Dict[str, Any]),
+    ('elapsed', float),
+])
 
 
 class HapAccessoryLock(HapAccessory):
+    """HAP lock, with a Lock Mechanism and optionally a Lock Management
+    service.
+
+    Call prepare once connected and pair verified: the characteristics of
+    the lock are then resolved, with their CIDs read, and their types known
+    from the registry, so that every command is a single HAP procedure.
+    """
+
+    mechanism_characteristics = ('lock-mechanism.current-state',
+                                 'lock-mechanism.target-state')
+    management_characteristics = ('lock-management.control-point', 'version',
+                                  'logs', 'audio-feedback',
+                                  'lock-management.auto-secure-timeout',
+                                  'administrator-only-access',
+                                  'lock-mechanism.last-known-action',
+                                  'door-state.current', 'motion-detected')
+
+    def prepare(self) -> List[HapCharacteristic]:
+        """Resolve the characteristics of the lock and read their CIDs.
+
+        The lock management characteristics are only prepared if found in
+        the service graph, see discover_services, the others are resolved
+        on first use. Returns the prepared characteristics."""
+        prepared = []
+        for name in (self.mechanism_characteristics +
+                     self.management_characteristics):
+            uuid = registry.characteristic_uuids[name]
+            if name not in self.mechanism_characteristics and (
+                    self.service_graph is None or
+                    self.service_graph.characteristic_service(uuid) is None):
+                continue
+            characteristic = self.get_characteristic(name, uuid)
+            characteristic.cid  # pylint: disable=W0104
+            prepared.append(characteristic)
+        return prepared
+
+    def _read_value(self, name: str) -> Any:
+        return self.get_characteristic(name).read_value().get('value')
+
+    def set_lock_target_state(self, state: int) -> LockCommandResult:
+        """Write the target state, e.g. 1 to lock and 0 to unlock.
+
+        Once prepared, this is one secured GATT write of the request and one
+        GATT read of its response. The latency is measured from the request
+        to the response. Raises HapBleError without a secure session."""
+        if self.secure_session is None:
+            raise HapBleError(
+                name="No secure session", message="Pair verify first.")
+        characteristic = self.get_characteristic('lock-mechanism.target-state')
+        start = time.perf_counter()
+        response = characteristic.write_value(state)
+        elapsed = time.perf_counter() - start
+        logger.debug("Lock target state %s written in %.3fs.", state, elapsed)
+        return LockCommandResult(state, response, elapsed)
+
+    def lock(self) -> LockCommandResult:
+        """Secure the lock."""
+        return self.set_lock_target_state(1)
+
+    def unlock(self) -> LockCommandResult:
+        """Unsecure the lock."""
+        return self.set_lock_target_state(0)
 
     # Required
     def lock_current_state(self) -> int:
-        pass
+        """Unsecured (0), secured (1), jammed (2) or unknown (3)."""
+        return self._read_value('lock-mechanism.current-state')
 
     # Required
-    def lock_target_state(self) -> None:
-        pass
+    def lock_target_state(self) -> int:
+        """Unsecured (0) or secured (1)."""
+        return self._read_value('lock-mechanism.target-state')
 
     # Required for lock management
-    def lock_control_point(self) -> Any:
-        pass
+    def lock_control_point(self, value: bytes) -> bytes:
+        """Write a TLV8 command to the lock control point.
+
+        Returns the TLV8 write response of the lock."""
+        characteristic = self.get_characteristic(
+            'lock-management.control-point')
+        response = characteristic.write(
+            HapBlePduRequestHeader(
+                cid_sid=characteristic.cid,
+                op_code=constants.HapBleOpCodes.Characteristic_Write),
+            [(constants.HapParamTypes.Return_Response, pack('<B', 1)),
+             (constants.HapParamTypes.Value, characteristic.value_encoder(value))])
+        return response.get('value', b'')
 
     def version(self) -> str:
-        pass
+        return self._read_value('version')
 
     # Optional for lock management
-    def logs(self) -> str:
-        pass
+    def logs(self) -> bytes:
+        return self._read_value('logs')
 
-    def audio_feedback(self) -> bytes:
-        pass
+    def audio_feedback(self) -> bool:
+        return self._read_value('audio-feedback')
 
-    def lock_management_auto_security_timeout(self) -> None:
-        pass
+    def lock_management_auto_security_timeout(self) -> int:
+        return self._read_value('lock-management.auto-secure-timeout')
 
-    def administrator_only_access(self) -> None:
-        pass
+    def administrator_only_access(self) -> bool:
+        return self._read_value('administrator-only-access')
 
     def lock_last_known_action(self) -> int:
-        pass
+        return self._read_value('lock-mechanism.last-known-action')
 
     def current_door_state(self) -> int:
-        pass
+        return self._read_value('door-state.current')
 
     def motion_detected(self) -> bool:
-        pass
+        return self._read_value('motion-detected')
+
+
+class HapScanner:
+    """Passive scanner for HAP-BLE advertisements.
+
+    Keeps the registry up to date with the advertised state of the
+    accessories, without connecting to them. The scanner is its own bluepy
+    scan delegate.
+
+    Parameters
+    ----------
+    registry
+        The registry to update. A new one is created if not given.
+
+    interface
+        Index of the HCI interface to scan with.
+
+    key_manager
+        Broadcast encryption keys, to decrypt broadcast notifications.
+
+    accessories
+        Accessories to publish the decrypted broadcast values to.
+    """
+
+    def __init__(self,
+                 registry: AccessoryRegistry=None,
+                 interface: int=0,
+                 key_manager: BroadcastKeyManager=None,
+                 accessories: Sequence['HapAccessory']=()) -> None:
+        self.registry = registry if registry is not None else AccessoryRegistry()
+        self.key_manager = key_manager  # type: Optional[BroadcastKeyManager]
+        self.accessories = {
+            accessory.address.lower(): accessory
+            for accessory in accessories
+        }
+        self.scanner = bluepy.btle.Scanner(interface).withDelegate(self)
+
+    def scan(self, timeout: float=10) -> AccessoryRegistry:
+        """Passively scan for timeout seconds and return the registry."""
+        self.scanner.scan(timeout, passive=True)
+        return self.registry
+
+    def handleDiscovery(self, scanEntry: 'bluepy.btle.ScanEntry',
+                        isNewDev: bool, isNewData: bool) -> None:
+        """Parse the manufacturer data of advertisements as they arrive."""
+        value = scanEntry.getValueText(bluepy.btle.ScanEntry.MANUFACTURER)
+        if value is None:
+            return
+        data = bytes.fromhex(value)
+        advertisement = parse_manufacturer_data(data)
+        if advertisement is not None:
+            self.registry.update(scanEntry.addr, advertisement)
+            return
+
+        notification = parse_encrypted_notification(data)
+        if notification is not None and self.key_manager is not None:
+            self._handle_encrypted_notification(self.key_manager,
+                                                scanEntry.addr,
+                                                notification.advertising_id,
+                                                notification.payload)
+
+    def _handle_encrypted_notification(self, key_manager: BroadcastKeyManager,
+                                       address: str, advertising_id: bytes,
+                                       payload: bytes) -> None:
+        """Decrypt a broadcast notification and publish its value."""
+        device_id = to_device_id(advertising_id)
+        advertised = self.registry.get(device_id)
+        if advertised is None:
+            logger.debug("Broadcast notification from unknown accessory %s.",
+                         device_id)
+            return
+        decrypted = key_manager.decrypt(
+            advertising_id, payload, last_gsn=advertised.advertisement.gsn)
+        if decrypted is None:
+            logger.debug("Could not decrypt broadcast notification from %s.",
+                         device_id)
+            return
+        gsn, cid, value = decrypted
+        self.registry.acknowledge_gsn(device_id, gsn)
+        accessory = self.accessories.get(address.lower())
+        if accessory is not None:
+            accessory.publish_broadcast_value(cid, value)
+
+
+ReadResult = NamedTuple('ReadResult', [
+    ('characteristic', HapCharacteristic),
+    ('value', Optional[Dict[str, Any]]),
+    ('error', Optional[Exception]),
+    ('elapsed', float),
+])
+
+
+class BulkReadResult:
+    """Consolidated result of a bulk read.
+
+    Parameters
+    ----------
+    results
+        One ReadResult per characteristic read, with its parsed response
+        or the error raised, and the time spent on it in s.
+
+    elapsed
+        Wall clock time of the whole bulk read in s.
+    """
+
+    def __init__(self, results: List[ReadResult], elapsed: float) -> None:
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self) -> List[ReadResult]:
+        """Results of the reads that succeeded."""
+        return [result for result in self.results if result.error is None]
+
+    @property
+    def failed(self) -> List[ReadResult]:
+        """Results of the reads that raised an error."""
+        return [result for result in self.results if result.error is not None]
+
+    def by_accessory(self) -> Dict[str, List[ReadResult]]:
+        """Group the results by accessory address."""
+        grouped = {}  # type: Dict[str, List[ReadResult]]
+        for result in self.results:
+            grouped.setdefault(result.characteristic.accessory.address,
+                               []).append(result)
+        return grouped
+
+    def __str__(self) -> str:
+        return "{} reads, {} failed, {:.3f}s".format(
+            len(self.results), len(self.failed), self.elapsed)
+
+
+def _timed_read(characteristic: HapCharacteristic) -> ReadResult:
+    """Read the value of a characteristic, capturing errors and timing."""
+    start = time.perf_counter()
+    try:
+        value = characteristic.read_value()  # type: Optional[Dict[str, Any]]
+        error = None  # type: Optional[Exception]
+    except Exception as e:  # pylint: disable=W0703
+        logger.debug(
+            "Error while reading %s", characteristic.uuid, exc_info=True)
+        value, error = None, e
+    return ReadResult(characteristic, value, error,
+                      time.perf_counter() - start)
+
+
+def read_all(accessories: Sequence[HapAccessory],
+             characteristics: Sequence[str],
+             max_workers: int=None) -> BulkReadResult:
+    """Read the same characteristics on several accessories in parallel.
+
+    Each accessory is read by its own worker thread with
+    HapAccessory.read_many, so reads on one accessory stay sequential.
+
+    Parameters
+    ----------
+    accessories
+        The connected accessories to read from.
+
+    characteristics
+        UUIDs of the characteristics to read on every accessory.
+
+    max_workers
+        Maximum number of accessories read concurrently. Defaults to
+        one thread per accessory.
+    """
+    start = time.perf_counter()
+    if max_workers is None:
+        max_workers = max(len(accessories), 1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        batches = list(
+            executor.map(lambda accessory: accessory.read_many(characteristics),
+                         accessories))
+
+    results = [result for batch in batches for result in batch.results]
+    return BulkReadResult(results, time.perf_counter() - start)
 
 
 def reconnect_callback_factory(
@@ -590,7 +1600,7 @@ def reconnect_callback_factory(
 
 def reconnect_tenacity_retry(reconnect_callback: Callable[[Any, int], Any],
                              max_attempts: int=2,
-                             wait_time: int=2) -> tenacity.Retrying:
+                             wait_time: int=2) -> 'tenacity.Retrying':
     """Build tenacity retry object"""
     retry = tenacity.retry(
         stop=tenacity.stop_after_attempt(max_attempts),
@@ -602,38 +1612,46 @@ def reconnect_tenacity_retry(reconnect_callback: Callable[[Any, int], Any],
 
 
 def fragment_tlvs(header: HapBlePduRequestHeader,
-                  TLVs: List[Tuple[int, bytes]]) -> Iterator[bytes]:
-    """Returns the fragmented TLVs to write."""
+                  TLVs: List[Tuple[int, bytes]],
+                  max_len: int=max_pdu_size) -> Iterator[bytes]:
+    """Returns the fragmented PDUs to write.
+
+    The first fragment holds the full header and the length of the whole
+    body, the continuation fragments only the control field and TID.
+
+    Parameters
+    ----------
+    header
+        Header of the request. Set to continuation for the next fragments.
+
+    TLVs
+        Body of the request.
+
+    max_len
+        Maximum size of a fragment. 496 bytes in a secure session, to leave
+        room for the auth tag.
+    """
     logger.debug("Preparing data for characteristic write: %s", TLVs)
 
-    prepared_tlvs = [
+    body = b''.join(
         data
         for param_type, value in TLVs
-        for data in prepare_tlv(param_type, value)
-    ]
-
-    body_concat = b''.join(prepared_tlvs)
-
-    max_len = 512
+        for data in prepare_tlv(param_type, value))
 
-    # Is a fragmented write necessary?
-    if len(header.data) + 2 + len(body_concat) <= max_len:
-        data = header.data + pack('<H', len(body_concat)) + body_concat
+    first = header.data + pack('<H', len(body))
+    if len(first) + len(body) <= max_len:
         logger.debug("No fragmentation necessary.")
-        yield data
-    else:
-        logger.debug("Fragmentation necessary. Total len %s", len(body_concat))
-        while prepared_tlvs:
-            # Fill fragment
-            fragment_data = b''
-            while prepared_tlvs and len(fragment_data) + len(
-                    prepared_tlvs[0]) < max_len:
-                logger.debug("Add to fragment: %s", prepared_tlvs[0])
-                fragment_data += prepared_tlvs.pop(0)
-
-            data = header.data + pack('<H', len(fragment_data)) + fragment_data
-
-            yield data
-
-            # Future fragments are continuations
-            header.continuation = True
+        yield first + body
+        return
+
+    logger.debug("Fragmentation necessary. Total len %s", len(body))
+    offset = max_len - len(first)
+    yield first + body[:offset]
+
+    # Future fragments are continuations
+    header.continuation = True
+    continuation = header.data
+    step = max_len - len(continuation)
+    while offset < len(body):
+        yield continuation + body[offset:offset + step]
+        offset += step
@@ -0,0 +1,221 @@
+"""Pairing of a fleet of accessories, e.g. when installing a building.
+
+The radio exchanges of the pairings run on I/O threads, one accessory per
+thread. The SRP computation of M3 holds the GIL, it is offloaded to a
+process pool shared by all the pairings, whose workers use the crypto
+provider of the controller and build the SRP tables when they start. Each
+worker precomputes its own SRP ephemeral keys between two M3 computations,
+so that the ephemeral secrets are not sent between processes. The M5
+request is signed on the I/O threads: the long term secret key of the
+controller is not sent to the workers.
+"""
+
+import concurrent.futures
+import logging
+import threading
+import time
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import (Any, Callable, Dict, List, Sequence)  # NOQA pylint: disable=W0611
+from typing import (Tuple, Union, Optional, Iterator)  # NOQA pylint: disable=W0611
+from typing import NamedTuple
+
+from . import crypto, pairing
+from .pairing import EphemeralKeyPool
+
+logger = logging.getLogger(__name__)
+
+CommissioningResult = NamedTuple('CommissioningResult', [
+    ('address', str),
+    ('accessory_pairing_id', Optional[bytes]),
+    ('error', Optional[Exception]),
+    ('elapsed', float),
+    ('stage_times', Dict[str, float]),
+])
+
+
+def init_worker(provider_name: str, ephemeral_keys: int=1) -> None:
+    """Initializer of the crypto worker processes.
+
+    Uses the crypto provider of the controller, computes the SRP constants
+    and fixed base tables before the first pairing, and starts a pool of
+    ephemeral_keys SRP ephemeral keys, see pairing.set_ephemeral_pool."""
+    crypto.set_provider(provider_name)
+    pairing.srp.warm_up()
+    pairing.g_pow.warm_up()
+    if ephemeral_keys:
+        pairing.set_ephemeral_pool(EphemeralKeyPool(size=ephemeral_keys))
+
+
+def crypto_process_pool(max_workers: int=None,
+                        ephemeral_keys: int=1) -> Executor:
+    """Process pool for the M3 computations of many pairings.
+
+    Each worker computes one M3 at a time, and precomputes ephemeral_keys
+    SRP ephemeral keys for the next ones."""
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=init_worker,
+        initargs=(crypto.get_provider().name, ephemeral_keys))
+
+
+class CommissioningReport:
+    """Results of the commissioning of a fleet.
+
+    Parameters
+    ----------
+    results
+        Result of each accessory, in the order they were given.
+
+    elapsed
+        Wall clock duration of the commissioning in s.
+    """
+
+    def __init__(self, results: List[CommissioningResult],
+                 elapsed: float) -> None:
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self) -> List[CommissioningResult]:
+        """Results of the accessories that were paired."""
+        return [result for result in self.results if result.error is None]
+
+    @property
+    def failed(self) -> List[CommissioningResult]:
+        """Results of the accessories whose pairing raised an error."""
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def throughput(self) -> float:
+        """Accessories paired per minute."""
+        if not self.elapsed:
+            return 0.0
+        return len(self.succeeded) * 60 / self.elapsed
+
+    def mean_stage_times(self) -> Dict[str, float]:
+        """Mean time in s spent in each stage by the paired accessories."""
+        totals = {}  # type: Dict[str, float]
+        for result in self.succeeded:
+            for stage, elapsed in result.stage_times.items():
+                totals[stage] = totals.get(stage, 0.0) + elapsed
+        return {
+            stage: total / len(self.succeeded)
+            for stage, total in totals.items()
+        }
+
+    def __str__(self) -> str:
+        return "{} accessories, {} failed, {:.3f}s, {:.1f} pairings/min".format(
+            len(self.results), len(self.failed), self.elapsed,
+            self.throughput)
+
+
+class Commissioner:
+    """Pairs many accessories concurrently.
+
+    Parameters
+    ----------
+    pairing_id
+        Pairing identifier of the controller.
+
+    storage_folder
+        Folder where the pairing keys are stored.
+
+    io_workers
+        Number of accessories paired at the same time.
+
+    crypto_executor
+        Executor for the M3 computations. By default, a process pool with one
+        process per CPU is created for each commissioning, see
+        crypto_process_pool.
+
+    progress
+        Called from the I/O threads with the address of an accessory and the
+        stage its pairing starts, "connect" first, then the stages of
+        pairing.run_pair_setup, up to "paired" or "failed".
+    """
+
+    def __init__(self,
+                 pairing_id: bytes,
+                 storage_folder: str,
+                 io_workers: int=8,
+                 crypto_executor: Executor=None,
+                 progress: Callable[[str, str], None]=None) -> None:
+        self.pairing_id = pairing_id
+        self.storage_folder = storage_folder
+        self.io_workers = io_workers
+        self.crypto_executor = crypto_executor
+        self.progress = progress
+        self._progress_lock = threading.Lock()
+
+    def _report(self, address: str, stage: str) -> None:
+        logger.debug("Commissioning %s: %s", address, stage)
+        if self.progress is not None:
+            with self._progress_lock:
+                self.progress(address, stage)
+
+    def _commission_one(self, accessory: Any, setup_code: str,
+                        executor: Executor) -> CommissioningResult:
+        """Connect to and pair with one accessory, timing each stage."""
+        start = time.perf_counter()
+        stage_times = {}  # type: Dict[str, float]
+        current = ['connect', start]  # type: List[Any]
+
+        def on_stage(stage: str) -> None:
+            now = time.perf_counter()
+            stage_times[current[0]] = now - current[1]
+            current[:] = [stage, now]
+            self._report(accessory.address, stage)
+
+        self._report(accessory.address, 'connect')
+        try:
+            accessory.connect()
+            session = accessory.pair(
+                self.pairing_id,
+                self.storage_folder,
+                setup_code,
+                executor=executor,
+                on_stage=on_stage)
+        except Exception as e:  # pylint: disable=W0703
+            logger.debug(
+                "Error while pairing %s", accessory.address, exc_info=True)
+            self._report(accessory.address, 'failed')
+            return CommissioningResult(accessory.address, None, e,
+                                       time.perf_counter() - start,
+                                       stage_times)
+        # "paired" is the final state, not a stage
+        stage_times.pop('paired', None)
+        return CommissioningResult(accessory.address,
+                                   session.accessory_pairing_id, None,
+                                   time.perf_counter() - start, stage_times)
+
+    def commission(self, accessories: Sequence[Tuple[Any, str]]
+                   ) -> CommissioningReport:
+        """Pair with all the accessories.
+
+        Parameters
+        ----------
+        accessories
+            Pairs of HapAccessory and setup code. Errors are reported per
+            accessory, in the order given.
+        """
+        start = time.perf_counter()
+        own_executor = self.crypto_executor is None
+        if self.crypto_executor is None:
+            executor = crypto_process_pool()
+        else:
+            executor = self.crypto_executor
+        try:
+            with ThreadPoolExecutor(max_workers=self.io_workers) as io_pool:
+                futures = [
+                    io_pool.submit(self._commission_one, accessory,
+                                   setup_code, executor)
+                    for accessory, setup_code in accessories
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            if own_executor:
+                executor.shutdown()
+        report = CommissioningReport(results, time.perf_counter() - start)
+        logger.debug("Commissioning done: %s", report)
+        return report
@@ -1,15 +1,49 @@
 """HAP Constants"""
 
-from struct import unpack
-from typing import Dict, Any, Optional, Tuple  # NOQA pylint: disable=W0611
+import sys
+import warnings
+
+from enum import EnumMeta, IntEnum, IntFlag
+from functools import lru_cache
+from struct import pack, unpack
+from typing import Callable, Dict, Any, Optional, Tuple  # NOQA pylint: disable=W0611
+from uuid import UUID
+
+# The same few hundred UUIDs are parsed from every signature read, so their
+# conversions are cached by raw bytes, the least recently used evicted first.
+uuid_cache_size = 1024
+
+
+@lru_cache(maxsize=uuid_cache_size)
+def _bytes_to_uuid(b: bytes) -> str:
+    s = b[::-1].hex()
+    return sys.intern('-'.join((s[:8], s[8:12], s[12:16], s[16:20], s[20:])))
 
 
 def to_uuid(b: bytes) -> str:
     """Convert bytes to string representation of uuid.
 
-    The bytes are reversed first."""
-    s = b[::-1].hex()
-    return '-'.join((s[:8], s[8:12], s[12:16], s[16:20], s[20:]))
+    The bytes are reversed first. The string is interned, and shared by all
+    the conversions of the same bytes."""
+    return _bytes_to_uuid(bytes(b))
+
+
+@lru_cache(maxsize=uuid_cache_size)
+def _bytes_to_uuid_object(b: bytes) -> UUID:
+    return UUID(bytes=b[::-1])
+
+
+def to_uuid_object(b: bytes) -> UUID:
+    """Convert bytes to a shared uuid.UUID, the bytes are reversed first."""
+    return _bytes_to_uuid_object(bytes(b))
+
+
+@lru_cache(maxsize=uuid_cache_size)
+def uuid_bytes(uuid: str) -> bytes:
+    """Convert a uuid string, in either case, to bytes, the inverse of to_uuid.
+
+    Use it to compare UUIDs by their raw bytes."""
+    return bytes.fromhex(uuid.replace('-', ''))[::-1]
 
 
 def to_bool(b: bytes) -> bool:
@@ -47,11 +81,56 @@ def to_uint8(b: bytes) -> int:
     return unpack('<B', b)[0]
 
 
+def to_uint16_tuple(b: bytes) -> Tuple[int, ...]:
+    """Convert to bytes to 16 bit unsigned shorts (little endian)."""
+    return unpack('<{}H'.format(len(b) // 2), b)
+
+
 def to_utf8(b: bytes) -> str:
     """Convert bytes to str utf-8 encoded."""
     return b.decode('utf-8')
 
 
+def from_bool(value: bool) -> bytes:
+    """Convert bool to bytes."""
+    return pack('<?', value)
+
+
+def from_float(value: float) -> bytes:
+    """Convert float to bytes (little endian)."""
+    return pack('<f', value)
+
+
+def from_int32(value: int) -> bytes:
+    """Convert 32 bit signed int to bytes (little endian)."""
+    return pack('<i', value)
+
+
+def from_uint64(value: int) -> bytes:
+    """Convert 64 bit unsigned int to bytes (little endian)."""
+    return pack('<Q', value)
+
+
+def from_uint32(value: int) -> bytes:
+    """Convert 32 bit unsigned int to bytes (little endian)."""
+    return pack('<I', value)
+
+
+def from_uint16(value: int) -> bytes:
+    """Convert 16 bit unsigned short to bytes (little endian)."""
+    return pack('<H', value)
+
+
+def from_uint8(value: int) -> bytes:
+    """Convert 8 bit unsigned short to bytes (little endian)."""
+    return pack('<B', value)
+
+
+def from_utf8(value: str) -> bytes:
+    """Convert str to bytes utf-8 encoded."""
+    return value.encode('utf-8')
+
+
 def identity(x: Any) -> Any:
     """Identity"""
     return x
@@ -76,9 +155,48 @@ pairing_service_UUID = "00000055-0000-1000-8000-0026BB765291"
 pair_setup_characteristic_UUID = "0000004C-0000-1000-8000-0026BB765291"
 pair_verify_characteristic_UUID = "0000004E-0000-1000-8000-0026BB765291"
 pairing_features_characteristic_UUID = "0000004F-0000-1000-8000-0026BB765291"
+pairings_characteristic_UUID = "00000050-0000-1000-8000-0026BB765291"
+service_instance_ID_characteristic_UUID = 'E604E95D-A759-4817-87D3-AA005083A0D1'
+service_signature_characteristic_UUID = "000000A5-0000-1000-8000-0026BB765291"
+# Accessed without a secure session, even when one is established
+unsecured_characteristic_UUIDs = (pair_setup_characteristic_UUID,
+                                  pair_verify_characteristic_UUID,
+                                  pairing_features_characteristic_UUID)
+
+
+class CodeEnumMeta(EnumMeta):
+    """Metaclass of the code enums, keeping their former lookup API.
+
+    HapBleOpCodes()(code) returned the name of a code. It still does, with a
+    DeprecationWarning: use HapBleOpCodes(code).name instead."""
+
+    def __call__(cls, *args: Any, **kwargs: Any) -> Any:
+        if args or kwargs:
+            return super().__call__(*args, **kwargs)
+        warnings.warn(
+            "{0}()(code) is deprecated, use {0}(code).name".format(
+                cls.__name__), DeprecationWarning, stacklevel=2)
+        return code_name_lookups[cls]
+
 
+class HapCharacteristicProperties(IntFlag):
+    Read = 0x0001
+    Write = 0x0002
+    Additional_Authorization_Data = 0x0004
+    Timed_Write = 0x0008
+    Secure_Read = 0x0010
+    Secure_Write = 0x0020
+    Hidden = 0x0040
+    Notify_Connected = 0x0080
+    Notify_Disconnected = 0x0100
 
-class HapParamTypes:
+
+class HapServiceProperties(IntFlag):
+    Primary_Service = 0x0001
+    Hidden_Service = 0x0002
+
+
+class HapParamTypes(IntEnum, metaclass=CodeEnumMeta):
     Value = 1
     Additional_Authorization_Data = 2
     Origin_local_vs_remote = 3
@@ -98,9 +216,6 @@ class HapParamTypes:
     HAP_Valid_Values_Descriptor = 17
     HAP_Valid_Values_Range_Descriptor = 18
 
-    def __call__(self, code: int) -> str:
-        return HAP_param_type_code_to_name[code]
-
 
 HAP_param_type_code_to_name = {
     1: 'Value',
@@ -162,7 +277,7 @@ HAP_param_code_to_converter = {
     13: identity,
     14: identity,
     15: to_uint16,
-    16: identity,
+    16: to_uint16_tuple,
     17: identity,
     18: identity
 }  # type: Dict[int, Any]
@@ -185,7 +300,7 @@ HAP_param_name_to_converter = {
     "GATT_Valid_Range": identity,
     "HAP_Step_Value_Descriptor": identity,
     "HAP_Service_Properties": to_uint16,
-    "HAP_Linked_Services": identity,
+    "HAP_Linked_Services": to_uint16_tuple,
     "HAP_Valid_Values_Descriptor": identity,
     "HAP_Valid_Values_Range_Descriptor": identity
 }  # type: Dict[str, Any]
@@ -193,7 +308,7 @@ HAP_param_name_to_converter = {
 format_code_to_name = {
     0x01: 'bool',
     0x04: 'uint8',
-    0x06: 'unit16',
+    0x06: 'uint16',
     0x08: 'uint32',
     0x0A: 'uint64',
     0x10: 'int',
@@ -202,6 +317,20 @@ format_code_to_name = {
     0x1B: 'data'
 }
 
+# tlv8 values are data for HAP-BLE
+format_name_to_code = {
+    'bool': 0x01,
+    'uint8': 0x04,
+    'uint16': 0x06,
+    'uint32': 0x08,
+    'uint64': 0x0A,
+    'int': 0x10,
+    'float': 0x14,
+    'string': 0x19,
+    'data': 0x1B,
+    'tlv8': 0x1B
+}
+
 format_name_to_converter = {
     'bool': to_bool,
     'uint8': to_uint8,
@@ -214,6 +343,50 @@ format_name_to_converter = {
     'data': lambda x: x
 }
 
+format_name_to_encoder = {
+    'bool': from_bool,
+    'uint8': from_uint8,
+    'uint16': from_uint16,
+    'uint32': from_uint32,
+    'uint64': from_uint64,
+    'int': from_int32,
+    'float': from_float,
+    'string': from_utf8,
+    'data': bytes
+}  # type: Dict[str, Callable[[Any], bytes]]
+
+# struct format characters of the fixed size formats
+format_name_to_struct_code = {
+    'bool': '?',
+    'uint8': 'B',
+    'uint16': 'H',
+    'uint32': 'I',
+    'uint64': 'Q',
+    'int': 'i',
+    'float': 'f'
+}
+
+# Range of the values of the fixed size formats, float being a float32
+format_name_to_range = {
+    'bool': (0, 1),
+    'uint8': (0, 0xFF),
+    'uint16': (0, 0xFFFF),
+    'uint32': (0, 0xFFFFFFFF),
+    'uint64': (0, 0xFFFFFFFFFFFFFFFF),
+    'int': (-0x80000000, 0x7FFFFFFF),
+    'float': (-3.4028234663852886e38, 3.4028234663852886e38)
+}  # type: Dict[str, Tuple[Any, Any]]
+
+format_name_to_size = {
+    'bool': 1,
+    'uint8': 1,
+    'uint16': 2,
+    'uint32': 4,
+    'uint64': 8,
+    'int': 4,
+    'float': 4
+}
+
 unit_name_to_code = {
     'celsius': 0x272F,
     'arcdegrees': 0x2763,
@@ -247,6 +420,7 @@ pairing_tlv_value_to_name = {
     11: 'kTLVType_Permissions',
     12: 'kTLVType_FragmentData',
     13: 'kTLVType_FragmentLast',
+    14: 'kTLVType_SessionID',
     255: 'kTLVType_Separator'
 }
 
@@ -264,6 +438,7 @@ pairing_tlv_name_to_format = {
     'kTLVType_RetryDelay': 'integer',
     'kTLVType_Salt': 'bytes',
     'kTLVType_Separator': 'null',
+    'kTLVType_SessionID': 'bytes',
     'kTLVType_Signature': 'bytes',
     'kTLVType_State': 'integer'
 }
@@ -274,7 +449,8 @@ pairing_ktlv_method_value_code_to_name = {
     2: "Pair_Verify",
     3: "Add_Pairing",
     4: "Remove_Pairing",
-    5: "List_Pairings"
+    5: "List_Pairings",
+    6: "Resume"
 }
 
 pairing_ktlv_error_code_to_name = {
@@ -289,7 +465,7 @@ pairing_ktlv_error_code_to_name = {
 }
 
 
-class PairingKTLVErrorCodes:
+class PairingKTLVErrorCodes(IntEnum, metaclass=CodeEnumMeta):
     kTLVError_Unknow = 0x01
     kTLVError_Authenticatio = 0x02
     kTLVError_Backof = 0x03
@@ -298,11 +474,8 @@ class PairingKTLVErrorCodes:
     kTLVError_Unavailabl = 0x06
     kTLVError_Bus = 0x07
 
-    def __call__(self, code: int) -> str:
-        return pairing_ktlv_error_code_to_name[code]
-
 
-class PairingKTlvValues:
+class PairingKTlvValues(IntEnum, metaclass=CodeEnumMeta):
     """Pairng service TLV Values."""
     kTLVType_Method = 0x00
     kTLVType_Identifier = 0x01
@@ -318,13 +491,11 @@ class PairingKTlvValues:
     kTLVType_Permissions = 0x0B
     kTLVType_FragmentData = 0x0C
     kTLVType_FragmentLast = 0x0D
+    kTLVType_SessionID = 0x0E
     kTLVType_Separator = 0xFF
 
-    def __call__(self, code: int) -> str:
-        return pairing_tlv_value_to_name[code]
 
-
-class PairingKTLVMethodValues:
+class PairingKTLVMethodValues(IntEnum, metaclass=CodeEnumMeta):
     """Pairing service kTLV method values"""
     Reserved = 0
     Pair_Setup = 1
@@ -332,13 +503,16 @@ class PairingKTLVMethodValues:
     Add_Pairing = 3
     Remove_Pairing = 4
     List_Pairings = 5
+    Resume = 6
+
 
-    def __call__(self, code: int) -> str:
-        """Return the kTLV Type Method value name."""
-        return pairing_ktlv_method_value_code_to_name[code]
+class PairingPermissions(IntEnum):
+    """kTLVType_Permissions values of a pairing"""
+    User = 0x00
+    Admin = 0x01
 
 
-class HapBleStatusCodes:
+class HapBleStatusCodes(IntEnum, metaclass=CodeEnumMeta):
     """HAP Status code definitions and descriptions."""
 
     Success = 0x00
@@ -349,12 +523,8 @@ class HapBleStatusCodes:
     Insufficient_Authentication = 0x05
     Invalid_Request = 0x06
 
-    def __call__(self, code: int) -> str:
-        """Return the status code name."""
-        return status_code_to_name[code]
-
 
-class HapBleOpCodes:
+class HapBleOpCodes(IntEnum, metaclass=CodeEnumMeta):
     """HAP Opcode Descriptions."""
 
     Characteristic_Signature_Read = 0x01
@@ -364,10 +534,6 @@ class HapBleOpCodes:
     Characteristic_Execute_Write = 0x05
     Service_Signature_Read = 0x06
 
-    def __call__(self, code: int) -> str:
-        """Return the op code name."""
-        return op_code_to_name[code]
-
 
 op_code_to_name = {
     1: 'Characteristic_Signature_Read',
@@ -406,3 +572,29 @@ status_code_to_message = {
     0x06:
     'Accessory was not able to perform the requested operation.'
 }
+
+
+def code_table(code_to_value: Dict[int, Any], size: int=256) -> Tuple[Any, ...]:
+    """Values indexed by code, None for the unknown codes.
+
+    Tuple indexing is the cheapest lookup for the one byte codes parsed for
+    every TLV."""
+    return tuple(code_to_value.get(code) for code in range(size))
+
+
+HAP_param_type_names = code_table(HAP_param_type_code_to_name)
+HAP_param_converters = code_table(HAP_param_code_to_converter)
+pairing_tlv_names = code_table(pairing_tlv_value_to_name)
+op_code_names = code_table(op_code_to_name)
+status_code_names = code_table(status_code_to_name)
+
+# Name lookups of the deprecated Enum()(code) API, see CodeEnumMeta
+code_name_lookups = {
+    HapParamTypes: HAP_param_type_code_to_name.__getitem__,
+    PairingKTLVErrorCodes: pairing_ktlv_error_code_to_name.__getitem__,
+    PairingKTlvValues: pairing_tlv_value_to_name.__getitem__,
+    PairingKTLVMethodValues:
+    pairing_ktlv_method_value_code_to_name.__getitem__,
+    HapBleStatusCodes: status_code_to_name.__getitem__,
+    HapBleOpCodes: op_code_to_name.__getitem__,
+}  # type: Dict[EnumMeta, Callable[[int], str]]
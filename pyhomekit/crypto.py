@@ -0,0 +1,297 @@
+"""Crypto providers of the primitives used by the pairing procedures.
+
+A provider implements HKDF-SHA-512, ChaCha20-Poly1305 and Ed25519 on top
+of one library. The provider is chosen once, on first use, from the
+PYHOMEKIT_CRYPTO_PROVIDER environment variable if set, e.g. "sodium", and
+otherwise as the first available in the order of `providers`. Timing the
+providers on the host takes a while, so it is only done on request, e.g. at
+startup::
+
+    crypto.set_provider(crypto.select_provider())
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+
+from typing import Dict, List, Optional, Sequence, Type, Union  # NOQA pylint: disable=W0611
+from typing import TYPE_CHECKING
+
+from .utils import LazyModule
+
+if TYPE_CHECKING:
+    import libnacl
+    from cryptography import exceptions
+    from cryptography.hazmat import backends
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+    from cryptography.hazmat.primitives.ciphers import aead
+    from cryptography.hazmat.primitives.kdf import hkdf
+else:
+    # Imported on first use
+    libnacl = LazyModule('libnacl')
+    exceptions = LazyModule('cryptography.exceptions')
+    backends = LazyModule('cryptography.hazmat.backends')
+    hashes = LazyModule('cryptography.hazmat.primitives.hashes')
+    serialization = LazyModule('cryptography.hazmat.primitives.serialization')
+    ed25519 = LazyModule('cryptography.hazmat.primitives.asymmetric.ed25519')
+    aead = LazyModule('cryptography.hazmat.primitives.ciphers.aead')
+    hkdf = LazyModule('cryptography.hazmat.primitives.kdf.hkdf')
+
+logger = logging.getLogger(__name__)
+
+seed_size = 32
+public_key_size = 32
+provider_env_variable = 'PYHOMEKIT_CRYPTO_PROVIDER'
+
+
+def hkdf_sha512(key: bytes, salt: bytes, info: bytes, length: int) -> bytes:
+    """HKDF-SHA-512 of RFC 5869, with the standard library HMAC."""
+    prk = hmac.new(salt or bytes(64), key, hashlib.sha512).digest()
+    output = b''
+    block = b''
+    counter = 1
+    while len(output) < length:
+        block = hmac.new(prk, block + info + bytes([counter]),
+                         hashlib.sha512).digest()
+        output += block
+        counter += 1
+    return output[:length]
+
+
+class CryptoProvider:
+    """Primitives of the pairing procedures.
+
+    Ed25519 secret keys are either the 32 byte seed, or the 64 byte seed and
+    public key of libsodium and the ed25519 package. Failed authentications
+    raise ValueError for decrypt, and return False for verify.
+    """
+    name = ''
+
+    def hkdf_sha512(self, key: bytes, salt: bytes, info: bytes,
+                    length: int) -> bytes:
+        """Derive length bytes from key."""
+        raise NotImplementedError
+
+    def encrypt(self, key: bytes, nonce: bytes, plaintext: bytes,
+                aad: bytes=b'') -> bytes:
+        """ChaCha20-Poly1305 encryption, with the auth tag appended."""
+        raise NotImplementedError
+
+    def decrypt(self, key: bytes, nonce: bytes, ciphertext: bytes,
+                aad: bytes=b'') -> bytes:
+        """ChaCha20-Poly1305 decryption of a message with its auth tag."""
+        raise NotImplementedError
+
+    def public_key(self, secret_key: bytes) -> bytes:
+        """Ed25519 public key of a secret key."""
+        raise NotImplementedError
+
+    def sign(self, secret_key: bytes, message: bytes) -> bytes:
+        """Ed25519 signature of the message."""
+        raise NotImplementedError
+
+    def verify(self, public_key: bytes, signature: bytes,
+               message: bytes) -> bool:
+        """Check an Ed25519 signature."""
+        raise NotImplementedError
+
+
+class SodiumProvider(CryptoProvider):
+    """libsodium, through libnacl. HKDF uses the standard library HMAC."""
+    name = 'sodium'
+
+    def __init__(self) -> None:
+        self._encrypt = libnacl.crypto_aead_chacha20poly1305_ietf_encrypt
+        self._decrypt = libnacl.crypto_aead_chacha20poly1305_ietf_decrypt
+        self._seed_keypair = libnacl.crypto_sign_seed_keypair
+        self._sign = libnacl.crypto_sign_detached
+        self._verify = libnacl.crypto_sign_verify_detached
+
+    def hkdf_sha512(self, key: bytes, salt: bytes, info: bytes,
+                    length: int) -> bytes:
+        return hkdf_sha512(key, salt, info, length)
+
+    def encrypt(self, key: bytes, nonce: bytes, plaintext: bytes,
+                aad: bytes=b'') -> bytes:
+        return self._encrypt(plaintext, aad, nonce, key)
+
+    def decrypt(self, key: bytes, nonce: bytes, ciphertext: bytes,
+                aad: bytes=b'') -> bytes:
+        return self._decrypt(ciphertext, aad, nonce, key)
+
+    def _expand(self, secret_key: bytes) -> bytes:
+        """libsodium secret key: seed and public key."""
+        if len(secret_key) == seed_size:
+            return self._seed_keypair(secret_key)[1]
+        return secret_key
+
+    def public_key(self, secret_key: bytes) -> bytes:
+        return self._expand(secret_key)[seed_size:]
+
+    def sign(self, secret_key: bytes, message: bytes) -> bytes:
+        return self._sign(message, self._expand(secret_key))
+
+    def verify(self, public_key: bytes, signature: bytes,
+               message: bytes) -> bool:
+        try:
+            self._verify(signature, message, public_key)
+        except ValueError:
+            return False
+        return True
+
+
+class CryptographyProvider(CryptoProvider):
+    """pyca/cryptography, on OpenSSL."""
+    name = 'cryptography'
+
+    def __init__(self) -> None:
+        self._backend = backends.default_backend()
+        self._sha512 = hashes.SHA512()
+        self._aead = aead.ChaCha20Poly1305
+        self._private_key = ed25519.Ed25519PrivateKey.from_private_bytes
+        self._public_key = ed25519.Ed25519PublicKey.from_public_bytes
+        self._invalid = (exceptions.InvalidSignature, exceptions.InvalidTag)
+
+    def hkdf_sha512(self, key: bytes, salt: bytes, info: bytes,
+                    length: int) -> bytes:
+        return hkdf.HKDF(
+            algorithm=self._sha512,
+            length=length,
+            salt=salt,
+            info=info,
+            backend=self._backend).derive(key)
+
+    def encrypt(self, key: bytes, nonce: bytes, plaintext: bytes,
+                aad: bytes=b'') -> bytes:
+        return self._aead(key).encrypt(nonce, plaintext, aad)
+
+    def decrypt(self, key: bytes, nonce: bytes, ciphertext: bytes,
+                aad: bytes=b'') -> bytes:
+        try:
+            return self._aead(key).decrypt(nonce, ciphertext, aad)
+        except self._invalid:
+            raise ValueError("Failed to decrypt message: invalid auth tag.")
+
+    def public_key(self, secret_key: bytes) -> bytes:
+        if len(secret_key) > seed_size:
+            return secret_key[seed_size:]
+        return self._private_key(secret_key).public_key().public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+
+    def sign(self, secret_key: bytes, message: bytes) -> bytes:
+        return self._private_key(secret_key[:seed_size]).sign(message)
+
+    def verify(self, public_key: bytes, signature: bytes,
+               message: bytes) -> bool:
+        try:
+            self._public_key(public_key).verify(signature, message)
+        except self._invalid:
+            return False
+        return True
+
+
+providers = {
+    SodiumProvider.name: SodiumProvider,
+    CryptographyProvider.name: CryptographyProvider,
+}  # type: Dict[str, Type[CryptoProvider]]
+
+
+def available_providers(names: Sequence[str]=None) -> List[CryptoProvider]:
+    """Instances of the providers whose library is installed."""
+    available = []  # type: List[CryptoProvider]
+    for name in names or providers:
+        try:
+            available.append(providers[name]())
+        except (ImportError, AttributeError) as e:
+            logger.debug("Crypto provider %s unavailable: %s", name, e)
+    return available
+
+
+def time_provider(provider: CryptoProvider, number: int=20) -> float:
+    """Mean duration in s of the crypto of a pair verify."""
+    key = bytes(32)
+    nonce = bytes(12)
+    message = bytes(96)
+    public_key = provider.public_key(key)
+    signature = provider.sign(key, message)
+    start = time.perf_counter()
+    for _ in range(number):
+        session_key = provider.hkdf_sha512(key, b'salt', b'info', 32)
+        provider.decrypt(session_key, nonce,
+                         provider.encrypt(session_key, nonce, message))
+        provider.sign(key, message)
+        provider.verify(public_key, signature, message)
+    return (time.perf_counter() - start) / number
+
+
+def select_provider(names: Sequence[str]=None,
+                    number: int=20) -> CryptoProvider:
+    """Return the fastest of the available providers.
+
+    Parameters
+    ----------
+    names
+        Names of the candidate providers, by default all of them.
+
+    number
+        Number of pair verify workloads timed per provider.
+    """
+    timings = {}  # type: Dict[str, float]
+    fastest = None  # type: Optional[CryptoProvider]
+    for provider in available_providers(names):
+        timings[provider.name] = time_provider(provider, number)
+        if fastest is None or timings[provider.name] < timings[fastest.name]:
+            fastest = provider
+    if fastest is None:
+        raise ImportError("No crypto provider available, install libnacl "
+                          "or cryptography.")
+    logger.debug("Selected crypto provider %s, timings: %s", fastest.name,
+                 timings)
+    return fastest
+
+
+def default_provider() -> CryptoProvider:
+    """The provider named by the environment, or the first available one.
+
+    Unlike select_provider, nothing is timed."""
+    name = os.environ.get(provider_env_variable)
+    if name:
+        if name not in providers:
+            raise ValueError("Unknown crypto provider {}, expected one of {}.".
+                             format(name, ', '.join(providers)))
+        return providers[name]()
+    available = available_providers()
+    if not available:
+        raise ImportError("No crypto provider available, install libnacl "
+                          "or cryptography.")
+    return available[0]
+
+
+_provider = None  # type: Optional[CryptoProvider]
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> CryptoProvider:
+    """Return the crypto provider, see default_provider for the default."""
+    global _provider  # pylint: disable=W0603
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = default_provider()
+                logger.debug("Using crypto provider %s.", _provider.name)
+    return _provider
+
+
+def set_provider(provider: Union[CryptoProvider, str]=None) -> None:
+    """Use this provider, or the default one again on next use if None.
+
+    A provider name can also be given, e.g. 'sodium'."""
+    global _provider  # pylint: disable=W0603
+    if isinstance(provider, str):
+        provider = providers[provider]()
+    with _provider_lock:
+        _provider = provider  # type: ignore
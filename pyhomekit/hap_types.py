@@ -0,0 +1,161 @@
+"""Apple-defined service and characteristic types.
+
+Generated from data/hap_spec.txt by tools/gen_hap_types.py, do not
+edit. See pyhomekit.registry for lookups.
+"""
+# flake8: noqa
+
+# UUID, type, name, format code, unit code, properties, minimum value,
+# maximum value, step value, maximum length, valid values
+characteristics = (
+    ('00000001-0000-1000-8000-0026BB765291', 'administrator-only-access', 'Administrator Only Access', 1, None, 176, None, None, None, None, ()),
+    ('00000005-0000-1000-8000-0026BB765291', 'audio-feedback', 'Audio Feedback', 1, None, 176, None, None, None, None, ()),
+    ('00000008-0000-1000-8000-0026BB765291', 'brightness', 'Brightness', 16, 10157, 176, 0, 100, 1, None, ()),
+    ('0000000D-0000-1000-8000-0026BB765291', 'temperature.cooling-threshold', 'Cooling Threshold Temperature', 20, 10031, 176, 10, 35, 0.1, None, ()),
+    ('0000000E-0000-1000-8000-0026BB765291', 'door-state.current', 'Current Door State', 4, None, 144, 0, 4, 1, None, (0, 1, 2, 3, 4)),
+    ('0000000F-0000-1000-8000-0026BB765291', 'heating-cooling.current', 'Current Heating Cooling State', 4, None, 144, 0, 2, 1, None, (0, 1, 2)),
+    ('00000010-0000-1000-8000-0026BB765291', 'relative-humidity.current', 'Current Relative Humidity', 20, 10157, 144, 0, 100, 1, None, ()),
+    ('00000011-0000-1000-8000-0026BB765291', 'temperature.current', 'Current Temperature', 20, 10031, 144, 0, 100, 0.1, None, ()),
+    ('00000012-0000-1000-8000-0026BB765291', 'temperature.heating-threshold', 'Heating Threshold Temperature', 20, 10031, 176, 0, 25, 0.1, None, ()),
+    ('00000013-0000-1000-8000-0026BB765291', 'hue', 'Hue', 20, 10083, 176, 0, 360, 1, None, ()),
+    ('00000014-0000-1000-8000-0026BB765291', 'identify', 'Identify', 1, None, 32, None, None, None, None, ()),
+    ('00000019-0000-1000-8000-0026BB765291', 'lock-management.control-point', 'Lock Control Point', 27, None, 32, None, None, None, None, ()),
+    ('0000001A-0000-1000-8000-0026BB765291', 'lock-management.auto-secure-timeout', 'Lock Management Auto Security Timeout', 8, 9987, 176, None, None, None, None, ()),
+    ('0000001C-0000-1000-8000-0026BB765291', 'lock-mechanism.last-known-action', 'Lock Last Known Action', 4, None, 144, 0, 8, 1, None, (0, 1, 2, 3, 4, 5, 6, 7, 8)),
+    ('0000001D-0000-1000-8000-0026BB765291', 'lock-mechanism.current-state', 'Lock Current State', 4, None, 144, 0, 3, 1, None, (0, 1, 2, 3)),
+    ('0000001E-0000-1000-8000-0026BB765291', 'lock-mechanism.target-state', 'Lock Target State', 4, None, 176, 0, 1, 1, None, (0, 1)),
+    ('0000001F-0000-1000-8000-0026BB765291', 'logs', 'Logs', 27, None, 144, None, None, None, None, ()),
+    ('00000020-0000-1000-8000-0026BB765291', 'manufacturer', 'Manufacturer', 25, None, 16, None, None, None, 64, ()),
+    ('00000021-0000-1000-8000-0026BB765291', 'model', 'Model', 25, None, 16, None, None, None, 64, ()),
+    ('00000022-0000-1000-8000-0026BB765291', 'motion-detected', 'Motion Detected', 1, None, 144, None, None, None, None, ()),
+    ('00000023-0000-1000-8000-0026BB765291', 'name', 'Name', 25, None, 16, None, None, None, 64, ()),
+    ('00000024-0000-1000-8000-0026BB765291', 'obstruction-detected', 'Obstruction Detected', 1, None, 144, None, None, None, None, ()),
+    ('00000025-0000-1000-8000-0026BB765291', 'on', 'On', 1, None, 176, None, None, None, None, ()),
+    ('00000026-0000-1000-8000-0026BB765291', 'outlet-in-use', 'Outlet In Use', 1, None, 144, None, None, None, None, ()),
+    ('00000028-0000-1000-8000-0026BB765291', 'rotation.direction', 'Rotation Direction', 16, None, 176, 0, 1, 1, None, (0, 1)),
+    ('00000029-0000-1000-8000-0026BB765291', 'rotation.speed', 'Rotation Speed', 20, 10157, 176, 0, 100, 1, None, ()),
+    ('0000002F-0000-1000-8000-0026BB765291', 'saturation', 'Saturation', 20, 10157, 176, 0, 100, 1, None, ()),
+    ('00000030-0000-1000-8000-0026BB765291', 'serial-number', 'Serial Number', 25, None, 16, None, None, None, 64, ()),
+    ('00000032-0000-1000-8000-0026BB765291', 'door-state.target', 'Target Door State', 4, None, 176, 0, 1, 1, None, (0, 1)),
+    ('00000033-0000-1000-8000-0026BB765291', 'heating-cooling.target', 'Target Heating Cooling State', 4, None, 176, 0, 3, 1, None, (0, 1, 2, 3)),
+    ('00000034-0000-1000-8000-0026BB765291', 'relative-humidity.target', 'Target Relative Humidity', 20, 10157, 176, 0, 100, 1, None, ()),
+    ('00000035-0000-1000-8000-0026BB765291', 'temperature.target', 'Target Temperature', 20, 10031, 176, 10.0, 38.0, 0.1, None, ()),
+    ('00000036-0000-1000-8000-0026BB765291', 'temperature.units', 'Temperature Display Units', 4, None, 176, 0, 1, 1, None, (0, 1)),
+    ('00000037-0000-1000-8000-0026BB765291', 'version', 'Version', 25, None, 16, None, None, None, 64, ()),
+    ('0000004C-0000-1000-8000-0026BB765291', 'pairing.pair-setup', 'Pair Setup', 27, None, 3, None, None, None, None, ()),
+    ('0000004E-0000-1000-8000-0026BB765291', 'pairing.pair-verify', 'Pair Verify', 27, None, 3, None, None, None, None, ()),
+    ('0000004F-0000-1000-8000-0026BB765291', 'pairing.features', 'Pairing Features', 4, None, 1, None, None, None, None, ()),
+    ('00000050-0000-1000-8000-0026BB765291', 'pairing.pairings', 'Pairing Pairings', 27, None, 48, None, None, None, None, ()),
+    ('00000052-0000-1000-8000-0026BB765291', 'firmware.revision', 'Firmware Revision', 25, None, 16, None, None, None, None, ()),
+    ('00000053-0000-1000-8000-0026BB765291', 'hardware.revision', 'Hardware Revision', 25, None, 16, None, None, None, None, ()),
+    ('00000064-0000-1000-8000-0026BB765291', 'air-particulate.density', 'Air Particulate Density', 20, None, 144, 0, 1000, None, None, ()),
+    ('00000065-0000-1000-8000-0026BB765291', 'air-particulate.size', 'Air Particulate Size', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('00000066-0000-1000-8000-0026BB765291', 'security-system-state.current', 'Security System Current State', 4, None, 144, 0, 4, 1, None, (0, 1, 2, 3, 4)),
+    ('00000067-0000-1000-8000-0026BB765291', 'security-system-state.target', 'Security System Target State', 4, None, 176, 0, 3, 1, None, (0, 1, 2, 3)),
+    ('00000068-0000-1000-8000-0026BB765291', 'battery-level', 'Battery Level', 4, 10157, 144, 0, 100, 1, None, ()),
+    ('00000069-0000-1000-8000-0026BB765291', 'carbon-monoxide.detected', 'Carbon Monoxide Detected', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('0000006A-0000-1000-8000-0026BB765291', 'contact-state', 'Contact Sensor State', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('0000006B-0000-1000-8000-0026BB765291', 'light-level.current', 'Current Ambient Light Level', 20, 10033, 144, 0.0001, 100000, None, None, ()),
+    ('0000006C-0000-1000-8000-0026BB765291', 'horizontal-tilt.current', 'Current Horizontal Tilt Angle', 16, 10083, 144, -90, 90, 1, None, ()),
+    ('0000006D-0000-1000-8000-0026BB765291', 'position.current', 'Current Position', 4, 10157, 144, 0, 100, 1, None, ()),
+    ('0000006E-0000-1000-8000-0026BB765291', 'vertical-tilt.current', 'Current Vertical Tilt Angle', 16, 10083, 144, -90, 90, 1, None, ()),
+    ('0000006F-0000-1000-8000-0026BB765291', 'position.hold', 'Hold Position', 1, None, 32, None, None, None, None, ()),
+    ('00000070-0000-1000-8000-0026BB765291', 'leak-detected', 'Leak Detected', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('00000071-0000-1000-8000-0026BB765291', 'occupancy-detected', 'Occupancy Detected', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('00000072-0000-1000-8000-0026BB765291', 'position.state', 'Position State', 4, None, 144, 0, 2, 1, None, (0, 1, 2)),
+    ('00000073-0000-1000-8000-0026BB765291', 'input-event', 'Programmable Switch Event', 4, None, 144, 0, 2, 1, None, (0, 1, 2)),
+    ('00000075-0000-1000-8000-0026BB765291', 'status-active', 'Status Active', 1, None, 144, None, None, None, None, ()),
+    ('00000076-0000-1000-8000-0026BB765291', 'smoke-detected', 'Smoke Detected', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('00000077-0000-1000-8000-0026BB765291', 'status-fault', 'Status Fault', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('00000078-0000-1000-8000-0026BB765291', 'status-jammed', 'Status Jammed', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('00000079-0000-1000-8000-0026BB765291', 'status-lo-batt', 'Status Low Battery', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('0000007A-0000-1000-8000-0026BB765291', 'status-tampered', 'Status Tampered', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('0000007B-0000-1000-8000-0026BB765291', 'horizontal-tilt.target', 'Target Horizontal Tilt Angle', 16, 10083, 176, -90, 90, 1, None, ()),
+    ('0000007C-0000-1000-8000-0026BB765291', 'position.target', 'Target Position', 4, 10157, 176, 0, 100, 1, None, ()),
+    ('0000007D-0000-1000-8000-0026BB765291', 'vertical-tilt.target', 'Target Vertical Tilt Angle', 16, 10083, 176, -90, 90, 1, None, ()),
+    ('0000008E-0000-1000-8000-0026BB765291', 'security-system.alarm-type', 'Security System Alarm Type', 4, None, 144, 0, 1, 1, None, ()),
+    ('0000008F-0000-1000-8000-0026BB765291', 'charging-state', 'Charging State', 4, None, 144, 0, 2, 1, None, (0, 1, 2)),
+    ('00000090-0000-1000-8000-0026BB765291', 'carbon-monoxide.level', 'Carbon Monoxide Level', 20, None, 144, 0, 100, None, None, ()),
+    ('00000091-0000-1000-8000-0026BB765291', 'carbon-monoxide.peak-level', 'Carbon Monoxide Peak Level', 20, None, 144, 0, 100, None, None, ()),
+    ('00000092-0000-1000-8000-0026BB765291', 'carbon-dioxide.detected', 'Carbon Dioxide Detected', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('00000093-0000-1000-8000-0026BB765291', 'carbon-dioxide.level', 'Carbon Dioxide Level', 20, None, 144, 0, 100000, None, None, ()),
+    ('00000094-0000-1000-8000-0026BB765291', 'carbon-dioxide.peak-level', 'Carbon Dioxide Peak Level', 20, None, 144, 0, 100000, None, None, ()),
+    ('00000095-0000-1000-8000-0026BB765291', 'air-quality', 'Air Quality', 4, None, 144, 0, 5, 1, None, (0, 1, 2, 3, 4, 5)),
+    ('000000A6-0000-1000-8000-0026BB765291', 'accessory-properties', 'Accessory Flags', 8, None, 144, None, None, None, None, ()),
+    ('000000A7-0000-1000-8000-0026BB765291', 'lock-physical-controls', 'Lock Physical Controls', 4, None, 176, 0, 1, 1, None, (0, 1)),
+    ('000000A8-0000-1000-8000-0026BB765291', 'air-purifier.state.target', 'Target Air Purifier State', 4, None, 176, 0, 1, 1, None, (0, 1)),
+    ('000000A9-0000-1000-8000-0026BB765291', 'air-purifier.state.current', 'Current Air Purifier State', 4, None, 144, 0, 2, 1, None, (0, 1, 2)),
+    ('000000AA-0000-1000-8000-0026BB765291', 'slat.state.current', 'Current Slat State', 4, None, 144, 0, 2, 1, None, (0, 1, 2)),
+    ('000000AB-0000-1000-8000-0026BB765291', 'filter.life-level', 'Filter Life Level', 20, None, 144, 0, 100, 1, None, ()),
+    ('000000AC-0000-1000-8000-0026BB765291', 'filter.change-indication', 'Filter Change Indication', 4, None, 144, 0, 1, 1, None, (0, 1)),
+    ('000000AD-0000-1000-8000-0026BB765291', 'filter.reset-indication', 'Reset Filter Indication', 4, None, 32, 1, 1, None, None, ()),
+    ('000000AF-0000-1000-8000-0026BB765291', 'fan.state.current', 'Current Fan State', 4, None, 144, 0, 2, 1, None, (0, 1, 2)),
+    ('000000B0-0000-1000-8000-0026BB765291', 'active', 'Active', 4, None, 176, 0, 1, 1, None, (0, 1)),
+    ('000000B6-0000-1000-8000-0026BB765291', 'swing-mode', 'Swing Mode', 4, None, 176, 0, 1, 1, None, (0, 1)),
+    ('000000BF-0000-1000-8000-0026BB765291', 'fan.state.target', 'Target Fan State', 4, None, 176, 0, 1, 1, None, (0, 1)),
+    ('000000C0-0000-1000-8000-0026BB765291', 'type.slat', 'Slat Type', 4, None, 16, 0, 1, 1, None, (0, 1)),
+    ('000000C1-0000-1000-8000-0026BB765291', 'tilt.current', 'Current Tilt Angle', 16, 10083, 144, -90, 90, 1, None, ()),
+    ('000000C2-0000-1000-8000-0026BB765291', 'tilt.target', 'Target Tilt Angle', 16, 10083, 176, -90, 90, 1, None, ()),
+    ('000000C3-0000-1000-8000-0026BB765291', 'density.ozone', 'Ozone Density', 20, None, 144, 0, 1000, None, None, ()),
+    ('000000C4-0000-1000-8000-0026BB765291', 'density.no2', 'Nitrogen Dioxide Density', 20, None, 144, 0, 1000, None, None, ()),
+    ('000000C5-0000-1000-8000-0026BB765291', 'density.so2', 'Sulphur Dioxide Density', 20, None, 144, 0, 1000, None, None, ()),
+    ('000000C6-0000-1000-8000-0026BB765291', 'density.pm25', 'PM2.5 Density', 20, None, 144, 0, 1000, None, None, ()),
+    ('000000C7-0000-1000-8000-0026BB765291', 'density.pm10', 'PM10 Density', 20, None, 144, 0, 1000, None, None, ()),
+    ('000000C8-0000-1000-8000-0026BB765291', 'density.voc', 'VOC Density', 20, None, 144, 0, 1000, None, None, ()),
+    ('000000CB-0000-1000-8000-0026BB765291', 'service-label-index', 'Service Label Index', 4, None, 16, 1, None, 1, None, ()),
+    ('000000CD-0000-1000-8000-0026BB765291', 'service-label-namespace', 'Service Label Namespace', 4, None, 16, 0, 1, 1, None, (0, 1)),
+    ('000000CE-0000-1000-8000-0026BB765291', 'color-temperature', 'Color Temperature', 8, None, 176, 50, 400, 1, None, ()),
+    ('00000114-0000-1000-8000-0026BB765291', 'supported-video-stream-configuration', 'Supported Video Stream Configuration', 27, None, 16, None, None, None, None, ()),
+    ('00000115-0000-1000-8000-0026BB765291', 'supported-audio-configuration', 'Supported Audio Stream Configuration', 27, None, 16, None, None, None, None, ()),
+    ('00000116-0000-1000-8000-0026BB765291', 'supported-rtp-configuration', 'Supported RTP Configuration', 27, None, 16, None, None, None, None, ()),
+    ('00000117-0000-1000-8000-0026BB765291', 'selected-rtp-stream-configuration', 'Selected RTP Stream Configuration', 27, None, 32, None, None, None, None, ()),
+    ('00000118-0000-1000-8000-0026BB765291', 'setup-endpoints', 'Setup Endpoints', 27, None, 48, None, None, None, None, ()),
+    ('00000119-0000-1000-8000-0026BB765291', 'volume', 'Volume', 4, 10157, 176, 0, 100, 1, None, ()),
+    ('0000011A-0000-1000-8000-0026BB765291', 'mute', 'Mute', 1, None, 176, None, None, None, None, (0, 1)),
+    ('0000011B-0000-1000-8000-0026BB765291', 'night-vision', 'Night Vision', 1, None, 176, None, None, None, None, (0, 1)),
+    ('0000011C-0000-1000-8000-0026BB765291', 'zoom-optical', 'Optical Zoom', 20, None, 176, None, None, None, None, ()),
+    ('0000011D-0000-1000-8000-0026BB765291', 'zoom-digital', 'Digital Zoom', 20, None, 176, None, None, None, None, ()),
+    ('0000011E-0000-1000-8000-0026BB765291', 'image-rotation', 'Image Rotation', 20, None, 176, None, None, None, None, (0, 90, 180, 270)),
+    ('0000011F-0000-1000-8000-0026BB765291', 'image-mirror', 'Image Mirroring', 1, 10083, 176, None, None, None, None, (0, 1)),
+    ('00000120-0000-1000-8000-0026BB765291', 'streaming-status', 'Streaming Status', 27, None, 144, None, None, None, None, ()),
+)
+
+# UUID, type, name, required characteristics, optional characteristics
+services = (
+    ('0000003E-0000-1000-8000-0026BB765291', 'accessory-information', 'Accessory Information', ('00000014-0000-1000-8000-0026BB765291', '00000020-0000-1000-8000-0026BB765291', '00000021-0000-1000-8000-0026BB765291', '00000023-0000-1000-8000-0026BB765291', '00000030-0000-1000-8000-0026BB765291', '00000052-0000-1000-8000-0026BB765291'), ('00000053-0000-1000-8000-0026BB765291', '000000A6-0000-1000-8000-0026BB765291')),
+    ('00000040-0000-1000-8000-0026BB765291', 'fan', 'Fan', ('00000025-0000-1000-8000-0026BB765291',), ('00000028-0000-1000-8000-0026BB765291', '00000029-0000-1000-8000-0026BB765291', '00000023-0000-1000-8000-0026BB765291')),
+    ('00000041-0000-1000-8000-0026BB765291', 'garage-door-opener', 'Garage Door Opener', ('0000000E-0000-1000-8000-0026BB765291', '00000032-0000-1000-8000-0026BB765291', '00000024-0000-1000-8000-0026BB765291'), ('0000001D-0000-1000-8000-0026BB765291', '0000001E-0000-1000-8000-0026BB765291', '00000023-0000-1000-8000-0026BB765291')),
+    ('00000043-0000-1000-8000-0026BB765291', 'lightbulb', 'Lightbulb', ('00000025-0000-1000-8000-0026BB765291',), ('00000008-0000-1000-8000-0026BB765291', '00000013-0000-1000-8000-0026BB765291', '00000023-0000-1000-8000-0026BB765291', '0000002F-0000-1000-8000-0026BB765291', '000000CE-0000-1000-8000-0026BB765291')),
+    ('00000044-0000-1000-8000-0026BB765291', 'lock-management', 'Lock Management', ('00000019-0000-1000-8000-0026BB765291', '00000037-0000-1000-8000-0026BB765291'), ('0000001F-0000-1000-8000-0026BB765291', '00000005-0000-1000-8000-0026BB765291', '0000001A-0000-1000-8000-0026BB765291', '00000001-0000-1000-8000-0026BB765291', '0000001C-0000-1000-8000-0026BB765291', '0000000E-0000-1000-8000-0026BB765291', '00000022-0000-1000-8000-0026BB765291')),
+    ('00000045-0000-1000-8000-0026BB765291', 'lock-mechanism', 'Lock Mechanism', ('0000001D-0000-1000-8000-0026BB765291', '0000001E-0000-1000-8000-0026BB765291'), ('00000023-0000-1000-8000-0026BB765291',)),
+    ('00000047-0000-1000-8000-0026BB765291', 'outlet', 'Outlet', ('00000025-0000-1000-8000-0026BB765291', '00000026-0000-1000-8000-0026BB765291'), ('00000023-0000-1000-8000-0026BB765291',)),
+    ('00000049-0000-1000-8000-0026BB765291', 'switch', 'Switch', ('00000025-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291',)),
+    ('0000004A-0000-1000-8000-0026BB765291', 'thermostat', 'Thermostat', ('0000000F-0000-1000-8000-0026BB765291', '00000033-0000-1000-8000-0026BB765291', '00000011-0000-1000-8000-0026BB765291', '00000035-0000-1000-8000-0026BB765291', '00000036-0000-1000-8000-0026BB765291'), ('0000000D-0000-1000-8000-0026BB765291', '00000010-0000-1000-8000-0026BB765291', '00000012-0000-1000-8000-0026BB765291', '00000023-0000-1000-8000-0026BB765291', '00000034-0000-1000-8000-0026BB765291')),
+    ('00000055-0000-1000-8000-0026BB765291', 'pairing', 'Pairing Service', ('0000004C-0000-1000-8000-0026BB765291', '0000004E-0000-1000-8000-0026BB765291', '0000004F-0000-1000-8000-0026BB765291'), ()),
+    ('0000007E-0000-1000-8000-0026BB765291', 'security-system', 'Security System', ('00000066-0000-1000-8000-0026BB765291', '00000067-0000-1000-8000-0026BB765291'), ('00000023-0000-1000-8000-0026BB765291', '0000008E-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291')),
+    ('0000007F-0000-1000-8000-0026BB765291', 'sensor.carbon-monoxide', 'Carbon Monoxide Sensor', ('00000069-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291', '00000090-0000-1000-8000-0026BB765291', '00000091-0000-1000-8000-0026BB765291')),
+    ('00000080-0000-1000-8000-0026BB765291', 'sensor.contact', 'Contact Sensor', ('0000006A-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291')),
+    ('00000081-0000-1000-8000-0026BB765291', 'door', 'Door', ('0000006D-0000-1000-8000-0026BB765291', '0000007C-0000-1000-8000-0026BB765291', '00000072-0000-1000-8000-0026BB765291'), ('00000023-0000-1000-8000-0026BB765291', '0000006F-0000-1000-8000-0026BB765291', '00000024-0000-1000-8000-0026BB765291')),
+    ('00000082-0000-1000-8000-0026BB765291', 'sensor.humidity', 'Humidity Sensor', ('00000010-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291')),
+    ('00000083-0000-1000-8000-0026BB765291', 'sensor.leak', 'Leak Sensor', ('00000070-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291')),
+    ('00000084-0000-1000-8000-0026BB765291', 'sensor.light', 'Light Sensor', ('0000006B-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291')),
+    ('00000085-0000-1000-8000-0026BB765291', 'sensor.motion', 'Motion Sensor', ('00000022-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291')),
+    ('00000086-0000-1000-8000-0026BB765291', 'sensor.occupancy', 'Occupancy Sensor', ('00000071-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291')),
+    ('00000087-0000-1000-8000-0026BB765291', 'sensor.smoke', 'Smoke Sensor', ('00000076-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291')),
+    ('00000089-0000-1000-8000-0026BB765291', 'stateless-programmable-switch', 'Stateless Programmable Switch', ('00000073-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '000000CB-0000-1000-8000-0026BB765291')),
+    ('0000008A-0000-1000-8000-0026BB765291', 'sensor.temperature', 'Temperature Sensor', ('00000011-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291')),
+    ('0000008B-0000-1000-8000-0026BB765291', 'window', 'Window', ('0000006D-0000-1000-8000-0026BB765291', '0000007C-0000-1000-8000-0026BB765291', '00000072-0000-1000-8000-0026BB765291'), ('00000023-0000-1000-8000-0026BB765291', '0000006F-0000-1000-8000-0026BB765291', '00000024-0000-1000-8000-0026BB765291')),
+    ('0000008C-0000-1000-8000-0026BB765291', 'window-covering', 'Window Covering', ('0000007C-0000-1000-8000-0026BB765291', '0000006D-0000-1000-8000-0026BB765291', '00000072-0000-1000-8000-0026BB765291'), ('00000023-0000-1000-8000-0026BB765291', '0000006F-0000-1000-8000-0026BB765291', '0000006C-0000-1000-8000-0026BB765291', '0000007B-0000-1000-8000-0026BB765291', '0000006E-0000-1000-8000-0026BB765291', '0000007D-0000-1000-8000-0026BB765291', '00000024-0000-1000-8000-0026BB765291')),
+    ('0000008D-0000-1000-8000-0026BB765291', 'sensor.air-quality', 'Air Quality Sensor', ('00000095-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '000000C3-0000-1000-8000-0026BB765291', '000000C4-0000-1000-8000-0026BB765291', '000000C5-0000-1000-8000-0026BB765291', '000000C6-0000-1000-8000-0026BB765291', '000000C7-0000-1000-8000-0026BB765291', '000000C8-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291')),
+    ('00000096-0000-1000-8000-0026BB765291', 'battery', 'Battery Service', ('00000068-0000-1000-8000-0026BB765291', '0000008F-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291'), ('00000023-0000-1000-8000-0026BB765291',)),
+    ('00000097-0000-1000-8000-0026BB765291', 'sensor.carbon-dioxide', 'Carbon Dioxide Sensor', ('00000092-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000075-0000-1000-8000-0026BB765291', '00000077-0000-1000-8000-0026BB765291', '0000007A-0000-1000-8000-0026BB765291', '00000079-0000-1000-8000-0026BB765291', '00000093-0000-1000-8000-0026BB765291', '00000094-0000-1000-8000-0026BB765291')),
+    ('000000A2-0000-1000-8000-0026BB765291', 'protocol.information.service', 'HAP-BLE 2.0 Protocol Information Service', ('00000037-0000-1000-8000-0026BB765291',), ()),
+    ('000000B7-0000-1000-8000-0026BB765291', 'fanv2', 'Fan v2', ('000000B0-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '000000AF-0000-1000-8000-0026BB765291', '000000BF-0000-1000-8000-0026BB765291', '00000028-0000-1000-8000-0026BB765291', '00000029-0000-1000-8000-0026BB765291', '000000B6-0000-1000-8000-0026BB765291', '000000A7-0000-1000-8000-0026BB765291')),
+    ('000000B9-0000-1000-8000-0026BB765291', 'vertical-slat', 'Slat', ('000000AA-0000-1000-8000-0026BB765291', '000000C0-0000-1000-8000-0026BB765291'), ('00000023-0000-1000-8000-0026BB765291', '000000B6-0000-1000-8000-0026BB765291', '000000C1-0000-1000-8000-0026BB765291', '000000C2-0000-1000-8000-0026BB765291')),
+    ('000000BA-0000-1000-8000-0026BB765291', 'filter-maintenance', 'Filter Maintenance', ('000000AC-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '000000AB-0000-1000-8000-0026BB765291', '000000AD-0000-1000-8000-0026BB765291')),
+    ('000000BB-0000-1000-8000-0026BB765291', 'air-purifier', 'Air Purifier', ('000000B0-0000-1000-8000-0026BB765291', '000000A9-0000-1000-8000-0026BB765291', '000000A8-0000-1000-8000-0026BB765291'), ('00000023-0000-1000-8000-0026BB765291', '00000029-0000-1000-8000-0026BB765291', '000000B6-0000-1000-8000-0026BB765291', '000000A7-0000-1000-8000-0026BB765291')),
+    ('00000110-0000-1000-8000-0026BB765291', 'camera-rtp-stream-management', 'Camera RTP Stream Management', ('00000120-0000-1000-8000-0026BB765291', '00000114-0000-1000-8000-0026BB765291', '00000115-0000-1000-8000-0026BB765291', '00000116-0000-1000-8000-0026BB765291', '00000118-0000-1000-8000-0026BB765291', '00000117-0000-1000-8000-0026BB765291'), ()),
+    ('00000112-0000-1000-8000-0026BB765291', 'microphone', 'Microphone', ('0000011A-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000119-0000-1000-8000-0026BB765291')),
+    ('00000113-0000-1000-8000-0026BB765291', 'speaker', 'Speaker', ('0000011A-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000119-0000-1000-8000-0026BB765291')),
+    ('00000121-0000-1000-8000-0026BB765291', 'doorbell', 'Doorbell', ('00000073-0000-1000-8000-0026BB765291',), ('00000023-0000-1000-8000-0026BB765291', '00000119-0000-1000-8000-0026BB765291', '00000008-0000-1000-8000-0026BB765291')),
+)
@@ -0,0 +1,299 @@
+"""Storage of the long term keys of the controller and its pairings.
+
+The storage folder holds the secret key of the controller, and an index of
+the long term public keys of all the paired accessories. The whole index
+is loaded in a single read, and every write replaces the file atomically.
+Checkpoints of pair setups in progress are kept in a subfolder, encrypted
+with a key derived from the secret key of the controller.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional  # NOQA pylint: disable=W0611
+from typing import TYPE_CHECKING
+
+from . import crypto
+from .utils import LazyModule
+
+if TYPE_CHECKING:
+    import ed25519
+else:
+    ed25519 = LazyModule('ed25519')
+
+logger = logging.getLogger(__name__)
+
+secret_key_file_name = "secret-key"
+index_file_name = "pairings.json"
+index_version = 1
+checkpoint_folder_name = "checkpoints"
+checkpoint_nonce_size = 12
+
+# Single pairing files written by earlier versions
+legacy_pairing_id_file_name = "accessory_pairing_id"
+legacy_ltpk_file_name = "accessory_ltpk"
+
+
+def atomic_write(path: str, data: bytes, mode: int=0o600) -> None:
+    """Write the file through a temporary file, renamed over path.
+
+    Readers see either the previous or the new content, never a partial
+    write, even if the process is interrupted."""
+    folder = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class Keystore:
+    """Long term keys of a controller and of its paired accessories.
+
+    Pairings are kept in memory, keyed by accessory pairing ID. The parsed
+    verifying keys of the accessories and the signing key of the controller
+    are cached.
+
+    Parameters
+    ----------
+    storage_folder
+        Folder path to store the pairing keys.
+        This folder should be secure to prevent unauthorized access.
+    """
+
+    def __init__(self, storage_folder: str) -> None:
+        self.storage_folder = storage_folder
+        self._pairings = {}  # type: Dict[str, Dict[str, Any]]
+        self._verifying_keys = {}  # type: Dict[str, ed25519.VerifyingKey]
+        self._signing_key = None  # type: Optional[ed25519.SigningKey]
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._batch_dirty = False
+        self.load()
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.storage_folder, index_file_name)
+
+    @property
+    def secret_key_path(self) -> str:
+        return os.path.join(self.storage_folder, secret_key_file_name)
+
+    def load(self) -> None:
+        """(Re)load the index from disk, dropping the cached keys."""
+        with self._lock:
+            self._verifying_keys = {}
+            self._signing_key = None
+            try:
+                with open(self.index_path, 'rb') as index_file:
+                    index = json.loads(index_file.read().decode('utf-8'))
+            except FileNotFoundError:
+                self._pairings = {}
+                self._import_legacy_pairing()
+                return
+            if index.get('version') != index_version:
+                raise ValueError("Unsupported keystore version {}.".format(
+                    index.get('version')))
+            self._pairings = index['pairings']
+        logger.debug("Loaded %s pairings from %s.", len(self._pairings),
+                     self.index_path)
+
+    def _import_legacy_pairing(self) -> None:
+        """Import the pairing stored in loose files by earlier versions."""
+        try:
+            with open(
+                    os.path.join(self.storage_folder,
+                                 legacy_pairing_id_file_name),
+                    'rb') as pairing_id_file:
+                pairing_id = pairing_id_file.read()
+            with open(
+                    os.path.join(self.storage_folder, legacy_ltpk_file_name),
+                    'rb') as ltpk_file:
+                ltpk = ltpk_file.read()
+        except FileNotFoundError:
+            return
+        logger.debug("Importing legacy pairing with %s.", pairing_id)
+        self.add_pairing(pairing_id, ltpk)
+
+    def _save(self) -> None:
+        """Write the index, unless a batch is in progress."""
+        if self._batch_depth:
+            self._batch_dirty = True
+            return
+        index = {'version': index_version, 'pairings': self._pairings}
+        atomic_write(self.index_path,
+                     json.dumps(index, sort_keys=True).encode('utf-8'))
+
+    @contextmanager
+    def batch(self) -> Iterator['Keystore']:
+        """Group changes, writing the index once at the end."""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._batch_dirty:
+                    self._batch_dirty = False
+                    self._save()
+
+    def controller_signing_key(self,
+                               create: bool=False) -> 'ed25519.SigningKey':
+        """Return the long term secret key of the controller.
+
+        Parameters
+        ----------
+        create
+            Generate and store a new key if there is none yet.
+        """
+        with self._lock:
+            if self._signing_key is None:
+                try:
+                    with open(self.secret_key_path, 'rb') as secret_key_file:
+                        self._signing_key = ed25519.SigningKey(
+                            secret_key_file.read())
+                except FileNotFoundError:
+                    if not create:
+                        raise ValueError("No controller key in {}.".format(
+                            self.storage_folder))
+                    signing_key, _ = ed25519.create_keypair()
+                    atomic_write(self.secret_key_path, signing_key.to_bytes())
+                    self._signing_key = signing_key
+            return self._signing_key
+
+    def _checkpoint_path(self, name: str) -> str:
+        file_name = ''.join(c if c.isalnum() else '_' for c in name)
+        return os.path.join(self.storage_folder, checkpoint_folder_name,
+                            file_name + '.checkpoint')
+
+    def _checkpoint_key(self) -> bytes:
+        signing_key = self.controller_signing_key(create=True)
+        return crypto.get_provider().hkdf_sha512(
+            signing_key.to_bytes()[:32], b"Pair-Setup-Checkpoint-Salt",
+            b"Pair-Setup-Checkpoint-Info", 32)
+
+    def seal(self, data: bytes, associated_data: bytes) -> bytes:
+        """Encrypt secrets to store, with a key of the controller.
+
+        The associated data, e.g. the name of the secret, is authenticated:
+        the secret can only be unsealed with the same one."""
+        nonce = os.urandom(checkpoint_nonce_size)
+        return nonce + crypto.get_provider().encrypt(
+            self._checkpoint_key(), nonce, data, associated_data)
+
+    def unseal(self, data: bytes, associated_data: bytes) -> bytes:
+        """Decrypt sealed secrets.
+
+        Raises ValueError if they were tampered with, or sealed by another
+        controller key."""
+        nonce = data[:checkpoint_nonce_size]
+        return crypto.get_provider().decrypt(
+            self._checkpoint_key(), nonce, data[checkpoint_nonce_size:],
+            associated_data)
+
+    def save_checkpoint(self, name: str, data: bytes) -> None:
+        """Encrypt and store the checkpoint of a pair setup.
+
+        Parameters
+        ----------
+        name
+            Name of the checkpoint, e.g. the address of the accessory.
+
+        data
+            Serialized state of the pair setup.
+        """
+        path = self._checkpoint_path(name)
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        atomic_write(path, self.seal(data, name.encode('utf-8')))
+
+    def load_checkpoint(self, name: str) -> Optional[bytes]:
+        """Return the decrypted checkpoint, or None if there is none.
+
+        Raises ValueError if the checkpoint was tampered with, or written by
+        another controller key."""
+        try:
+            with open(self._checkpoint_path(name), 'rb') as checkpoint_file:
+                data = checkpoint_file.read()
+        except FileNotFoundError:
+            return None
+        return self.unseal(data, name.encode('utf-8'))
+
+    def remove_checkpoint(self, name: str) -> None:
+        """Delete the checkpoint, if any."""
+        try:
+            os.unlink(self._checkpoint_path(name))
+        except FileNotFoundError:
+            pass
+
+    def add_pairing(self, accessory_pairing_id: bytes,
+                    accessory_ltpk: bytes) -> None:
+        """Store the long term public key of a paired accessory."""
+        key = accessory_pairing_id.decode('utf-8')
+        with self._lock:
+            self._pairings[key] = {
+                'ltpk': accessory_ltpk.hex(),
+                'created': time.time()
+            }
+            self._verifying_keys.pop(key, None)
+            self._save()
+
+    def remove_pairing(self, accessory_pairing_id: bytes) -> None:
+        """Forget a paired accessory."""
+        key = accessory_pairing_id.decode('utf-8')
+        with self._lock:
+            if self._pairings.pop(key, None) is not None:
+                self._verifying_keys.pop(key, None)
+                self._save()
+
+    def accessory_ltpk(self, accessory_pairing_id: bytes) -> bytes:
+        """Return the long term public key of a paired accessory."""
+        key = accessory_pairing_id.decode('utf-8')
+        try:
+            pairing = self._pairings[key]
+        except KeyError:
+            raise ValueError("Unknown accessory {}.".format(key))
+        return bytes.fromhex(pairing['ltpk'])
+
+    def verifying_key(self,
+                      accessory_pairing_id: bytes) -> 'ed25519.VerifyingKey':
+        """Return the parsed long term public key of a paired accessory."""
+        key = accessory_pairing_id.decode('utf-8')
+        verifying_key = self._verifying_keys.get(key)
+        if verifying_key is None:
+            verifying_key = ed25519.VerifyingKey(
+                self.accessory_ltpk(accessory_pairing_id))
+            self._verifying_keys[key] = verifying_key
+        return verifying_key
+
+    def __contains__(self, accessory_pairing_id: bytes) -> bool:
+        return accessory_pairing_id.decode('utf-8') in self._pairings
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter([key.encode('utf-8') for key in list(self._pairings)])
+
+    def __len__(self) -> int:
+        return len(self._pairings)
+
+
+_keystores = {}  # type: Dict[str, Keystore]
+_keystores_lock = threading.Lock()
+
+
+def get_keystore(storage_folder: str) -> Keystore:
+    """Return the keystore of the folder, loaded once per process."""
+    path = os.path.abspath(storage_folder)
+    with _keystores_lock:
+        if path not in _keystores:
+            _keystores[path] = Keystore(storage_folder)
+        return _keystores[path]
@@ -0,0 +1,442 @@
+"""Compact model of the services and characteristics of accessories.
+
+A controller keeps the signature of every characteristic of every accessory
+it manages, so the records of this module use __slots__ instead of a
+per-instance __dict__, UUIDs are interned so that the same type is stored
+once across all accessories, and the format and unit of a characteristic
+are kept as their integer codes, the names being looked up on access.
+"""
+
+import math
+import sys
+
+from functools import lru_cache
+from struct import Struct
+from typing import Any, Callable, Dict, Optional, Tuple  # NOQA pylint: disable=W0611
+from typing import Iterator, List, Sequence  # NOQA pylint: disable=W0611
+
+from . import constants
+
+
+def intern_uuid(uuid: str) -> str:
+    """Return the shared instance of a UUID string."""
+    return sys.intern(uuid)
+
+
+class CharacteristicSignature:
+    """Signature of a HAP characteristic, as returned by a signature read.
+
+    Parameters
+    ----------
+    characteristic_type
+        UUID of the type of the characteristic.
+
+    service_type
+        UUID of the type of the service it belongs to.
+
+    service_instance_id
+        Instance ID of the service it belongs to.
+
+    properties
+        HAP characteristic properties bit field.
+
+    format_code
+        GATT format code of the value, see constants.format_code_to_name.
+
+    unit_code
+        GATT unit code of the value, see constants.unit_code_to_name.
+
+    user_description
+        User description of the characteristic.
+
+    min_value, max_value
+        Valid range of the value, decoded in its format.
+
+    step_value
+        Minimum step of the value.
+
+    valid_values, valid_values_range
+        Raw valid values descriptors.
+    """
+
+    __slots__ = ('characteristic_type', 'service_type', 'service_instance_id',
+                 'properties', 'format_code', 'unit_code', 'user_description',
+                 'min_value', 'max_value', 'step_value', 'valid_values',
+                 'valid_values_range')
+
+    def __init__(self,
+                 characteristic_type: Optional[str]=None,
+                 service_type: Optional[str]=None,
+                 service_instance_id: Optional[int]=None,
+                 properties: int=0,
+                 format_code: Optional[int]=None,
+                 unit_code: Optional[int]=None,
+                 user_description: Optional[str]=None,
+                 min_value: Any=None,
+                 max_value: Any=None,
+                 step_value: Optional[bytes]=None,
+                 valid_values: Optional[bytes]=None,
+                 valid_values_range: Optional[bytes]=None) -> None:
+        self.characteristic_type = (intern_uuid(characteristic_type)
+                                    if characteristic_type else None)
+        self.service_type = intern_uuid(service_type) if service_type else None
+        self.service_instance_id = service_instance_id
+        self.properties = properties
+        self.format_code = format_code
+        self.unit_code = unit_code
+        self.user_description = user_description
+        self.min_value = min_value
+        self.max_value = max_value
+        self.step_value = step_value
+        self.valid_values = valid_values
+        self.valid_values_range = valid_values_range
+
+    @classmethod
+    def from_attributes(cls,
+                        attributes: Dict[str, Any]) -> 'CharacteristicSignature':
+        """Build the signature from a parsed signature read response."""
+        return cls(
+            characteristic_type=attributes.get('characteristic_type'),
+            service_type=attributes.get('service_type'),
+            service_instance_id=attributes.get('service_instance_id'),
+            properties=attributes.get(
+                'hap_characteristic_properties_descriptor', 0),
+            format_code=attributes.get('hap_format_code'),
+            unit_code=attributes.get('hap_unit_code'),
+            user_description=attributes.get(
+                'gatt_user_description_descriptor'),
+            min_value=attributes.get('min_value'),
+            max_value=attributes.get('max_value'),
+            step_value=attributes.get('hap_step_value_descriptor'),
+            valid_values=attributes.get('hap_valid_values_descriptor'),
+            valid_values_range=attributes.get(
+                'hap_valid_values_range_descriptor'))
+
+    @property
+    def hap_format(self) -> Optional[str]:
+        """Name of the format of the value."""
+        if self.format_code is None:
+            return None
+        return constants.format_code_to_name.get(self.format_code)
+
+    @property
+    def hap_unit(self) -> Optional[str]:
+        """Name of the unit of the value."""
+        if self.unit_code is None:
+            return None
+        return constants.unit_code_to_name.get(self.unit_code)
+
+    @property
+    def hap_format_converter(self) -> Callable[[bytes], Any]:
+        """Decodes the value from its format, or returns the bytes as is."""
+        hap_format = self.hap_format
+        if hap_format is None:
+            return constants.identity
+        return constants.format_name_to_converter.get(hap_format,
+                                                      constants.identity)
+
+    @property
+    def value_encoder(self) -> 'ValueEncoder':
+        """Validates and encodes values in the format of the signature."""
+        return value_encoder(self.hap_format or 'data', self.min_value,
+                             self.max_value, self.step_value,
+                             self.valid_values)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CharacteristicSignature):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name)
+            for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return "CharacteristicSignature({})".format(", ".join(
+            "{}={!r}".format(name, getattr(self, name))
+            for name in self.__slots__ if getattr(self, name) is not None))
+
+
+class ValueEncoder:
+    """Validates values and encodes them in a HAP format, for writes.
+
+    The range is the valid range of the signature, within the range of the
+    format. Use CharacteristicSignature.value_encoder, which shares the
+    encoders of identical signatures.
+
+    Parameters
+    ----------
+    format_name
+        Name of the format, see constants.format_name_to_encoder.
+
+    min_value, max_value
+        Valid range of the values.
+
+    step_value
+        Minimum step of the values, from min_value.
+
+    valid_values
+        Valid values of an uint8 value, as bytes.
+    """
+
+    __slots__ = ('format_name', 'min_value', 'max_value', 'step_value',
+                 'valid_values', '_encoder', '_struct_code')
+
+    # Tolerance of the step of float values
+    step_tolerance = 1e-6
+
+    def __init__(self,
+                 format_name: str,
+                 min_value: Any=None,
+                 max_value: Any=None,
+                 step_value: Any=None,
+                 valid_values: Optional[bytes]=None) -> None:
+        if format_name not in constants.format_name_to_encoder:
+            raise ValueError("Unknown format {}".format(format_name))
+        low, high = constants.format_name_to_range.get(format_name,
+                                                       (None, None))
+        self.format_name = format_name
+        self.min_value = low if min_value is None else min_value
+        self.max_value = high if max_value is None else max_value
+        # A step not decoded in the format, or of 0, is not enforced
+        self.step_value = step_value if isinstance(
+            step_value, (int, float)) and step_value > 0 else None
+        self.valid_values = valid_values
+        self._encoder = constants.format_name_to_encoder[format_name]
+        self._struct_code = constants.format_name_to_struct_code.get(
+            format_name)
+
+    def validate(self, value: Any) -> None:
+        """Raise ValueError if the value can not be written."""
+        if self._struct_code is None:
+            expected = str if self.format_name == 'string' else (bytes,
+                                                                 bytearray)
+            if not isinstance(value, expected):
+                raise ValueError("Invalid {} value {!r}".format(
+                    self.format_name, value))
+            return
+        if self.format_name != 'float' and not isinstance(value, int):
+            raise ValueError("Invalid {} value {!r}".format(
+                self.format_name, value))
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError("Invalid float value {!r}".format(value))
+        if ((self.min_value is not None and value < self.min_value) or
+                (self.max_value is not None and value > self.max_value)):
+            raise ValueError("Value {!r} out of range [{}, {}]".format(
+                value, self.min_value, self.max_value))
+        if self.step_value is not None:
+            offset = value - (self.min_value or 0)
+            if isinstance(offset, int) and isinstance(self.step_value, int):
+                off_step = offset % self.step_value != 0
+            else:
+                steps = offset / self.step_value
+                off_step = abs(steps - round(steps)) > self.step_tolerance
+            if off_step:
+                raise ValueError("Value {!r} is not a multiple of step {}".
+                                 format(value, self.step_value))
+        if (self.valid_values is not None and
+                value not in list(self.valid_values)):
+            raise ValueError("Value {!r} not in valid values {}".format(
+                value, list(self.valid_values)))
+
+    def _in_range(self, values: Sequence[Any]) -> bool:
+        """Whether a batch of numbers is valid, if only the range applies."""
+        if (not values or self._struct_code is None or
+                self.step_value is not None or self.valid_values is not None):
+            return False
+        number = float if self.format_name == 'float' else int
+        if not all(isinstance(value, number) for value in values):
+            return False
+        if number is float and not all(map(math.isfinite, values)):
+            return False
+        return ((self.min_value is None or min(values) >= self.min_value) and
+                (self.max_value is None or max(values) <= self.max_value))
+
+    def __call__(self, value: Any) -> bytes:
+        """Validate and encode a value."""
+        self.validate(value)
+        return self._encoder(value)
+
+    def encode_many(self, values: Sequence[Any]) -> List[bytes]:
+        """Validate and encode a batch of values, e.g. for a scene.
+
+        The values of a fixed size format are packed in a single struct
+        call, and checked against the range with a single min and max if
+        there is no step or valid values."""
+        if not self._in_range(values):
+            for value in values:
+                self.validate(value)
+        if self._struct_code is None or not values:
+            return [self._encoder(value) for value in values]
+        packed = Struct('<{}{}'.format(len(values),
+                                       self._struct_code)).pack(*values)
+        size = len(packed) // len(values)
+        return [packed[i:i + size] for i in range(0, len(packed), size)]
+
+    def __repr__(self) -> str:
+        return "ValueEncoder({!r}, {!r}, {!r}, {!r}, {!r})".format(
+            self.format_name, self.min_value, self.max_value,
+            self.step_value, self.valid_values)
+
+
+@lru_cache(maxsize=256)
+def value_encoder(format_name: str,
+                  min_value: Any=None,
+                  max_value: Any=None,
+                  step_value: Any=None,
+                  valid_values: Optional[bytes]=None) -> ValueEncoder:
+    """Return the shared encoder of these parameters."""
+    return ValueEncoder(format_name, min_value, max_value, step_value,
+                        valid_values)
+
+
+class ServiceRecord:
+    """A service of an accessory and the UUIDs of its characteristics.
+
+    Parameters
+    ----------
+    service_type
+        UUID of the type of the service.
+
+    instance_id
+        Instance ID of the service.
+
+    characteristics
+        UUIDs of the GATT characteristics of the service.
+
+    properties
+        HAP service properties bit field, from the service signature.
+
+    linked_services
+        Instance IDs of the linked services, from the service signature.
+    """
+
+    __slots__ = ('service_type', 'instance_id', 'characteristics',
+                 'properties', 'linked_services')
+
+    def __init__(self,
+                 service_type: str,
+                 instance_id: int,
+                 characteristics: Tuple[str, ...]=(),
+                 properties: int=0,
+                 linked_services: Tuple[int, ...]=()) -> None:
+        self.service_type = intern_uuid(service_type)
+        self.instance_id = instance_id
+        self.characteristics = tuple(
+            intern_uuid(uuid) for uuid in characteristics)
+        self.properties = properties
+        self.linked_services = tuple(linked_services)
+
+    @property
+    def primary(self) -> bool:
+        """Whether this is the primary service of the accessory."""
+        return bool(self.properties &
+                    constants.HapServiceProperties.Primary_Service)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ServiceRecord):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name)
+            for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return "ServiceRecord({!r}, {!r}, {!r}, {!r}, {!r})".format(
+            self.service_type, self.instance_id, self.characteristics,
+            self.properties, self.linked_services)
+
+
+class ServiceGraph:
+    """The services of an accessory, indexed, and their links.
+
+    Services are looked up by instance ID, by type, or by the type of one
+    of their characteristics with a dict hit. Types are matched by the raw
+    bytes of their UUID, so in either case.
+
+    Parameters
+    ----------
+    services
+        The services of the accessory.
+    """
+
+    __slots__ = ('services', '_by_instance_id', '_by_type',
+                 '_by_characteristic')
+
+    def __init__(self, services: Sequence[ServiceRecord]) -> None:
+        self.services = tuple(services)
+        self._by_instance_id = {
+            service.instance_id: service
+            for service in self.services
+        }  # type: Dict[int, ServiceRecord]
+        self._by_type = {}  # type: Dict[bytes, List[ServiceRecord]]
+        self._by_characteristic = {
+        }  # type: Dict[bytes, List[ServiceRecord]]
+        # Primary services first, so that they are found by type first
+        for service in sorted(self.services, key=lambda s: not s.primary):
+            self._by_type.setdefault(
+                constants.uuid_bytes(service.service_type), []).append(service)
+            for uuid in service.characteristics:
+                self._by_characteristic.setdefault(
+                    constants.uuid_bytes(uuid), []).append(service)
+
+    def service(self, instance_id: int) -> Optional[ServiceRecord]:
+        """Return the service with this instance ID."""
+        return self._by_instance_id.get(instance_id)
+
+    def services_of_type(self, service_type: str) -> List[ServiceRecord]:
+        """Return the services of this type, the primary service first."""
+        return list(
+            self._by_type.get(constants.uuid_bytes(service_type), ()))
+
+    def service_of_type(self, service_type: str) -> Optional[ServiceRecord]:
+        """Return the service of this type, the primary one if several."""
+        services = self._by_type.get(constants.uuid_bytes(service_type))
+        return services[0] if services else None
+
+    def characteristic_service(self,
+                               characteristic_type: str) -> Optional[ServiceRecord]:
+        """Return the service of a characteristic of this type."""
+        services = self._by_characteristic.get(
+            constants.uuid_bytes(characteristic_type))
+        return services[0] if services else None
+
+    def linked_services(self, service: ServiceRecord) -> List[ServiceRecord]:
+        """Return the services a service links to."""
+        return [
+            self._by_instance_id[instance_id]
+            for instance_id in service.linked_services
+            if instance_id in self._by_instance_id
+        ]
+
+    def __iter__(self) -> Iterator[ServiceRecord]:
+        return iter(self.services)
+
+    def __len__(self) -> int:
+        return len(self.services)
+
+    def __repr__(self) -> str:
+        return "ServiceGraph({!r})".format(self.services)
+
+
+class GattHandles:
+    """ATT handles of a discovered GATT characteristic.
+
+    Only the handles are kept, instead of the bluepy objects which hold a
+    reference to the peripheral and their descriptors.
+
+    Parameters
+    ----------
+    value_handle
+        Handle of the value of the characteristic.
+
+    cid_handle
+        Handle of its Characteristic Instance ID descriptor, if discovered.
+    """
+
+    __slots__ = ('value_handle', 'cid_handle')
+
+    def __init__(self, value_handle: int, cid_handle: Optional[int]=None) -> None:
+        self.value_handle = value_handle
+        self.cid_handle = cid_handle
+
+    def __repr__(self) -> str:
+        return "GattHandles({!r}, {!r})".format(self.value_handle,
+                                                self.cid_handle)
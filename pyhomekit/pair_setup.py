@@ -0,0 +1,321 @@
+"""Pair setup as a resumable state machine.
+
+Pair setup is a sequence of steps: the M1/M2 and M3/M4 SRP exchanges, the
+computation of the signed M5 request, and the M5/M6 exchange. The state of
+the session is kept after each step, in memory and optionally in an
+encrypted checkpoint of the keystore, so that a link lost in the middle of
+the exchange only costs the failed step:
+
+- the requests of M3 and M5 are computed once, and sent again as is after a
+  reconnection, as long as the accessory may still hold its state,
+- if the accessory has dropped its state, or asks to back off, pair setup
+  starts again from M1 after the delay it requires.
+"""
+
+import json
+import logging
+import time
+
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type  # NOQA pylint: disable=W0611
+
+from . import constants
+from .pairing import (ExchangeRequest, PairSetupError, SRPPairSetup, SrpProof,
+                      compute_exchange_request, compute_srp_proof, from_bytes)
+
+logger = logging.getLogger(__name__)
+
+stages = ('srp_start', 'srp_proof', 'srp_verify', 'exchange_request',
+          'exchange', 'paired')
+checkpoint_version = 1
+
+# Errors after which pair setup can start again once the accessory allows it
+retriable_errors = {
+    constants.PairingKTLVErrorCodes.kTLVError_Backof,
+    constants.PairingKTLVErrorCodes.kTLVError_Bus,
+}
+
+
+class LinkLost(Exception):
+    """The request could not be sent, or its response was not received."""
+
+
+class ResumablePairSetup:
+    """Pair setup that survives disconnections.
+
+    Parameters
+    ----------
+    session
+        The pair setup session, fresh or restored from a checkpoint.
+
+    send
+        Sends request kTLVs to the accessory, and returns the parsed
+        response kTLVs.
+
+    executor
+        Executor for the SRP computation of M3.
+
+    on_stage
+        Called with the name of each stage as it starts, as for
+        pairing.run_pair_setup.
+
+    reconnect
+        Called before retrying a step after the link was lost.
+
+    checkpoint
+        Name of the on-disk checkpoint in the keystore of the session, e.g.
+        the address of the accessory. No checkpoint is written if None.
+
+    max_retries
+        Number of retries after lost links and backoff errors, over the
+        whole pair setup.
+
+    retry_delay
+        Delay in s before the first retry. It doubles with each retry, up
+        to max_retry_delay, unless the accessory sends its own delay.
+
+    max_retry_delay
+        Maximum delay in s before a retry, when the accessory does not send
+        its own delay. The delay sent by the accessory is never shortened.
+
+    resume_window
+        Time in s after the last response of the accessory during which it
+        is assumed to hold the state of the pair setup. After that, pair
+        setup starts again from M1.
+
+    transient_errors
+        Exceptions of send that mean the link was lost.
+
+    sleep
+        Called with the delay in s to wait before a retry.
+    """
+
+    def __init__(self,
+                 session: SRPPairSetup,
+                 send: Callable[[List[Tuple[int, bytes]]], Dict[str, Any]],
+                 executor: Executor=None,
+                 on_stage: Callable[[str], None]=None,
+                 reconnect: Callable[[], None]=None,
+                 checkpoint: Optional[str]=None,
+                 max_retries: int=3,
+                 retry_delay: float=1,
+                 max_retry_delay: float=60,
+                 resume_window: float=30,
+                 transient_errors: Tuple[Type[Exception], ...]=(Exception, ),
+                 sleep: Callable[[float], None]=time.sleep) -> None:
+        self.session = session
+        self.send = send
+        self.executor = executor
+        self.on_stage = on_stage
+        self.reconnect = reconnect
+        self.checkpoint = checkpoint  # type: Optional[str]
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.resume_window = resume_window
+        self.transient_errors = transient_errors
+        self.sleep = sleep
+
+        self.stage = 'srp_start'
+        self.retries = 0
+        self.restarts = 0
+        self.last_response = 0.0
+        self.proof = None  # type: Optional[SrpProof]
+        self.exchange_request = None  # type: Optional[ExchangeRequest]
+        # Whether the request of the current stage was already sent once
+        self._resent = False
+        if checkpoint is not None:
+            self._load_checkpoint(checkpoint)
+
+    def run(self) -> SRPPairSetup:
+        """Run pair setup to completion, retrying the failed steps.
+
+        Can be called again after an error: the state is kept in memory."""
+        self._report()
+        while self.stage != 'paired':
+            try:
+                self._step()
+            except LinkLost as e:
+                self._retry(e.__cause__ or e, self._delay())
+                if self.reconnect is not None:
+                    try:
+                        self.reconnect()
+                    except self.transient_errors:
+                        logger.debug("Reconnection failed.", exc_info=True)
+                        continue
+                if time.time() - self.last_response > self.resume_window:
+                    self._restart()
+                else:
+                    self._resent = True
+            except PairSetupError as e:
+                if e.error_code not in retriable_errors:
+                    self._discard()
+                    raise
+                # The delay required by the accessory is honoured as is
+                self._retry(e, e.retry_delay or self._delay())
+                self._restart()
+            except Exception:
+                self._discard()
+                raise
+        return self.session
+
+    def _retry(self, error: BaseException, delay: float) -> None:
+        """Wait before a retry, or raise the error if none is left.
+
+        The checkpoint is kept when the link was lost, so that pair setup
+        can resume later."""
+        if self.retries >= self.max_retries:
+            if isinstance(error, PairSetupError):
+                self._discard()
+            raise error
+        self.retries += 1
+        logger.debug("Pair setup %s failed (%s), retry %s in %.1fs.",
+                     self.stage, error, self.retries, delay)
+        self.sleep(delay)
+
+    def _delay(self) -> float:
+        """Exponential backoff delay, up to max_retry_delay."""
+        return min(self.retry_delay * 2**self.retries, self.max_retry_delay)
+
+    def _restart(self) -> None:
+        """Start again from M1, the accessory has dropped its state."""
+        logger.debug("Restarting pair setup from M1.")
+        self.restarts += 1
+        self.stage = 'srp_start'
+        self.proof = None
+        self.exchange_request = None
+        self._resent = False
+        self._discard()
+        self._report()
+
+    def _set_stage(self, stage: str) -> None:
+        """Move on to the next stage, saving the checkpoint."""
+        self.stage = stage
+        self._resent = False
+        if self.checkpoint is not None and stage != 'paired':
+            self._save_checkpoint(self.checkpoint)
+        self._report()
+
+    def _report(self) -> None:
+        logger.debug("Pair setup stage: %s", self.stage)
+        if self.on_stage is not None:
+            self.on_stage(self.stage)
+
+    def _send(self, ktlvs: List[Tuple[int, bytes]]) -> Dict[str, Any]:
+        try:
+            response = self.send(ktlvs)
+        except self.transient_errors as e:
+            raise LinkLost() from e
+        self.last_response = time.time()
+        return response
+
+    def _stale(self, response: Dict[str, Any], state: int) -> bool:
+        """Whether the accessory lost the state of a resent request."""
+        if not self._resent:
+            return False
+        if from_bytes(response['kTLVType_State']) != state:
+            return True
+        return 'kTLVType_Error' in response and from_bytes(
+            response['kTLVType_Error']
+        ) == constants.PairingKTLVErrorCodes.kTLVError_Unknow
+
+    def _step(self) -> None:
+        session = self.session
+        if self.stage == 'srp_start':
+            session.m2_receive_srp_start_response(
+                self._send(session.m1_generate_srp_start_request()))
+            self._set_stage('srp_proof')
+        elif self.stage == 'srp_proof':
+            if self.proof is None:
+                if self.executor is None:
+                    self.proof = compute_srp_proof(*session.srp_proof_args())
+                else:
+                    self.proof = self.executor.submit(
+                        compute_srp_proof,
+                        *session.srp_proof_args(ephemeral_key=False)).result()
+            self._set_stage('srp_verify')
+        elif self.stage == 'srp_verify':
+            response = self._send(
+                session.m3_generate_srp_verify_request(proof=self.proof))
+            if self._stale(response, 4):
+                self._restart()
+                return
+            session.m4_receive_srp_verify_response(response)
+            self._set_stage('exchange_request')
+        elif self.stage == 'exchange_request':
+            if self.exchange_request is None:
+                # Signed in this process, see compute_exchange_request
+                self.exchange_request = compute_exchange_request(
+                    *session.exchange_request_args())
+            self._set_stage('exchange')
+        elif self.stage == 'exchange':
+            if session.signing_key is None:
+                session.exchange_request_args()
+            response = self._send(
+                session.m5_generate_exchange_request(self.exchange_request))
+            if self._stale(response, 6):
+                self._restart()
+                return
+            session.m6_receive_exchange_response(response)
+            self._discard()
+            self._set_stage('paired')
+
+    def _discard(self) -> None:
+        if self.checkpoint is not None:
+            self.session.keystore.remove_checkpoint(self.checkpoint)
+
+    def _save_checkpoint(self, name: str) -> None:
+        state = {
+            'version': checkpoint_version,
+            'stage': self.stage,
+            'last_response': self.last_response,
+            'salt': self.session.salt.hex(),
+            'B': self.session.B,
+        }  # type: Dict[str, Any]
+        if self.proof is not None:
+            state['proof'] = [
+                field.hex() if isinstance(field, bytes) else field
+                for field in self.proof
+            ]
+        if self.exchange_request is not None:
+            state['exchange_request'] = [
+                field.hex() for field in self.exchange_request
+            ]
+        self.session.keystore.save_checkpoint(
+            name, json.dumps(state).encode('utf-8'))
+
+    def _load_checkpoint(self, name: str) -> None:
+        """Restore the state of the checkpoint, if still resumable."""
+        keystore = self.session.keystore
+        try:
+            data = keystore.load_checkpoint(name)
+        except ValueError:
+            logger.debug("Invalid checkpoint %s.", name)
+            data = None
+        if data is None:
+            return
+        state = json.loads(data.decode('utf-8'))
+        if (state.get('version') != checkpoint_version or
+                time.time() - state['last_response'] > self.resume_window):
+            logger.debug("Checkpoint %s expired.", name)
+            keystore.remove_checkpoint(name)
+            return
+
+        session = self.session
+        session.salt = bytes.fromhex(state['salt'])
+        session.s = from_bytes(session.salt)
+        session.B = state['B']
+        if 'proof' in state:
+            self.proof = SrpProof._make(
+                bytes.fromhex(field) if isinstance(field, str) else field
+                for field in state['proof'])
+            # Restore the SRP values of the session
+            session.m3_generate_srp_verify_request(proof=self.proof)
+        if 'exchange_request' in state:
+            self.exchange_request = ExchangeRequest._make(
+                bytes.fromhex(field) for field in state['exchange_request'])
+        self.stage = state['stage']
+        self.last_response = state['last_response']
+        # The request of the stage may already have been received
+        self._resent = True
+        logger.debug("Resuming pair setup %s at %s.", name, self.stage)
@@ -10,21 +10,32 @@ https://tools.ietf.org/html/rfc2945
 """
 
 import logging
-import os
 import random
+import threading
+import time
 
+from collections import deque
+from concurrent.futures import Executor
 from hashlib import sha512
 from hmac import compare_digest
-from struct import pack
-from typing import Any, Dict, List, Tuple, Union, Optional  # NOQA pylint: disable=W0611
-
-import cryptography.hazmat
-from libnacl import (crypto_aead_chacha20poly1305_ietf_decrypt,
-                     crypto_aead_chacha20poly1305_ietf_encrypt)
-
-import ed25519
-
-from . import constants, utils
+from struct import pack, unpack
+from typing import Any, Callable, Deque, Dict, List, Tuple, Union, Optional  # NOQA pylint: disable=W0611
+from typing import NamedTuple, TYPE_CHECKING
+
+from . import constants, crypto, utils
+from .advertising import next_gsn
+from .bigint import FixedBasePow, powmod
+from .keystore import Keystore, get_keystore
+from .utils import LazyModule
+
+if TYPE_CHECKING:
+    import ed25519  # NOQA pylint: disable=W0611
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import x25519
+else:
+    # Imported on first use
+    serialization = LazyModule('cryptography.hazmat.primitives.serialization')
+    x25519 = LazyModule('cryptography.hazmat.primitives.asymmetric.x25519')
 
 logger = logging.getLogger(__name__)
 
@@ -54,24 +65,45 @@ RANDOM_BITS = 512
 password = ''
 
 
-def H(*args: Union[int, bytes, str], sep: bytes=b'', pad: bool=False) -> int:
-    """Hash concatenated arguments"""
-    # convert to bytes if necessary
-    byte_args = []
-    for arg in args:
+def H_bytes(*args: Union[int, bytes, str], sep: bytes=b'',
+            pad: bool=False) -> bytes:
+    """Hash concatenated arguments, returning the SHA-512 digest.
+
+    The arguments are fed one by one to the hash, without building the
+    concatenation."""
+    hash_ = sha512()
+    for i, arg in enumerate(args):
+        # convert to bytes if necessary
         if isinstance(arg, int):
             arg = to_bytes(arg, False)
         elif isinstance(arg, str):
             arg = arg.encode('utf-8')
+        if i and sep:
+            hash_.update(sep)
         if pad:
-            arg = b'\x00' * (PAD_L - len(arg)) + arg
-        byte_args.append(arg)
-    return int(sha512(sep.join(byte_args)).hexdigest(), 16)
+            hash_.update(bytes(PAD_L - len(arg)))
+        hash_.update(arg)
+    return hash_.digest()
+
+
+def H(*args: Union[int, bytes, str], sep: bytes=b'', pad: bool=False) -> int:
+    """Hash concatenated arguments, returning the digest as an int."""
+    return int.from_bytes(H_bytes(*args, sep=sep, pad=pad), 'big')
+
+
+def xor_bytes(a: bytes, b: bytes) -> bytes:
+    """Bitwise xor of two byte strings of the same length."""
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(
+        len(a), 'big')
 
 
 def random_int(n_bits: int=RANDOM_BITS) -> int:
     """Generates a random int of n bytes, modulo N"""
-    return random.SystemRandom().getrandbits(n_bits) % N
+    value = random.SystemRandom().getrandbits(n_bits)
+    if n_bits < N.bit_length():
+        # Already smaller than N
+        return value
+    return value % N
 
 
 def to_bytes(value: int, little_endian: bool=False) -> bytes:
@@ -92,7 +124,147 @@ def from_bytes(value: bytes, little_endian: bool=False) -> int:
     return int.from_bytes(value, order)
 
 
-k = H(N, g, pad=True)
+class SrpConstants:
+    """The SRP constants derived from N and g, computed on first use.
+
+    Attributes
+    ----------
+    k
+        The SRP multiplier H(N, g).
+
+    H_N_xor_H_g, H_USERNAME
+        The invariant parts of the M1 proof.
+    """
+
+    def __init__(self) -> None:
+        self._values = None  # type: Optional[Tuple[int, bytes, bytes]]
+        self._lock = threading.Lock()
+
+    def warm_up(self) -> None:
+        """Compute the constants now, e.g. when a worker process starts."""
+        self._get()
+
+    def _get(self) -> Tuple[int, bytes, bytes]:
+        values = self._values
+        if values is None:
+            with self._lock:
+                if self._values is None:
+                    self._values = (H(N, g, pad=True),
+                                    xor_bytes(H_bytes(N), H_bytes(g)),
+                                    H_bytes(USERNAME))
+                values = self._values
+        return values
+
+    @property
+    def k(self) -> int:
+        return self._get()[0]
+
+    @property
+    def H_N_xor_H_g(self) -> bytes:
+        return self._get()[1]
+
+    @property
+    def H_USERNAME(self) -> bytes:
+        return self._get()[2]
+
+
+srp = SrpConstants()
+
+# g ** exponent % N, for the 512 bit exponents a and x
+g_pow = FixedBasePow(g, N, exponent_bits=RANDOM_BITS)
+
+
+def generate_ephemeral_key() -> Tuple[int, int]:
+    """Generate an SRP ephemeral key pair: a and A = g ** a % N."""
+    a = random_int(RANDOM_BITS)
+    return a, g_pow(a)
+
+
+class EphemeralKeyPool:
+    """SRP ephemeral key pairs, precomputed by a background thread.
+
+    The key pair of M3 does not depend on the accessory response, so it can
+    be computed before M2 arrives. The thread tops the pool up to size key
+    pairs each time start is called, typically when a session is created,
+    rather than when a key is taken, so that it does not compete for the GIL
+    with the rest of M3. Each key pair is handed out once, and take computes
+    one in the calling thread if the pool is empty.
+
+    Parameters
+    ----------
+    size
+        Maximum number of precomputed key pairs.
+    """
+
+    def __init__(self, size: int=4) -> None:
+        self.size = size
+        self._keys = deque()  # type: Deque[Tuple[int, int]]
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+        self._closed = False
+
+    def start(self) -> None:
+        """Top the pool up in the background, starting the thread if needed."""
+        with self._lock:
+            if self._closed:
+                raise ValueError("Ephemeral key pool is closed.")
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='srp-ephemeral-keys', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            while len(self._keys) < self.size and not self._closed:
+                key = generate_ephemeral_key()
+                with self._lock:
+                    self._keys.append(key)
+
+    def take(self) -> Tuple[int, int]:
+        """Remove and return a key pair (a, A)."""
+        with self._lock:
+            if self._closed:
+                raise ValueError("Ephemeral key pool is closed.")
+            key = self._keys.popleft() if self._keys else None
+        if key is None:
+            logger.debug("Ephemeral key pool empty, generating a key.")
+            key = generate_ephemeral_key()
+        return key
+
+    def close(self) -> None:
+        """Stop the background thread and drop the precomputed keys."""
+        with self._lock:
+            self._closed = True
+            self._keys.clear()
+            thread = self._thread
+        self._wakeup.set()
+        if thread is not None:
+            thread.join()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+_ephemeral_pool = None  # type: Optional[EphemeralKeyPool]
+
+
+def set_ephemeral_pool(pool: Optional[EphemeralKeyPool]=None) -> None:
+    """Precompute the ephemeral keys of compute_srp_proof in this process.
+
+    Used by the crypto worker processes, see commissioning.init_worker: the
+    key pairs are generated in the process that computes M3, and the
+    secret a is never sent to another process. The pool is started, and the
+    previous one closed. None generates each key pair when it is needed."""
+    global _ephemeral_pool  # pylint: disable=W0603
+    if pool is not None:
+        pool.start()
+    previous, _ephemeral_pool = _ephemeral_pool, pool
+    if previous is not None:
+        previous.close()
 
 
 def derive_session_key(shared_secret: bytes,
@@ -100,13 +272,249 @@ def derive_session_key(shared_secret: bytes,
                        info: bytes=b"Pair-Setup-Controller-Sign-Info",
                        output_size: int=32) -> bytes:
     """Derive X from the SRP shared secret by using HKDF-SHA-512."""
-    hkdf = cryptography.hazmat.primitives.kdf.hkdf.HKDF(
-        algorithm=cryptography.hazmat.primitives.hashes.SHA512(),
-        length=output_size,
-        salt=salt,
-        info=info,
-        backend=cryptography.hazmat.backends.default_backend())
-    return hkdf.derive(shared_secret)
+    return crypto.get_provider().hkdf_sha512(shared_secret, salt, info,
+                                             output_size)
+
+
+def derive_broadcast_key(shared_secret: bytes, controller_ltpk: bytes) -> bytes:
+    """Derive the broadcast encryption key from a pair-verify shared secret."""
+    return derive_session_key(
+        shared_secret, salt=controller_ltpk, info=b"Broadcast-Encryption-Key")
+
+
+def broadcast_nonce(gsn: int) -> bytes:
+    """Nonce of the encrypted notification sent with this GSN."""
+    return b'\x00' * 4 + pack('<Q', gsn)
+
+
+def pairing_nonce(label: bytes) -> bytes:
+    """12 byte nonce for a pairing message, e.g. PV-Msg02."""
+    return b'\x00' * 4 + label
+
+
+class BroadcastKeyManager:
+    """Broadcast encryption keys of paired accessories.
+
+    Accessories supporting broadcast notifications advertise characteristic
+    value changes encrypted with a key derived during pair-verify. The key
+    expires after the GSN has been incremented 32767 times.
+
+    Parameters
+    ----------
+    gsn_window
+        How many GSN increments after the last known GSN to try when
+        decrypting, to tolerate missed advertisements.
+    """
+    key_lifetime = 32767
+
+    def __init__(self, gsn_window: int=4) -> None:
+        self.gsn_window = gsn_window
+        self._keys = {}  # type: Dict[bytes, Tuple[bytes, int]]
+
+    def add_key(self, advertising_id: bytes, shared_secret: bytes,
+                controller_ltpk: bytes, gsn: int) -> None:
+        """Derive and store the broadcast key of an accessory.
+
+        Parameters
+        ----------
+        advertising_id
+            The 6 byte advertising identifier of the accessory.
+
+        shared_secret
+            The shared secret of the current pair-verify session.
+
+        controller_ltpk
+            The long term public key of this controller.
+
+        gsn
+            The GSN of the accessory when the key is generated.
+        """
+        key = derive_broadcast_key(shared_secret, controller_ltpk)
+        self._keys[advertising_id] = (key, gsn)
+
+    def remove_key(self, advertising_id: bytes) -> None:
+        self._keys.pop(advertising_id, None)
+
+    def has_key(self, advertising_id: bytes) -> bool:
+        return advertising_id in self._keys
+
+    def decrypt(self, advertising_id: bytes, payload: bytes,
+                last_gsn: int) -> Optional[Tuple[int, bytes, bytes]]:
+        """Decrypt an encrypted notification.
+
+        Returns the GSN, the characteristic instance ID and the 8 byte
+        padded value, or None if there is no valid key or the payload does
+        not authenticate.
+        """
+        if advertising_id not in self._keys:
+            return None
+        key, key_gsn = self._keys[advertising_id]
+        ciphertext, tag = payload[:12], payload[12:16]
+        provider = crypto.get_provider()
+
+        gsn = last_gsn
+        for _ in range(self.gsn_window):
+            gsn = next_gsn(gsn)
+            if (gsn - key_gsn) % 65535 > self.key_lifetime:
+                logger.debug("Broadcast key expired for %s.", advertising_id)
+                self.remove_key(advertising_id)
+                return None
+            nonce = broadcast_nonce(gsn)
+            # The ChaCha20 key stream is the encryption of zeroes
+            key_stream = provider.encrypt(key, nonce, bytes(12),
+                                          advertising_id)[:12]
+            plaintext = bytes(c ^ k for c, k in zip(ciphertext, key_stream))
+            # Only the first 4 bytes of the authentication tag are sent
+            expected = provider.encrypt(key, nonce, plaintext,
+                                        advertising_id)[12:16]
+            if compare_digest(expected, tag) and unpack(
+                    '<H', plaintext[:2])[0] == gsn:
+                return gsn, plaintext[2:4], plaintext[4:12]
+        return None
+
+
+SrpProof = NamedTuple('SrpProof', [
+    ('x', int),
+    ('a', int),
+    ('A', int),
+    ('u', int),
+    ('S', int),
+    ('K', bytes),
+    ('M1', bytes),
+])
+
+ExchangeRequest = NamedTuple('ExchangeRequest', [
+    ('X', bytes),
+    ('session_key', bytes),
+    ('device_info', bytes),
+    ('device_signature', bytes),
+    ('encrypted_data', bytes),
+])
+
+
+def compute_srp_proof(salt: bytes,
+                      B: int,
+                      setup_code: str,
+                      ephemeral_key: Optional[Tuple[int, int]]=None
+                      ) -> SrpProof:
+    """Compute the SRP public key, shared secret and proof of M3.
+
+    A module level function of picklable arguments, so that it can run in a
+    process pool. Unless one is given, e.g. from an EphemeralKeyPool, the
+    ephemeral key pair (a, A) is taken from the pool of the process, see
+    set_ephemeral_pool, or generated."""
+    x = H(salt, H_bytes(USERNAME, setup_code, sep=b":"))
+    pool = _ephemeral_pool
+    if ephemeral_key is None:
+        ephemeral_key = (generate_ephemeral_key()
+                         if pool is None else pool.take())
+    a, A = ephemeral_key
+
+    u = H(A, B, pad=True)
+    S = powmod((B - (srp.k * g_pow(x))) % N, a + (u * x), N)
+    K = H_bytes(S)
+    M1 = H_bytes(srp.H_N_xor_H_g, srp.H_USERNAME, salt, A, B, K)
+    if pool is not None:
+        # Top up for the next proof once this one is computed
+        pool.start()
+    return SrpProof(x=x, a=a, A=A, u=u, S=S, K=K, M1=M1)
+
+
+def compute_exchange_request(K: bytes, pairing_id: bytes,
+                             secret_key: bytes) -> ExchangeRequest:
+    """Sign and encrypt the controller long term public key for M5.
+
+    Unlike compute_srp_proof, it is not offloaded to a process pool: it is
+    cheap, and the long term secret key of the controller should not be sent
+    to other processes.
+
+    Parameters
+    ----------
+    K
+        The SRP session key.
+
+    pairing_id
+        Pairing identifier of the controller.
+
+    secret_key
+        Long term secret key of the controller, iOSDeviceLTSK.
+    """
+    provider = crypto.get_provider()
+    verifying_key = provider.public_key(secret_key)
+
+    # Derive iOSDeviceX from the SRP shared secret by using HKDF-SHA-512
+    X = derive_session_key(K)
+
+    # iOSDeviceInfo is iOSDeviceX, iOSDevicePairingID and iOSDeviceLTPK
+    device_info = X + pairing_id + verifying_key
+    device_signature = provider.sign(secret_key, device_info)
+
+    sub_ktlvs = [(constants.PairingKTlvValues.kTLVType_Identifier, pairing_id),
+                 (constants.PairingKTlvValues.kTLVType_PublicKey,
+                  verifying_key),
+                 (constants.PairingKTlvValues.kTLVType_Signature,
+                  device_signature)]
+    prepared_sub_ktlvs = b''.join(
+        data for ktlv in sub_ktlvs for data in utils.prepare_tlv(*ktlv))
+
+    # Encrypt the sub-TLV with ChaCha20-Poly1305, auth tag appended
+    session_key = derive_session_key(
+        K, salt=b"Pair-Setup-Encrypt-Salt", info=b"Pair-Setup-Encrypt-Info")
+    encrypted_data = provider.encrypt(session_key, pairing_nonce(b"PS-Msg05"),
+                                      prepared_sub_ktlvs)
+
+    return ExchangeRequest(
+        X=X,
+        session_key=session_key,
+        device_info=device_info,
+        device_signature=device_signature,
+        encrypted_data=encrypted_data)
+
+
+class PairingError(ValueError):
+    """Error response of the accessory to a pairing request.
+
+    Parameters
+    ----------
+    error_code
+        The kTLVType_Error of the response.
+
+    retry_delay
+        Seconds to wait before retrying, sent with kTLVError_Backoff.
+    """
+    procedure = 'Pairing'
+
+    def __init__(self, error_code: int, retry_delay: int=0) -> None:
+        self.error_code = error_code
+        self.retry_delay = retry_delay
+        self.name = constants.pairing_ktlv_error_code_to_name.get(
+            error_code, str(error_code))
+        super().__init__("{} failed: {}".format(self.procedure, self.name))
+
+
+class PairSetupError(PairingError):
+    """Error response of the accessory to a pair setup request."""
+    procedure = 'Pair setup'
+
+
+class PairVerifyError(PairingError):
+    """Error response of the accessory to a pair verify request."""
+    procedure = 'Pair verify'
+
+
+def check_pairing_error(parsed_ktlvs: Dict[str, bytes],
+                        error_class: type=PairingError) -> None:
+    """Raise a PairingError if the response is an error."""
+    if 'kTLVType_Error' in parsed_ktlvs:
+        raise error_class(
+            from_bytes(parsed_ktlvs['kTLVType_Error']),
+            from_bytes(parsed_ktlvs.get('kTLVType_RetryDelay', b''),
+                       little_endian=True))
+
+
+def check_pair_setup_error(parsed_ktlvs: Dict[str, bytes]) -> None:
+    """Raise PairSetupError if the response is an error."""
+    check_pairing_error(parsed_ktlvs, PairSetupError)
 
 
 class SRPPairSetup:
@@ -130,32 +538,51 @@ class SRPPairSetup:
     storage_folder
         Folder path to store the pairing keys.
         This folder should be secure to prevent unauthorized access.
+
+    keystore
+        Keystore of the pairing keys. By default, the keystore of
+        storage_folder.
+
+    ephemeral_pool
+        Pool of precomputed SRP ephemeral keys for M3, when it is computed in
+        this process. Started when the session is created, so that a key is
+        ready by the time M2 arrives.
     """
 
     def __init__(
             self,
             pairing_id: bytes,
             storage_folder: str,
-            setup_code: str=None, ) -> None:
+            setup_code: str=None,
+            keystore: Keystore=None,
+            ephemeral_pool: EphemeralKeyPool=None) -> None:
         self.setup_code = setup_code
         self.pairing_id = pairing_id
         self.storage_folder = storage_folder
+        if keystore is None:
+            keystore = get_keystore(storage_folder)
+        self.keystore = keystore
+        self.ephemeral_pool = ephemeral_pool
+        if ephemeral_pool is not None:
+            ephemeral_pool.start()
 
         self.g = g
         self.N = N
-        self.k = H(self.N, self.g, pad=True)
+        self.k = srp.k
         self.B = 0  # type: int
         self.s = 0  # type: int
+        self.salt = b''  # type: bytes
         self.my_s = 0  # type: int
         self.x = 0  # type: int
         self.a = 0  # type: int
         self.A = 0  # type: int
         self.u = 0  # type: int
         self.S = 0  # type: int
-        self.K = 0  # type: int
-        self.M1 = 0  # type: int
-        self.M2 = 0  # type: int
-        self.X = 0  # type: int
+        self.K = b''  # type: bytes
+        self.M1 = b''  # type: bytes
+        self.M2 = b''  # type: bytes
+        self.X = b''  # type: bytes
+        self.session_key = b''  # type: bytes
         self.state = 0
         self.signing_key = None  # type: Optional[ed25519.SigningKey]
         self.verifying_key = None  # type: Optional[ed25519.VerifyingKey]
@@ -179,7 +606,8 @@ class SRPPairSetup:
         """
         ktlvs = [(constants.PairingKTlvValues.kTLVType_State, pack('<B', 1)),
                  (constants.PairingKTlvValues.kTLVType_Method, pack(
-                     '<B', constants.PairingKTLVMethodValues.Pair_Setup))]
+                     '<B', constants.PairingKTLVMethodValues.Pair_Setup))
+                 ]  # type: List[Tuple[int, bytes]]
 
         return ktlvs
 
@@ -189,14 +617,17 @@ class SRPPairSetup:
         if from_bytes(parsed_ktlvs['kTLVType_State'], False) != 2:
             raise ValueError(
                 "Received wrong message for M2 {}".format(parsed_ktlvs))
+        check_pair_setup_error(parsed_ktlvs)
         self.B = from_bytes(parsed_ktlvs['kTLVType_PublicKey'])
-        self.s = from_bytes(parsed_ktlvs['kTLVType_Salt'])
+        self.salt = parsed_ktlvs['kTLVType_Salt']
+        self.s = from_bytes(self.salt)
 
         if self.B >= N:
             raise ValueError("Invalid public key received")
 
     def m3_generate_srp_verify_request(
-            self, setup_code: str=None) -> List[Tuple[int, bytes]]:
+            self, setup_code: str=None,
+            proof: Optional[SrpProof]=None) -> List[Tuple[int, bytes]]:
         """Generate the SRP Verify request message TLVs.
 
         The message contains 2 TLVs:
@@ -207,44 +638,61 @@ class SRPPairSetup:
         - kTLVType_State <M3>
         - kTLVType_PublicKey <iOS device's SRP public key> - A
         - kTLVType_Proof <iOS device's SRP proof> - M1
-        """
-        if self.setup_code is None:
-            self.setup_code = setup_code
-        if self.setup_code is None:
-            raise ValueError("No setup code, cannot proceed with M3")
-        self.x = H(self.s, H(USERNAME, self.setup_code, sep=b":"))
-        self.a = random_int(RANDOM_BITS)
-        self.A = pow(self.g, self.a, self.N)
 
-        self.u = H(self.A, self.B, pad=True)
-        self.S = pow(self.B - (self.k * pow(self.g, self.x, self.N)),
-                     self.a + (self.u * self.x), self.N)
-        self.K = H(self.S)
-        # self.M1 = H(self.A, self.B, self.S)
-        self.M1 = H(H(N) ^ H(g), H(USERNAME), self.s, self.A, self.B, self.K)
+        Parameters
+        ----------
+        setup_code
+            Setup code of the accessory, if not given to the session.
+
+        proof
+            Result of compute_srp_proof for this session, if already
+            computed elsewhere, e.g. in a process pool.
+        """
+        if proof is None:
+            proof = compute_srp_proof(*self.srp_proof_args(setup_code))
+        (self.x, self.a, self.A, self.u, self.S, self.K,
+         self.M1) = proof
 
         ktlvs = [(constants.PairingKTlvValues.kTLVType_State, pack('<B', 3)),
                  (constants.PairingKTlvValues.kTLVType_PublicKey,
                   to_bytes(self.A)),
-                 (constants.PairingKTlvValues.kTLVType_Proof,
-                  to_bytes(self.M1))]
+                 (constants.PairingKTlvValues.kTLVType_Proof, self.M1)
+                 ]  # type: List[Tuple[int, bytes]]
 
         return ktlvs
 
+    def srp_proof_args(self, setup_code: str=None, ephemeral_key: bool=True
+                       ) -> Tuple[bytes, int, str, Optional[Tuple[int, int]]]:
+        """Arguments of compute_srp_proof for this session.
+
+        Takes an ephemeral key from the pool of the session, if any, unless
+        ephemeral_key is False, e.g. when the proof is computed in another
+        process: the key pair is then generated by that process."""
+        if self.setup_code is None:
+            self.setup_code = setup_code
+        if self.setup_code is None:
+            raise ValueError("No setup code, cannot proceed with M3")
+        key = None  # type: Optional[Tuple[int, int]]
+        if ephemeral_key and self.ephemeral_pool is not None:
+            key = self.ephemeral_pool.take()
+        return self.salt, self.B, self.setup_code, key
+
     def m4_receive_srp_verify_response(self,
                                        parsed_ktlvs: Dict[str, bytes]) -> None:
         """Verify accessory's proof."""
         if from_bytes(parsed_ktlvs['kTLVType_State'], False) != 4:
             raise ValueError(
                 "Received wrong message for M4 {}".format(parsed_ktlvs))
-        self.M2 = from_bytes(parsed_ktlvs['kTLVType_Proof'])
+        check_pair_setup_error(parsed_ktlvs)
+        self.M2 = parsed_ktlvs['kTLVType_Proof']
 
-        M2_calc = H(self.A, self.M1, self.K)
-        if not compare_digest(
-                to_bytes(M2_calc), parsed_ktlvs['kTLVType_Proof']):
+        M2_calc = H_bytes(self.A, self.M1, self.K)
+        if not compare_digest(M2_calc, self.M2):
             raise ValueError("Authentication failed - invalid prood received.")
 
-    def m5_generate_exchange_request(self) -> List[Tuple[int, bytes]]:
+    def m5_generate_exchange_request(
+            self,
+            request: Optional[ExchangeRequest]=None) -> List[Tuple[int, bytes]]:
         """Generate the Request Generation, as well as signing and encryption keys.
 
         The message contains 2 TLVs:
@@ -259,78 +707,49 @@ class SRPPairSetup:
         - kTLVType_Identifier <iOSDevicePairingID>
         - kTLVType_PublicKey <iOSDeviceLTPK> - verifying_key
         - kTLVType_Signature <iOSDeviceSignature>
+
+        Parameters
+        ----------
+        request
+            Result of compute_exchange_request for this session, if already
+            computed elsewhere, e.g. in a process pool.
         """
-        # 1. Generate Ed25519 long-term public key, iOSDeviceLTPK,
-        # and long-term secret key, iOSDeviceLTSK
-        if self.signing_key is None:
-            self.signing_key, _ = ed25519.create_keypair()
-            with open(os.path.join(self.storage_folder, "secret-key"),
-                      "wb") as secret_key_file:
-                secret_key_file.write(self.signing_key.to_bytes())
+        if request is None:
+            request = compute_exchange_request(*self.exchange_request_args())
         self.verifying_key = self.signing_key.get_verifying_key()
-
-        # 2. Derive iOSDeviceX from the SRP shared secret by using HKDF-SHA-512
-        salt = b"Pair-Setup-Controller-Sign-Salt"
-        info = b"Pair-Setup-Controller-Sign-Info"
-        output_size = 32
-
-        hkdf = cryptography.hazmat.primitives.kdf.hkdf.HKDF(
-            algorithm=cryptography.hazmat.primitives.hashes.SHA512(),
-            length=output_size,
-            salt=salt,
-            info=info,
-            backend=cryptography.hazmat.backends.default_backend())
-        self.X = hkdf.derive(to_bytes(self.K))
-
-        # 3. Concatenate iOSDeviceX with the iOS device's Pairing Identifier, iOSDevicePairingID,
-        # and its long-term public key, iOSDeviceLTPK.
-        # The concatenated value will be referred to as iOSDeviceInfo.
-
-        self.device_info = (
-            to_bytes(self.X) + session.pairing_id.encode('utf-8') +
-            self.verifying_key.to_bytes())
-
-        # 4. Generate iOSDeviceSignature by signing iOSDeviceInfo with its
-        # long-term secret key, iOSDeviceLTSK, using Ed25519.
-
-        self.device_signature = self.signing_key.sign(self.device_info)
-
-        # 5. Construct a sub-TLV
-        sub_ktlvs = [(constants.PairingKTlvValues.kTLVType_Identifier,
-                      self.pairing_id),
-                     (constants.PairingKTlvValues.kTLVType_PublicKey,
-                      self.verifying_key.to_bytes()),
-                     (constants.PairingKTlvValues.kTLVType_Signature,
-                      self.device_signature)]
-
-        prepared_sub_ktlvs = b''.join(
-            data for ktlv in sub_ktlvs for data in utils.prepare_tlv(*ktlv))
-
-        # 6. Encrypt the sub-TLV, encryptedData, and generate the 16 byte auth tag, authTag.
-        # using the ChaCha20-Poly1305 AEAD algorithm
-
-        # this includes the auth_tag appended at the end
-        encrypted_data = crypto_aead_chacha20poly1305_ietf_encrypt(
-            key=self.S, nonce="PS-Msg05", aad=None, message=prepared_sub_ktlvs)
+        self.X = request.X
+        self.session_key = request.session_key
+        self.device_info = request.device_info
+        self.device_signature = request.device_signature
 
         ktlvs = [(constants.PairingKTlvValues.kTLVType_State, pack('<B', 5)),
                  (constants.PairingKTlvValues.kTLVType_EncryptedData,
-                  encrypted_data)]
+                  request.encrypted_data)]  # type: List[Tuple[int, bytes]]
 
         return ktlvs
 
+    def exchange_request_args(self) -> Tuple[bytes, bytes, bytes]:
+        """Arguments of compute_exchange_request for this session.
+
+        Generates the Ed25519 long term key pair of the controller,
+        iOSDeviceLTPK and iOSDeviceLTSK, if the keystore has none yet."""
+        if self.signing_key is None:
+            self.signing_key = self.keystore.controller_signing_key(
+                create=True)
+        return self.K, self.pairing_id, self.signing_key.to_bytes()
+
     def m6_receive_exchange_response(self,
-                                     parsed_ktlvs: Dict[str, int]) -> None:
+                                     parsed_ktlvs: Dict[str, bytes]) -> None:
         """Verify accessory and save pairing."""
-        if parsed_ktlvs['kTLVType_State'] != 6:
+        if from_bytes(parsed_ktlvs['kTLVType_State']) != 6:
             raise ValueError(
                 "Received wrong message for M6 {}".format(parsed_ktlvs))
+        check_pair_setup_error(parsed_ktlvs)
 
-        decrypted_ktlvs = crypto_aead_chacha20poly1305_ietf_decrypt(
-            parsed_ktlvs['kTLVType_EncryptedData'],
-            nonce=b"PS-Msg06",
-            aad=None,
-            key=self.S)
+        provider = crypto.get_provider()
+        decrypted_ktlvs = provider.decrypt(
+            self.session_key, pairing_nonce(b"PS-Msg06"),
+            parsed_ktlvs['kTLVType_EncryptedData'])
 
         parsed_decrypted_ktlvs = utils.parse_ktlvs(decrypted_ktlvs)
 
@@ -339,23 +758,93 @@ class SRPPairSetup:
         self.accessory_ltpk = parsed_decrypted_ktlvs['kTLVType_PublicKey']
         self.accessory_signature = parsed_decrypted_ktlvs['kTLVType_Signature']
 
-        with open(
-                os.path.join(self.storage_folder, "accessory_pairing_id"),
-                "wb") as accessory_pairing_id_file:
-            accessory_pairing_id_file.write(self.accessory_pairing_id)
-        with open(os.path.join(self.storage_folder, "accessory_ltpk"),
-                  "wb") as accessory_ltpk_file:
-            accessory_ltpk_file.write(self.accessory_ltpk)
+        accessory_x = derive_session_key(
+            self.K,
+            salt=b"Pair-Setup-Accessory-Sign-Salt",
+            info=b"Pair-Setup-Accessory-Sign-Info")
+        accessory_info = (
+            accessory_x + self.accessory_pairing_id + self.accessory_ltpk)
+        if not provider.verify(self.accessory_ltpk, self.accessory_signature,
+                               accessory_info):
+            raise ValueError("Authentication failed - invalid signature.")
+
+        self.keystore.add_pairing(self.accessory_pairing_id,
+                                  self.accessory_ltpk)
 
         logger.debug(
             "Successfully saved accessory pairing id and accessory long term public key"
         )
 
 
+SessionTicket = NamedTuple('SessionTicket', [
+    ('session_id', bytes),
+    ('shared_secret', bytes),
+    ('created', float),
+])
+
+
+def derive_resume_session_id(shared_secret: bytes) -> bytes:
+    """Initial session ID for a pair resume, from a pair-verify shared secret."""
+    return derive_session_key(
+        shared_secret,
+        salt=b"Pair-Verify-ResumeSessionID-Salt",
+        info=b"Pair-Verify-ResumeSessionID-Info",
+        output_size=8)
+
+
+def derive_control_keys(shared_secret: bytes) -> Tuple[bytes, bytes]:
+    """Derive the session keys: controller to accessory, accessory to controller."""
+    controller_to_accessory = derive_session_key(
+        shared_secret,
+        salt=b"Control-Salt",
+        info=b"Control-Write-Encryption-Key")
+    accessory_to_controller = derive_session_key(
+        shared_secret, salt=b"Control-Salt", info=b"Control-Read-Encryption-Key")
+    return controller_to_accessory, accessory_to_controller
+
+
+class SessionCache:
+    """Resumable pair-verify sessions, keyed by accessory.
+
+    Accessories only keep a limited number of sessions, and each session ID
+    can only be resumed once.
+
+    Parameters
+    ----------
+    max_age
+        Age in s after which a session is not resumed anymore.
+    """
+
+    def __init__(self, max_age: float=3600) -> None:
+        self.max_age = max_age
+        self._tickets = {}  # type: Dict[str, SessionTicket]
+        self._lock = threading.Lock()
+
+    def put(self, accessory_id: str, ticket: SessionTicket) -> None:
+        with self._lock:
+            self._tickets[accessory_id] = ticket
+
+    def tickets(self) -> Dict[str, SessionTicket]:
+        """Return a copy of the sessions, keyed by accessory."""
+        with self._lock:
+            return dict(self._tickets)
+
+    def pop(self, accessory_id: str) -> Optional[SessionTicket]:
+        """Remove and return the session of the accessory, if still valid."""
+        with self._lock:
+            ticket = self._tickets.pop(accessory_id, None)
+        if ticket is None or time.time() - ticket.created > self.max_age:
+            return None
+        return ticket
+
+
 class SRPPairVerify:
-    """Secure Remote Protocol session for pair verify.
+    """Pair verify session.
 
-    You must already have paired with an accessory.
+    You must already have paired with an accessory. If the ticket of a
+    previous session is given, the session is first resumed, which
+    requires no key agreement or signature. The accessory falls back to a
+    full pair verify if it cannot resume the session.
 
     Parameters
     ----------
@@ -363,28 +852,45 @@ class SRPPairVerify:
         Unique identifier for the controller. Must be formatted as
         XX:XX:XX:XX:XX:XX", where "XX" is a hexadecimal string representing a byte.
 
-    setup_code
-        Code for the pairing, Must be formatted as
-        XXX-XX-XXX where each X is a 0-9 digit and dashes are required.
-        This code can be passed when creating the session, or after
-        starting the pairing (for m3).
-
     storage_folder
         Folder path to store the pairing keys.
         This folder should be secure to prevent unauthorized access.
+
+    setup_code
+        Unused.
+
+    resume_ticket
+        Ticket of a previous session with the accessory, to resume.
+
+    keystore
+        Keystore of the pairing keys. By default, the keystore of
+        storage_folder.
     """
 
     def __init__(
             self,
             pairing_id: bytes,
             storage_folder: str,
-            setup_code: str=None, ) -> None:
+            setup_code: str=None,
+            resume_ticket: SessionTicket=None,
+            keystore: Keystore=None) -> None:
         self.setup_code = setup_code
         self.pairing_id = pairing_id
         self.storage_folder = storage_folder
+        self.resume_ticket = resume_ticket
+        if keystore is None:
+            keystore = get_keystore(storage_folder)
+        self.keystore = keystore
 
         self.secret_key = None  # type: Optional[ed25519.SigningKey]
         self.verifying_key = None  # type: Optional[ed25519.VerifyingKey]
+        self.private_key = None  # type: Optional[x25519.X25519PrivateKey]
+        self.public_key = b''  # type: bytes
+        self.accessory_public_key = b''  # type: bytes
+        self.shared_secret = b''  # type: bytes
+        self.session_key = b''  # type: bytes
+        self.session_id = b''  # type: bytes
+        self.resumed = False
         self.device_info = b''  # type: bytes
         self.device_signature = b''  # type: bytes
         self.accessory_pairing_id = b''  # type: bytes
@@ -392,44 +898,300 @@ class SRPPairVerify:
         self.accessory_signature = b''  # type: bytes
 
     def m1_generate_verify_start_request(self) -> List[Tuple[int, bytes]]:
-        """Generate the SRP Start request message TLVs.
-
-        The message contains 2 TLVs:
-        - Return_Response: 1
-        - Vale: kTLVs
+        """Generate the Verify Start request message kTLVs.
 
         With the kTLVs:
         - kTLVType_State <M1>
         - kTLVType_PublicKey <Curve25519 public key>
+
+        When resuming a session, also:
+        - kTLVType_Method <Resume>
+        - kTLVType_SessionID <Session ID to resume>
+        - kTLVType_EncryptedData <auth tag>
         """
-        with open(os.path.join(self.storage_folder, "secret-key"),
-                  "rb") as secret_key_file:
-            self.secret_key = ed25519.SigningKey(secret_key_file.read())
-        self.verifying_key = self.secret_key.get_verifying_key()
+        self.private_key = x25519.X25519PrivateKey.generate()
+        self.public_key = self.private_key.public_key().public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw)
 
         ktlvs = [(constants.PairingKTlvValues.kTLVType_State, pack('<B', 1)),
                  (constants.PairingKTlvValues.kTLVType_PublicKey,
-                  self.verifying_key.to_bytes())]
-
-        prepared_ktlvs = b''.join(
-            data for ktlv in ktlvs for data in utils.prepare_tlv(*ktlv))
+                  self.public_key)]  # type: List[Tuple[int, bytes]]
+
+        if self.resume_ticket is not None:
+            request_key = derive_session_key(
+                self.resume_ticket.shared_secret,
+                salt=self.public_key + self.resume_ticket.session_id,
+                info=b"Pair-Resume-Request-Info")
+            auth_tag = crypto.get_provider().encrypt(
+                request_key, pairing_nonce(b"PR-Msg01"), b'')
+            ktlvs = [
+                (constants.PairingKTlvValues.kTLVType_State, pack('<B', 1)),
+                (constants.PairingKTlvValues.kTLVType_Method,
+                 pack('<B', constants.PairingKTLVMethodValues.Resume)),
+                (constants.PairingKTlvValues.kTLVType_PublicKey,
+                 self.public_key),
+                (constants.PairingKTlvValues.kTLVType_SessionID,
+                 self.resume_ticket.session_id),
+                (constants.PairingKTlvValues.kTLVType_EncryptedData, auth_tag)
+            ]
 
-        message_data = [(constants.HapParamTypes.Return_Response, pack(
-            '<B', 1)), (constants.HapParamTypes.Value, prepared_ktlvs)]
+        return ktlvs
 
-        return message_data
+    def m2_receive_start_response(self, parsed_ktlvs: Dict[str, bytes]) -> bool:
+        """Update the session with the M2 response.
 
-    @staticmethod
-    def m2_receive_start_response(parsed_ktlvs: Dict[str, bytes]) -> None:
-        """Update SRP session with m2 response"""
+        Returns True if the session was resumed, in which case pair verify
+        is complete. Otherwise M3 must be sent."""
         if from_bytes(parsed_ktlvs['kTLVType_State']) != 2:
             raise ValueError(
                 "Received wrong message for M2 {}".format(parsed_ktlvs))
-        proof = from_bytes(parsed_ktlvs['kTLVType_PublicKey'])
-        encrypted_data = from_bytes(parsed_ktlvs['kTLVType_EncryptedData'])
+        check_pairing_error(parsed_ktlvs, PairVerifyError)
+
+        if 'kTLVType_SessionID' in parsed_ktlvs:
+            self._receive_resume_response(parsed_ktlvs)
+            return True
+
+        # The accessory could not resume the session, full pair verify
+        self.accessory_public_key = parsed_ktlvs['kTLVType_PublicKey']
+        self.shared_secret = self.private_key.exchange(
+            x25519.X25519PublicKey.from_public_bytes(self.accessory_public_key))
+        self.session_key = derive_session_key(
+            self.shared_secret,
+            salt=b"Pair-Verify-Encrypt-Salt",
+            info=b"Pair-Verify-Encrypt-Info")
+
+        provider = crypto.get_provider()
+        decrypted_ktlvs = provider.decrypt(
+            self.session_key, pairing_nonce(b"PV-Msg02"),
+            parsed_ktlvs['kTLVType_EncryptedData'])
+        parsed_decrypted_ktlvs = utils.parse_ktlvs(decrypted_ktlvs)
 
-        if proof == encrypted_data:
-            print("")
+        self.accessory_pairing_id = parsed_decrypted_ktlvs[
+            'kTLVType_Identifier']
+        self.accessory_signature = parsed_decrypted_ktlvs['kTLVType_Signature']
+        self.accessory_ltpk = self.keystore.accessory_ltpk(
+            self.accessory_pairing_id)
+
+        accessory_info = (self.accessory_public_key + self.accessory_pairing_id
+                          + self.public_key)
+        if not provider.verify(self.accessory_ltpk, self.accessory_signature,
+                               accessory_info):
+            raise ValueError("Authentication failed - invalid signature.")
+        return False
+
+    def _receive_resume_response(self, parsed_ktlvs: Dict[str, bytes]) -> None:
+        """Verify the resume response and derive the new shared secret."""
+        previous_secret = self.resume_ticket.shared_secret
+        new_session_id = parsed_ktlvs['kTLVType_SessionID']
+        salt = self.public_key + new_session_id
+
+        response_key = derive_session_key(
+            previous_secret, salt=salt, info=b"Pair-Resume-Response-Info")
+        auth_tag = crypto.get_provider().encrypt(
+            response_key, pairing_nonce(b"PR-Msg02"), b'')
+        if not compare_digest(auth_tag,
+                              parsed_ktlvs['kTLVType_EncryptedData']):
+            raise ValueError("Authentication failed - invalid resume tag.")
+
+        self.shared_secret = derive_session_key(
+            previous_secret, salt=salt, info=b"Pair-Resume-Shared-Secret-Info")
+        self.session_id = new_session_id
+        self.resumed = True
+
+    def m3_generate_verify_finish_request(self) -> List[Tuple[int, bytes]]:
+        """Generate the Verify Finish request message kTLVs.
+
+        With the kTLVs:
+        - kTLVType_State <M3>
+        - kTLVType_EncryptedData <encryptedData with authTag appended>
+
+        The encrypted data contains the kTLVs:
+        - kTLVType_Identifier <iOSDevicePairingID>
+        - kTLVType_Signature <iOSDeviceSignature>
+        """
+        if self.secret_key is None:
+            self.secret_key = self.keystore.controller_signing_key()
+            self.verifying_key = self.secret_key.get_verifying_key()
+
+        self.device_info = (
+            self.public_key + self.pairing_id + self.accessory_public_key)
+        provider = crypto.get_provider()
+        self.device_signature = provider.sign(self.secret_key.to_bytes(),
+                                              self.device_info)
+
+        sub_ktlvs = [(constants.PairingKTlvValues.kTLVType_Identifier,
+                      self.pairing_id),
+                     (constants.PairingKTlvValues.kTLVType_Signature,
+                      self.device_signature)]
+        prepared_sub_ktlvs = b''.join(
+            data for ktlv in sub_ktlvs for data in utils.prepare_tlv(*ktlv))
+
+        encrypted_data = provider.encrypt(
+            self.session_key, pairing_nonce(b"PV-Msg03"), prepared_sub_ktlvs)
+
+        ktlvs = [(constants.PairingKTlvValues.kTLVType_State, pack('<B', 3)),
+                 (constants.PairingKTlvValues.kTLVType_EncryptedData,
+                  encrypted_data)]  # type: List[Tuple[int, bytes]]
+        return ktlvs
+
+    def m4_receive_verify_finish_response(
+            self, parsed_ktlvs: Dict[str, bytes]) -> None:
+        """Check the M4 response and compute the initial session ID."""
+        if from_bytes(parsed_ktlvs['kTLVType_State']) != 4:
+            raise ValueError(
+                "Received wrong message for M4 {}".format(parsed_ktlvs))
+        check_pairing_error(parsed_ktlvs, PairVerifyError)
+        self.session_id = derive_resume_session_id(self.shared_secret)
+
+    def session_ticket(self) -> SessionTicket:
+        """Ticket to resume this session in the next pair verify."""
+        if not self.session_id:
+            raise ValueError("Pair verify is not complete.")
+        return SessionTicket(
+            session_id=self.session_id,
+            shared_secret=self.shared_secret,
+            created=time.time())
+
+
+def run_pair_setup(session: SRPPairSetup,
+                   send: Callable[[List[Tuple[int, bytes]]], Dict[str, bytes]],
+                   executor: Executor=None,
+                   on_stage: Callable[[str], None]=None) -> None:
+    """Run the pair setup exchange of a session.
+
+    Parameters
+    ----------
+    session
+        The pair setup session.
+
+    send
+        Sends request kTLVs to the accessory, and returns the parsed
+        response kTLVs.
+
+    executor
+        Executor for the SRP computation of M3, typically a process pool. It
+        runs in the calling thread by default. With an executor, the SRP
+        ephemeral key pair is generated by the executor rather than taken
+        from the pool of the session. The M5 request is signed in the
+        calling thread, so that the controller LTSK stays in this process.
+
+    on_stage
+        Called with the name of each stage as it starts: srp_start,
+        srp_proof, srp_verify, exchange_request, exchange and paired.
+    """
+
+    def stage(name: str) -> None:
+        logger.debug("Pair setup stage: %s", name)
+        if on_stage is not None:
+            on_stage(name)
+
+    stage('srp_start')
+    session.m2_receive_srp_start_response(
+        send(session.m1_generate_srp_start_request()))
+
+    stage('srp_proof')
+    proof = None
+    if executor is not None:
+        proof = executor.submit(
+            compute_srp_proof,
+            *session.srp_proof_args(ephemeral_key=False)).result()
+    m3_request = session.m3_generate_srp_verify_request(proof=proof)
+
+    stage('srp_verify')
+    session.m4_receive_srp_verify_response(send(m3_request))
+
+    stage('exchange_request')
+    # Cheap, and signed with the controller LTSK: runs in this process
+    m5_request = session.m5_generate_exchange_request()
+
+    stage('exchange')
+    session.m6_receive_exchange_response(send(m5_request))
+    stage('paired')
+
+
+PairingEntry = NamedTuple('PairingEntry', [
+    ('pairing_id', bytes),
+    ('public_key', bytes),
+    ('permissions', int),
+])
+
+
+def add_pairing_request(
+        pairing_id: bytes,
+        public_key: bytes,
+        permissions: int=constants.PairingPermissions.Admin
+) -> List[Tuple[int, bytes]]:
+    """Generate the Add Pairing request kTLVs, sent by an admin controller.
+
+    Parameters
+    ----------
+    pairing_id
+        Pairing identifier of the added controller.
+
+    public_key
+        Long term public key of the added controller.
+
+    permissions
+        PairingPermissions of the added controller.
+    """
+    return [(constants.PairingKTlvValues.kTLVType_State, pack('<B', 1)),
+            (constants.PairingKTlvValues.kTLVType_Method,
+             pack('<B', constants.PairingKTLVMethodValues.Add_Pairing)),
+            (constants.PairingKTlvValues.kTLVType_Identifier, pairing_id),
+            (constants.PairingKTlvValues.kTLVType_PublicKey, public_key),
+            (constants.PairingKTlvValues.kTLVType_Permissions,
+             pack('<B', permissions))]
+
+
+def remove_pairing_request(pairing_id: bytes) -> List[Tuple[int, bytes]]:
+    """Generate the Remove Pairing request kTLVs."""
+    return [(constants.PairingKTlvValues.kTLVType_State, pack('<B', 1)),
+            (constants.PairingKTlvValues.kTLVType_Method,
+             pack('<B', constants.PairingKTLVMethodValues.Remove_Pairing)),
+            (constants.PairingKTlvValues.kTLVType_Identifier, pairing_id)]
+
+
+def list_pairings_request() -> List[Tuple[int, bytes]]:
+    """Generate the List Pairings request kTLVs."""
+    return [(constants.PairingKTlvValues.kTLVType_State, pack('<B', 1)),
+            (constants.PairingKTlvValues.kTLVType_Method,
+             pack('<B', constants.PairingKTLVMethodValues.List_Pairings))]
+
+
+def parse_pairings_response(data: bytes) -> List[PairingEntry]:
+    """Parse the M2 response of an Add, Remove or List Pairings request.
+
+    The pairings of a List Pairings response are separated by
+    kTLVType_Separator, so the kTLVs are parsed in order rather than with
+    utils.parse_ktlvs. Returns the listed pairings, none for Add and Remove.
+    Raises PairingError if the accessory returned an error.
+    """
+    pairings = []  # type: List[Dict[str, bytes]]
+    current = None  # type: Optional[Dict[str, bytes]]
+    fields = {}  # type: Dict[str, bytes]
+    for body_type, _, value in utils.iterate_tvl(data):
+        name = constants.pairing_tlv_names[body_type]
+        if name == 'kTLVType_Separator':
+            current = None
+        elif name in ('kTLVType_Identifier', 'kTLVType_PublicKey',
+                      'kTLVType_Permissions'):
+            if current is None:
+                current = {}
+                pairings.append(current)
+            # Values longer than 255 bytes are split in consecutive kTLVs
+            current[name] = current.get(name, b'') + value
+        else:
+            fields[name] = value
+    if from_bytes(fields.get('kTLVType_State', b'')) != 2:
+        raise ValueError("Received wrong message for M2 {}".format(fields))
+    check_pairing_error(fields)
+    return [
+        PairingEntry(
+            pairing.get('kTLVType_Identifier', b''),
+            pairing.get('kTLVType_PublicKey', b''),
+            from_bytes(pairing.get('kTLVType_Permissions', b'\x00')))
+        for pairing in pairings
+    ]
 
 
 def pair() -> None:
@@ -461,7 +1223,7 @@ def pair() -> None:
     A = pow(g, a, N)
 
     u = H(A, B, pad=True)
-    S = pow(B - (k * pow(g, x, N)), a + (u * x), N)
+    S = pow(B - (srp.k * pow(g, x, N)), a + (u * x), N)
     K = H(S)
     M1 = H(A, B, S)
     # M1 = H(H(N) | H(g), H(USERNAME), s, A, B, K)
@@ -0,0 +1,96 @@
+"""Registry of the Apple-defined service and characteristic types.
+
+The types are generated from the HAP specification into hap_types, see
+tools/gen_hap_types.py, so that the format, unit and valid range of the
+characteristics of a known type are available without a signature read.
+Lookups are dict hits keyed by the upper case UUID, or by the raw bytes of
+the UUID for the signatures looked up on every value read.
+"""
+
+from typing import Any, Dict, Optional, Tuple  # NOQA pylint: disable=W0611
+from typing import NamedTuple
+
+from . import constants, hap_types
+from .model import CharacteristicSignature
+
+CharacteristicType = NamedTuple('CharacteristicType', [
+    ('uuid', str),
+    ('type', str),
+    ('name', str),
+    ('format_code', int),
+    ('unit_code', Optional[int]),
+    ('properties', int),
+    ('min_value', Any),
+    ('max_value', Any),
+    ('step_value', Any),
+    ('max_length', Optional[int]),
+    ('valid_values', Tuple[int, ...]),
+])
+
+ServiceType = NamedTuple('ServiceType', [
+    ('uuid', str),
+    ('type', str),
+    ('name', str),
+    ('required_characteristics', Tuple[str, ...]),
+    ('optional_characteristics', Tuple[str, ...]),
+])
+
+characteristic_types = {
+    row[0]: CharacteristicType(*row)
+    for row in hap_types.characteristics
+}  # type: Dict[str, CharacteristicType]
+
+service_types = {
+    row[0]: ServiceType(*row)
+    for row in hap_types.services
+}  # type: Dict[str, ServiceType]
+
+# UUIDs by short type name, e.g. 'lock-mechanism.current-state'
+characteristic_uuids = {
+    characteristic.type: uuid
+    for uuid, characteristic in characteristic_types.items()
+}  # type: Dict[str, str]
+
+service_uuids = {service.type: uuid
+                 for uuid, service in service_types.items()
+                 }  # type: Dict[str, str]
+
+
+def characteristic_type(uuid: str) -> Optional[CharacteristicType]:
+    """Return the Apple-defined characteristic type with this UUID."""
+    return characteristic_types.get(uuid.upper())
+
+
+def service_type(uuid: str) -> Optional[ServiceType]:
+    """Return the Apple-defined service type with this UUID."""
+    return service_types.get(uuid.upper())
+
+
+def _signature(characteristic: CharacteristicType) -> CharacteristicSignature:
+    valid_values = None  # type: Optional[bytes]
+    if (characteristic.valid_values and characteristic.format_code ==
+            constants.format_name_to_code['uint8']):
+        valid_values = bytes(characteristic.valid_values)
+    return CharacteristicSignature(
+        characteristic_type=characteristic.uuid,
+        properties=characteristic.properties,
+        format_code=characteristic.format_code,
+        unit_code=characteristic.unit_code,
+        min_value=characteristic.min_value,
+        max_value=characteristic.max_value,
+        step_value=characteristic.step_value,
+        valid_values=valid_values)
+
+
+_signatures = {
+    constants.uuid_bytes(uuid): _signature(characteristic)
+    for uuid, characteristic in characteristic_types.items()
+}  # type: Dict[bytes, CharacteristicSignature]
+
+
+def known_signature(uuid: str) -> Optional[CharacteristicSignature]:
+    """Return the signature of an Apple-defined characteristic type.
+
+    It has no service fields, and the properties of the specification: an
+    accessory may support a subset of them."""
+    return _signatures.get(constants.uuid_bytes(uuid))
@@ -0,0 +1,203 @@
+"""HAP secure session, established by pair verify.
+
+Once pair verify is complete, every HAP-BLE PDU is encrypted with
+ChaCha20-Poly1305, with one key per direction. The nonce is 4 zero bytes
+followed by a 64-bit little endian counter, incremented for every message.
+The 16 byte auth tag is appended to each fragment, in the same GATT message.
+
+Unlike the pairing procedures, sessions always use libsodium rather than
+the selected crypto provider: they encrypt in preallocated buffers through
+its C interface.
+"""
+
+import ctypes
+import logging
+import threading
+
+from struct import pack_into
+from typing import Any, Optional, Union  # NOQA pylint: disable=W0611
+
+from .crypto import libnacl
+from .pairing import derive_control_keys
+
+logger = logging.getLogger(__name__)
+
+key_size = 32
+nonce_size = 12
+tag_size = 16
+max_pdu_size = 512
+max_counter = 2**64 - 1
+
+
+class _Direction:
+    """Key, nonce counter and buffers of one direction of a session."""
+
+    def __init__(self, key: bytes, buffer_size: int) -> None:
+        if len(key) != key_size:
+            raise ValueError("Invalid key length {}.".format(len(key)))
+        self.key = key
+        self.counter = 0
+        self.nonce = ctypes.create_string_buffer(nonce_size)
+        self.buffer = ctypes.create_string_buffer(buffer_size)
+        self.length = ctypes.c_ulonglong()
+        self.lock = threading.Lock()
+
+    def next_nonce(self) -> None:
+        """Write the nonce of the next message in the nonce buffer."""
+        if self.counter > max_counter:
+            raise ValueError("Nonce counter exhausted, pair verify again.")
+        pack_into('<Q', self.nonce, 4, self.counter)
+        self.counter += 1
+
+
+def _c_buffer(data: bytearray) -> Any:
+    """Pointer to the start of a bytearray, without copy."""
+    return ctypes.byref(ctypes.c_char.from_buffer(data))
+
+
+class SecureSession:
+    """Encryption of the HAP PDUs of a pair verified session.
+
+    The nonce and output buffers are allocated once per direction and reused
+    for every PDU. `encrypt` and `decrypt` return new bytes,
+    `encrypt_in_place` and `decrypt_in_place` work on a bytearray without
+    any allocation.
+
+    Messages must be encrypted in the order they are sent, and decrypted in
+    the order they are received: the accessory uses the same counters.
+
+    Parameters
+    ----------
+    write_key
+        Controller to accessory key.
+
+    read_key
+        Accessory to controller key.
+
+    buffer_size
+        Size of the preallocated output buffers. Larger messages use a
+        temporary buffer.
+    """
+
+    def __init__(self,
+                 write_key: bytes,
+                 read_key: bytes,
+                 buffer_size: int=max_pdu_size) -> None:
+        self._write = _Direction(write_key, buffer_size)
+        self._read = _Direction(read_key, buffer_size)
+
+    @classmethod
+    def from_shared_secret(cls, shared_secret: bytes,
+                           accessory: bool=False) -> 'SecureSession':
+        """Create the session from a pair verify shared secret.
+
+        Parameters
+        ----------
+        shared_secret
+            Shared secret of pair verify or pair resume.
+
+        accessory
+            Create the accessory side of the session, which writes with the
+            accessory to controller key.
+        """
+        controller_to_accessory, accessory_to_controller = derive_control_keys(
+            shared_secret)
+        if accessory:
+            return cls(accessory_to_controller, controller_to_accessory)
+        return cls(controller_to_accessory, accessory_to_controller)
+
+    @property
+    def write_counter(self) -> int:
+        """Counter of the next message to encrypt."""
+        return self._write.counter
+
+    @property
+    def read_counter(self) -> int:
+        """Counter of the next message to decrypt."""
+        return self._read.counter
+
+    def encrypt(self, data: bytes) -> bytes:
+        """Encrypt a message, returning the ciphertext with the auth tag."""
+        direction = self._write
+        size = len(data) + tag_size
+        with direction.lock:
+            if size > len(direction.buffer):
+                output = ctypes.create_string_buffer(size)
+            else:
+                output = direction.buffer
+            direction.next_nonce()
+            ret = libnacl.nacl.crypto_aead_chacha20poly1305_ietf_encrypt(
+                output, ctypes.byref(direction.length),
+                data, ctypes.c_ulonglong(len(data)),
+                None, ctypes.c_ulonglong(0),
+                None, direction.nonce, direction.key)
+            if ret:
+                raise ValueError("Failed to encrypt message.")
+            return ctypes.string_at(output, size)
+
+    def decrypt(self, data: bytes) -> bytes:
+        """Verify and decrypt a message with the auth tag appended."""
+        direction = self._read
+        size = len(data) - tag_size
+        if size < 0:
+            raise ValueError("Message shorter than the auth tag.")
+        with direction.lock:
+            if size > len(direction.buffer):
+                output = ctypes.create_string_buffer(size)
+            else:
+                output = direction.buffer
+            direction.next_nonce()
+            ret = libnacl.nacl.crypto_aead_chacha20poly1305_ietf_decrypt(
+                output, ctypes.byref(direction.length), None,
+                data, ctypes.c_ulonglong(len(data)),
+                None, ctypes.c_ulonglong(0),
+                direction.nonce, direction.key)
+            if ret:
+                raise ValueError("Failed to decrypt message: invalid auth tag.")
+            return ctypes.string_at(output, size)
+
+    def encrypt_in_place(self, buffer: bytearray, length: int) -> int:
+        """Encrypt the first length bytes of buffer in place.
+
+        The auth tag is written after the ciphertext, so the buffer must
+        hold at least length + 16 bytes. Returns the length of the
+        ciphertext with the tag.
+        """
+        size = length + tag_size
+        if len(buffer) < size:
+            raise ValueError("Buffer too small for the auth tag.")
+        direction = self._write
+        view = _c_buffer(buffer)
+        with direction.lock:
+            direction.next_nonce()
+            ret = libnacl.nacl.crypto_aead_chacha20poly1305_ietf_encrypt(
+                view, ctypes.byref(direction.length),
+                view, ctypes.c_ulonglong(length),
+                None, ctypes.c_ulonglong(0),
+                None, direction.nonce, direction.key)
+        del view
+        if ret:
+            raise ValueError("Failed to encrypt message.")
+        return size
+
+    def decrypt_in_place(self, buffer: bytearray, length: int) -> int:
+        """Verify and decrypt the first length bytes of buffer in place.
+
+        Returns the length of the plaintext, at the start of the buffer.
+        """
+        size = length - tag_size
+        if size < 0:
+            raise ValueError("Message shorter than the auth tag.")
+        direction = self._read
+        view = _c_buffer(buffer)
+        with direction.lock:
+            direction.next_nonce()
+            ret = libnacl.nacl.crypto_aead_chacha20poly1305_ietf_decrypt(
+                view, ctypes.byref(direction.length), None,
+                view, ctypes.c_ulonglong(length),
+                None, ctypes.c_ulonglong(0),
+                direction.nonce, direction.key)
+        del view
+        if ret:
+            raise ValueError("Failed to decrypt message: invalid auth tag.")
+        return size
@@ -0,0 +1,444 @@
+"""Snapshot of the controller state, for warm restarts.
+
+Rediscovering the GATT database, reading the CIDs and signatures and pair
+verifying every accessory of a large fleet takes minutes. A snapshot keeps
+in a single file the model of each accessory: the GATT handles, CIDs and
+signatures of its characteristics, its service graph and its last values,
+along with its resumable session ticket, sealed with the controller key.
+The keystore is not kept: its index is already loaded in a single read.
+
+The file is binary and compact: the UUIDs, shared by all accessories, are
+stored once in a string table. It is memory mapped on load, and only the
+index is parsed: the record of an accessory is decoded when it is restored.
+The model of an accessory is only restored if its configuration number did
+not change, as it changes with its GATT database.
+
+    save_snapshot('controller.snapshot', accessories, keystore,
+                  session_cache, advertised)
+    with Snapshot('controller.snapshot') as snapshot:
+        for accessory in accessories:
+            snapshot.restore(accessory, config_number, keystore,
+                             session_cache)
+"""
+
+import logging
+import mmap
+import time
+
+from struct import calcsize, pack, unpack_from
+from typing import Any, Dict, List, Optional, Sequence, Tuple  # NOQA pylint: disable=W0611
+from typing import NamedTuple, TYPE_CHECKING
+
+from .advertising import AccessoryRegistry
+from .keystore import Keystore, atomic_write
+from .model import (CharacteristicSignature, GattHandles, ServiceGraph,
+                    ServiceRecord, intern_uuid)
+from .pairing import SessionCache, SessionTicket
+
+if TYPE_CHECKING:
+    from .ble import HapAccessory  # NOQA pylint: disable=W0611
+
+logger = logging.getLogger(__name__)
+
+magic = b'PHKS'
+snapshot_version = 1
+# magic, version, created, string table and index offsets
+header_format = '<4sHdII'
+no_string = 0xFFFF
+no_config_number = -1
+
+# Tags of the typed values
+_value_formats = {
+    bool: b'?',
+    float: b'd',
+}
+
+SnapshotEntry = NamedTuple('SnapshotEntry', [
+    ('address', str),
+    ('config_number', int),
+    ('offset', int),
+])
+
+
+class _Writer:
+    """Appends little endian fields to a buffer."""
+
+    def __init__(self, strings: Dict[str, int]) -> None:
+        self.data = bytearray()
+        self.strings = strings
+
+    def pack(self, fmt: str, *values: Any) -> None:
+        self.data += pack('<' + fmt, *values)
+
+    def blob(self, value: bytes) -> None:
+        self.pack('I', len(value))
+        self.data += value
+
+    def text(self, value: str) -> None:
+        self.blob(value.encode('utf-8'))
+
+    def string(self, value: Optional[str]) -> None:
+        """Write a string of the string table, e.g. a UUID."""
+        if value is None:
+            self.pack('H', no_string)
+            return
+        if value not in self.strings:
+            self.strings[value] = len(self.strings)
+        self.pack('H', self.strings[value])
+
+    def value(self, value: Any) -> None:
+        """Write a characteristic value, with a tag of its type."""
+        if value is None:
+            self.data += b'N'
+        elif isinstance(value, (bool, float)):
+            self.data += _value_formats[type(value)]
+            self.pack(_value_formats[type(value)].decode(), value)
+        elif isinstance(value, int):
+            code = 'q' if value < 2**63 else 'Q'
+            self.data += code.encode()
+            self.pack(code, value)
+        elif isinstance(value, str):
+            self.data += b's'
+            self.text(value)
+        else:
+            self.data += b'b'
+            self.blob(bytes(value))
+
+
+class _Reader:
+    """Reads the fields written by _Writer from a buffer."""
+
+    def __init__(self, buffer: Any, offset: int, strings: List[str]) -> None:
+        self.buffer = buffer
+        self.offset = offset
+        self.strings = strings
+
+    def unpack(self, fmt: str) -> Tuple[Any, ...]:
+        values = unpack_from('<' + fmt, self.buffer, self.offset)
+        self.offset += calcsize('<' + fmt)
+        return values
+
+    def blob(self) -> bytes:
+        length, = self.unpack('I')
+        self.offset += length
+        return bytes(self.buffer[self.offset - length:self.offset])
+
+    def text(self) -> str:
+        return self.blob().decode('utf-8')
+
+    def string(self) -> Optional[str]:
+        index, = self.unpack('H')
+        return None if index == no_string else self.strings[index]
+
+    def uuid(self) -> str:
+        """Read a string of the string table that can not be None."""
+        value = self.string()
+        if value is None:
+            raise ValueError("Missing UUID at offset {}.".format(self.offset))
+        return value
+
+    def value(self) -> Any:
+        tag = self.buffer[self.offset:self.offset + 1]
+        self.offset += 1
+        if tag == b'N':
+            return None
+        if tag == b's':
+            return self.text()
+        if tag == b'b':
+            return self.blob()
+        return self.unpack(tag.decode())[0]
+
+
+def _write_signature(writer: _Writer,
+                     signature: CharacteristicSignature) -> None:
+    writer.string(signature.characteristic_type)
+    writer.string(signature.service_type)
+    for name in CharacteristicSignature.__slots__[2:]:
+        writer.value(getattr(signature, name))
+
+
+def _read_signature(reader: _Reader) -> CharacteristicSignature:
+    characteristic_type = reader.uuid()
+    service_type = reader.string()
+    return CharacteristicSignature(characteristic_type, service_type, *[
+        reader.value() for _ in CharacteristicSignature.__slots__[2:]
+    ])
+
+
+def _write_accessory(writer: _Writer,
+                     accessory: 'HapAccessory',
+                     keystore: Optional[Keystore]=None,
+                     session_cache: Optional[SessionCache]=None) -> None:
+    """Write the record of an accessory: its session ticket first, as it
+    does not depend on the configuration of the accessory."""
+    ticket = None  # type: Optional[SessionTicket]
+    if keystore is not None and session_cache is not None:
+        ticket = session_cache.tickets().get(accessory.address)
+    if ticket is None or keystore is None:
+        writer.blob(b'')
+    else:
+        writer.blob(
+            keystore.seal(
+                pack('<dB', ticket.created, len(ticket.session_id)) +
+                ticket.session_id + ticket.shared_secret,
+                accessory.address.lower().encode()))
+    writer.text(accessory.address_type)
+
+    # pylint: disable=W0212
+    writer.pack('H', len(accessory._characteristics))
+    for uuid, handles in accessory._characteristics.items():
+        characteristic = accessory._hap_characteristics.get(uuid)
+        writer.string(uuid)
+        writer.pack('HH', handles.value_handle, handles.cid_handle or 0)
+        cid = characteristic._cid if characteristic else None
+        writer.blob(cid or b'')
+        signature = characteristic._signature if characteristic else None
+        writer.pack('?', signature is not None)
+        if signature is not None:
+            _write_signature(writer, signature)
+
+    writer.pack('H', len(accessory.values))
+    for cid, value in accessory.values.items():
+        writer.blob(cid)
+        writer.value(value)
+
+    graph = accessory.service_graph
+    writer.pack('?', graph is not None)
+    if graph is not None:
+        writer.pack('H', len(graph))
+        for service in graph:
+            writer.string(service.service_type)
+            writer.pack('HHH', service.instance_id, service.properties,
+                        len(service.characteristics))
+            for uuid in service.characteristics:
+                writer.string(uuid)
+            writer.pack('H', len(service.linked_services))
+            writer.pack('{}H'.format(len(service.linked_services)),
+                        *service.linked_services)
+
+
+def save_snapshot(path: str,
+                  accessories: Sequence['HapAccessory'],
+                  keystore: Optional[Keystore]=None,
+                  session_cache: Optional[SessionCache]=None,
+                  advertised: Optional[AccessoryRegistry]=None) -> None:
+    """Write a snapshot of the state of the accessories.
+
+    Parameters
+    ----------
+    path
+        Path of the snapshot file, replaced atomically.
+
+    accessories
+        The accessories to snapshot, keyed by address.
+
+    keystore
+        Keystore of the controller, to seal the session tickets: without it,
+        the tickets are not kept.
+
+    session_cache
+        Resumable session tickets of the accessories.
+
+    advertised
+        Registry of the advertised state of the accessories, for their
+        configuration numbers. Accessories with no known configuration
+        number can not have their model restored.
+    """
+    config_numbers = {}  # type: Dict[str, int]
+    if advertised is not None:
+        config_numbers = {
+            accessory.address.lower(): accessory.advertisement.config_number
+            for accessory in advertised
+        }
+
+    strings = {}  # type: Dict[str, int]
+    records = _Writer(strings)
+    index = _Writer(strings)
+    index.pack('I', len(accessories))
+    for accessory in accessories:
+        address = accessory.address.lower()
+        index.text(address)
+        index.pack('iI',
+                   config_numbers.get(address, no_config_number),
+                   len(records.data))
+        _write_accessory(records, accessory, keystore, session_cache)
+
+    table = _Writer(strings)
+    ordered = sorted(strings, key=strings.__getitem__)
+    table.pack('I', len(ordered))
+    for string in ordered:
+        table.text(string)
+
+    # Record offsets are relative to the end of the index
+    strings_offset = calcsize(header_format)
+    index_offset = strings_offset + len(table.data)
+    header = pack(header_format, magic, snapshot_version, time.time(),
+                  strings_offset, index_offset)
+    atomic_write(path, b''.join((header, bytes(table.data),
+                                 bytes(index.data), bytes(records.data))))
+    logger.debug("Saved the snapshot of %s accessories to %s.",
+                 len(accessories), path)
+
+
+class Snapshot:
+    """A snapshot file, memory mapped.
+
+    Raises ValueError if the file is not a snapshot of this version.
+
+    Parameters
+    ----------
+    path
+        Path of the snapshot file.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as snapshot_file:
+            self._buffer = mmap.mmap(
+                snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._load_index()
+        except Exception:
+            self.close()
+            raise
+
+    def _load_index(self) -> None:
+        if len(self._buffer) < calcsize(header_format):
+            raise ValueError("Truncated snapshot {}.".format(self.path))
+        (file_magic, version, self.created, strings_offset,
+         index_offset) = unpack_from(header_format, self._buffer)
+        if file_magic != magic or version != snapshot_version:
+            raise ValueError("Unsupported snapshot {}, version {}.".format(
+                self.path, version))
+
+        reader = _Reader(self._buffer, strings_offset, [])
+        count, = reader.unpack('I')
+        self._strings = [intern_uuid(reader.text()) for _ in range(count)]
+
+        reader = _Reader(self._buffer, index_offset, self._strings)
+        count, = reader.unpack('I')
+        entries = []
+        for _ in range(count):
+            address = reader.text()
+            config_number, offset = reader.unpack('iI')
+            entries.append(SnapshotEntry(address, config_number, offset))
+        self._entries = {
+            entry.address: entry._replace(offset=entry.offset + reader.offset)
+            for entry in entries
+        }  # type: Dict[str, SnapshotEntry]
+
+    def entry(self, address: str) -> Optional[SnapshotEntry]:
+        """Return the index entry of an accessory, if in the snapshot."""
+        return self._entries.get(address.lower())
+
+    def restore(self,
+                accessory: 'HapAccessory',
+                config_number: int,
+                keystore: Optional[Keystore]=None,
+                session_cache: Optional[SessionCache]=None) -> bool:
+        """Restore the state of an accessory on first contact.
+
+        The session ticket is restored in the session cache, whatever the
+        configuration number. The model and the values are only restored if
+        the configuration number of the accessory is still the one of the
+        snapshot: it changes when its GATT database does.
+
+        Parameters
+        ----------
+        accessory
+            The accessory to restore, by address.
+
+        config_number
+            Current configuration number of the accessory, from its
+            advertisement.
+
+        keystore
+            Keystore of the controller, to unseal the session ticket.
+
+        session_cache
+            Cache to restore the session ticket in.
+
+        Returns whether the model was restored.
+        """
+        entry = self.entry(accessory.address)
+        if entry is None:
+            return False
+        reader = _Reader(self._buffer, entry.offset, self._strings)
+
+        sealed_ticket = reader.blob()
+        if sealed_ticket and keystore is not None and session_cache is not None:
+            try:
+                ticket = keystore.unseal(sealed_ticket,
+                                         entry.address.encode())
+            except ValueError:
+                logger.warning("Invalid session ticket of %s.",
+                               accessory.address)
+            else:
+                created, length = unpack_from('<dB', ticket)
+                start = calcsize('<dB')
+                session_cache.put(
+                    accessory.address,
+                    SessionTicket(ticket[start:start + length],
+                                  ticket[start + length:], created))
+
+        if (entry.config_number == no_config_number or
+                entry.config_number != config_number):
+            logger.debug("Configuration of %s changed from %s to %s.",
+                         accessory.address, entry.config_number,
+                         config_number)
+            return False
+        self._restore_model(reader, accessory)
+        return True
+
+    @staticmethod
+    def _restore_model(reader: _Reader, accessory: 'HapAccessory') -> None:
+        accessory.address_type = reader.text()
+
+        # pylint: disable=W0212
+        count, = reader.unpack('H')
+        for _ in range(count):
+            uuid = reader.uuid()
+            value_handle, cid_handle = reader.unpack('HH')
+            accessory._characteristics[uuid] = GattHandles(
+                value_handle, cid_handle or None)
+            characteristic = accessory.hap_characteristic(uuid)
+            characteristic._cid = reader.blob() or None
+            has_signature, = reader.unpack('?')
+            if has_signature:
+                characteristic._signature = _read_signature(reader)
+
+        count, = reader.unpack('H')
+        for _ in range(count):
+            cid = reader.blob()
+            accessory.values[cid] = reader.value()
+
+        has_graph, = reader.unpack('?')
+        if has_graph:
+            services = []
+            count, = reader.unpack('H')
+            for _ in range(count):
+                service_type = reader.uuid()
+                instance_id, properties, length = reader.unpack('HHH')
+                characteristics = tuple(
+                    reader.uuid() for _ in range(length))
+                length, = reader.unpack('H')
+                linked_services = reader.unpack('{}H'.format(length))
+                services.append(
+                    ServiceRecord(service_type, instance_id, characteristics,
+                                  properties, linked_services))
+            accessory.service_graph = ServiceGraph(services)
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __contains__(self, address: str) -> bool:
+        return address.lower() in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,7 +1,11 @@
 """Utility functions for BLE"""
 
+import importlib
 import logging
+import threading
+import types
 
+from contextlib import contextmanager
 from struct import pack
 from typing import (Any, Callable, Dict, List)  # NOQA pylint: disable=W0611
 from typing import (Tuple, Union, Optional, Iterator)  # NOQA pylint: disable=W0611
@@ -11,6 +15,36 @@ from . import constants
 logger = logging.getLogger(__name__)
 
 
+class LazyModule(types.ModuleType):
+    """Module imported on first attribute access.
+
+    Heavy dependencies are bound to a LazyModule, so that they are only
+    imported when first used rather than when pyhomekit is imported. Once
+    imported, the attributes of the module are copied over, and later
+    lookups cost the same as on the module itself.
+
+    Parameters
+    ----------
+    name
+        Absolute name of the module.
+    """
+
+    def __getattr__(self, attribute: str) -> Any:
+        if attribute.startswith('__'):
+            raise AttributeError(attribute)
+        module = importlib.import_module(self.__name__)
+        logger.debug("Imported %s.", self.__name__)
+        self.__dict__.update(module.__dict__)
+        # Modules wrapped in a proxy only expose some attributes through
+        # getattr, keep them too
+        value = getattr(module, attribute)
+        setattr(self, attribute, value)
+        return value
+
+
+asyncio = LazyModule('asyncio')
+
+
 def iterate_tvl(response: bytes) -> Iterator[Tuple[int, int, bytes]]:
     """Iterate through response bytes, 1 tlv at a time."""
     start = 0
@@ -44,23 +78,102 @@ def prepare_tlv(param_type: int, value: bytes) -> Iterator[bytes]:
         value = value[255:]
 
 
-def parse_ktlvs(data: bytes) -> Dict[str, Any]:
-    """Parse ktlvs."""
-    logger.debug("Parse ktlvs.")
-    attributes = {}  # type: Dict[str, Any]
+def parse_tlvs(data: bytes) -> Dict[int, bytes]:
+    """Parse TLVs keyed by their integer type.
+
+    The values of a repeated type are joined, as values longer than 255
+    bytes are split in consecutive TLVs. Use the constants enums as keys,
+    e.g. PairingKTlvValues.kTLVType_State."""
+    attributes = {}  # type: Dict[int, bytes]
     for body_type, length, bytes_ in iterate_tvl(data):
         if len(bytes_) != length:
             raise HapBleError(name="Invalid response length")
-        name = constants.PairingKTlvValues()(body_type)
-        if name in attributes:
-            logger.debug("Duplicate kTLV Value found: %s. Appending.", name)
-            bytes_ = attributes[name] + bytes_
+        if body_type in attributes:
+            bytes_ = attributes[body_type] + bytes_
+        attributes[body_type] = bytes_
+    return attributes
+
+
+def parse_ktlvs(data: bytes) -> Dict[str, Any]:
+    """Parse ktlvs, keyed by the kTLV type name."""
+    logger.debug("Parse ktlvs.")
+    attributes = {}  # type: Dict[str, Any]
+    for body_type, bytes_ in parse_tlvs(data).items():
+        name = constants.pairing_tlv_names[body_type]
+        if name is None:
+            raise HapBleError(name="Unknown kTLV type {}".format(body_type))
         attributes[name] = bytes_
         logger.debug("TLV found in response. %s: %s", name, bytes_)
 
     return attributes
 
 
+class TlvStreamParser:
+    """Incremental TLV parser for data received in fragments.
+
+    Fragment boundaries do not align with TLVs. Only the incomplete TLV at
+    the end of a fragment is buffered until the next one arrives.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple[int, bytes]]:
+        """Add a fragment and return the TLVs it completes."""
+        self._buffer += data
+        tlvs = []  # type: List[Tuple[int, bytes]]
+        start = 0
+        while len(self._buffer) - start >= 2:
+            end = start + 2 + self._buffer[start + 1]
+            if end > len(self._buffer):
+                break
+            tlvs.append((self._buffer[start],
+                         bytes(self._buffer[start + 2:end])))
+            start = end
+        del self._buffer[:start]
+        return tlvs
+
+    def close(self) -> None:
+        """Check that no incomplete TLV is left."""
+        if self._buffer:
+            raise HapBleError(name="Invalid response length")
+
+
+class AsyncIteratorInExecutor:
+    """Async iterator over a blocking iterator.
+
+    Each item is produced in the default executor of the running event loop,
+    so only one item is in memory at a time. Used as an async context
+    manager, the iterator is closed on exit.
+    """
+
+    def __init__(self, iterator: Iterator[Any]) -> None:
+        self._iterator = iterator
+
+    def __aiter__(self) -> 'AsyncIteratorInExecutor':
+        return self
+
+    async def __anext__(self) -> Any:
+        done = object()
+        loop = asyncio.get_running_loop()
+        item = await loop.run_in_executor(None, next, self._iterator, done)
+        if item is done:
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self) -> None:
+        """Stop iterating, releasing the resources held by the iterator."""
+        close = getattr(self._iterator, 'close', None)
+        if close is not None:
+            close()
+
+    async def __aenter__(self) -> 'AsyncIteratorInExecutor':
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
 class HapBleError(Exception):
     """HAP Error."""
 
@@ -82,11 +195,11 @@ class HapBleError(Exception):
         message
             status code message.
         """
+        self.status_code = status_code
         if status_code is None:
             self.name = name
             self.message = message
         else:
-            self.status_code = status_code
             self.name = constants.status_code_to_name[status_code]
             self.message = constants.status_code_to_message[status_code]
 
@@ -95,3 +208,85 @@ class HapBleError(Exception):
     def __str__(self) -> str:
         """Return formatted error."""
         return "{}: {}".format(self.name, self.message)
+
+
+class AdaptiveConcurrencyLimit:
+    """Adaptive limit on the number of concurrent HAP procedures of an accessory.
+
+    The limit follows an AIMD scheme: it grows by one for every `limit`
+    successful procedures, and is multiplied by `decrease_factor` every time
+    the accessory reports it has reached its maximum number of procedures.
+    Procedures wait in line until the number in flight is below the limit.
+
+    Parameters
+    ----------
+    max_limit
+        Upper bound of the limit.
+
+    initial_limit
+        Limit before any feedback from the accessory.
+
+    decrease_factor
+        Multiplicative decrease applied on backpressure.
+    """
+
+    def __init__(self,
+                 max_limit: int=1,
+                 initial_limit: int=1,
+                 decrease_factor: float=0.5) -> None:
+        if not 1 <= initial_limit <= max_limit:
+            raise ValueError("Invalid initial limit {}, expected 1 to {}.".
+                             format(initial_limit, max_limit))
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        """Current number of procedures allowed to run concurrently."""
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of procedures currently running."""
+        return self._in_flight
+
+    def acquire(self, timeout: float=None) -> bool:
+        """Wait for a free procedure slot. Returns False on timeout."""
+        with self._condition:
+            acquired = self._condition.wait_for(
+                lambda: self._in_flight < self.limit, timeout)
+            if acquired:
+                self._in_flight += 1
+            return acquired
+
+    def release(self) -> None:
+        """Free a procedure slot."""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Context manager holding a procedure slot."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_success(self) -> None:
+        """Additive increase after a procedure completed."""
+        with self._condition:
+            self._limit = min(float(self.max_limit),
+                              self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def on_backpressure(self) -> None:
+        """Multiplicative decrease after a Max_Procedures status."""
+        with self._condition:
+            self._limit = max(1.0, self._limit * self.decrease_factor)
+        logger.debug("Max procedures reached, concurrency limit now %s.",
+                     self.limit)
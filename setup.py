@@ -45,8 +45,9 @@ setup(
         'Programming Language :: Python :: 3.6',
     ],
     keywords='homekit bluetooth home',
-    packages=find_packages(exclude=['contrib', 'docs', 'tests']),
+    packages=find_packages(exclude=['benchmarks', 'contrib', 'docs', 'tests', 'tools']),
     install_requires=install_requires,
     extras_require={
         'dev': ['py.test', 'mypy', 'pylint', 'flake8', 'docutils', 'Sphinx'],
+        'gmpy2': ['gmpy2'],
     }, )
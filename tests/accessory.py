@@ -0,0 +1,223 @@
+"""Accessory side of the pairing procedures, for tests and benchmarks."""
+
+import random
+
+import os
+
+from struct import pack
+from typing import Any, Dict, List, Tuple  # NOQA pylint: disable=W0611
+
+import ed25519
+from cryptography.hazmat.primitives.asymmetric.x25519 import (X25519PrivateKey,
+                                                              X25519PublicKey)
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from libnacl import (crypto_aead_chacha20poly1305_ietf_decrypt,
+                     crypto_aead_chacha20poly1305_ietf_encrypt)
+
+from pyhomekit import constants, utils
+from pyhomekit.pairing import (H, H_bytes, N, USERNAME,
+                               derive_resume_session_id, derive_session_key,
+                               from_bytes, g_pow, pairing_nonce, powmod, srp,
+                               to_bytes)
+
+ktlv = constants.PairingKTlvValues
+
+
+def prepare_ktlvs(ktlvs: List[Tuple[int, bytes]]) -> bytes:
+    return b''.join(data for item in ktlvs for data in utils.prepare_tlv(*item))
+
+
+def exchange(ktlvs: List[Tuple[int, bytes]]) -> Dict[str, bytes]:
+    """Serialize and parse kTLVs, as sent over the air."""
+    return utils.parse_ktlvs(prepare_ktlvs(ktlvs))
+
+
+class Accessory:
+    """Accessory answering pair setup, pair verify, pair resume and pairings
+    requests."""
+
+    def __init__(self,
+                 pairing_id: bytes=b'11:22:33:44:55:66',
+                 setup_code: str='111-22-333') -> None:
+        self.pairing_id = pairing_id
+        self.setup_code = setup_code
+        self._setup = {}  # type: Dict[str, Any]
+        self.signing_key, self.ltpk = ed25519.create_keypair()
+        self.controllers = {}  # type: Dict[bytes, bytes]
+        self.permissions = {}  # type: Dict[bytes, int]
+        self.sessions = {}  # type: Dict[bytes, bytes]
+        self.shared_secret = b''
+        self._verify = {}  # type: Dict[str, Any]
+
+    def pair_setup(self, request: Dict[str, bytes]) -> List[Tuple[int, bytes]]:
+        """Answer pair setup M1, M3 and M5."""
+        state = request['kTLVType_State'][0]
+        if state == 1:
+            return self._srp_start()
+        if state == 3:
+            return self._srp_verify(request)
+        return self._exchange(request)
+
+    def _srp_start(self) -> List[Tuple[int, bytes]]:
+        salt = os.urandom(16)
+        x = H(salt, H_bytes(USERNAME, self.setup_code, sep=b":"))
+        v = g_pow(x)
+        b = random.SystemRandom().getrandbits(256)
+        B = (srp.k * v + g_pow(b)) % N
+        self._setup = {'salt': salt, 'v': v, 'b': b, 'B': B}
+        return [(ktlv.kTLVType_State, pack('<B', 2)),
+                (ktlv.kTLVType_PublicKey, to_bytes(B)),
+                (ktlv.kTLVType_Salt, salt)]
+
+    def _srp_verify(self, request: Dict[str, bytes]) -> List[Tuple[int, bytes]]:
+        setup = self._setup
+        A = from_bytes(request['kTLVType_PublicKey'])
+        u = H(A, setup['B'], pad=True)
+        S = powmod(A * powmod(setup['v'], u, N) % N, setup['b'], N)
+        K = H_bytes(S)
+        M1 = H_bytes(srp.H_N_xor_H_g, srp.H_USERNAME, setup['salt'], A,
+                     setup['B'], K)
+        if M1 != request['kTLVType_Proof']:
+            return [(ktlv.kTLVType_State, pack('<B', 4)),
+                    (ktlv.kTLVType_Error, pack('<B', 2))]
+        setup['K'] = K
+        return [(ktlv.kTLVType_State, pack('<B', 4)),
+                (ktlv.kTLVType_Proof, H_bytes(A, M1, K))]
+
+    def _exchange(self, request: Dict[str, bytes]) -> List[Tuple[int, bytes]]:
+        K = self._setup['K']
+        session_key = derive_session_key(
+            K, salt=b"Pair-Setup-Encrypt-Salt", info=b"Pair-Setup-Encrypt-Info")
+        decrypted = utils.parse_ktlvs(
+            crypto_aead_chacha20poly1305_ietf_decrypt(
+                request['kTLVType_EncryptedData'], b'',
+                pairing_nonce(b"PS-Msg05"), session_key))
+        controller_id = decrypted['kTLVType_Identifier']
+        controller_ltpk = decrypted['kTLVType_PublicKey']
+        ed25519.VerifyingKey(controller_ltpk).verify(
+            decrypted['kTLVType_Signature'],
+            derive_session_key(K) + controller_id + controller_ltpk)
+        self.controllers[controller_id] = controller_ltpk
+        self.permissions[controller_id] = constants.PairingPermissions.Admin
+
+        accessory_x = derive_session_key(
+            K,
+            salt=b"Pair-Setup-Accessory-Sign-Salt",
+            info=b"Pair-Setup-Accessory-Sign-Info")
+        ltpk = self.ltpk.to_bytes()
+        signature = self.signing_key.sign(accessory_x + self.pairing_id + ltpk)
+        encrypted = crypto_aead_chacha20poly1305_ietf_encrypt(
+            prepare_ktlvs([(ktlv.kTLVType_Identifier, self.pairing_id),
+                           (ktlv.kTLVType_PublicKey, ltpk),
+                           (ktlv.kTLVType_Signature, signature)]), b'',
+            pairing_nonce(b"PS-Msg06"), session_key)
+        return [(ktlv.kTLVType_State, pack('<B', 6)),
+                (ktlv.kTLVType_EncryptedData, encrypted)]
+
+    def pair_verify(self, request: Dict[str, bytes]) -> List[Tuple[int, bytes]]:
+        """Answer pair verify M1 (or resume M1) and M3."""
+        state = request['kTLVType_State'][0]
+        if state == 1 and 'kTLVType_SessionID' in request:
+            shared_secret = self.sessions.pop(request['kTLVType_SessionID'],
+                                              None)
+            if shared_secret is not None:
+                return self._resume(request, shared_secret)
+        if state == 1:
+            return self._verify_start(request)
+        return self._verify_finish(request)
+
+    def _resume(self, request: Dict[str, bytes],
+                shared_secret: bytes) -> List[Tuple[int, bytes]]:
+        public_key = request['kTLVType_PublicKey']
+        request_key = derive_session_key(
+            shared_secret,
+            salt=public_key + request['kTLVType_SessionID'],
+            info=b"Pair-Resume-Request-Info")
+        crypto_aead_chacha20poly1305_ietf_decrypt(
+            request['kTLVType_EncryptedData'], b'',
+            pairing_nonce(b"PR-Msg01"), request_key)
+
+        new_session_id = os.urandom(8)
+        salt = public_key + new_session_id
+        response_key = derive_session_key(
+            shared_secret, salt=salt, info=b"Pair-Resume-Response-Info")
+        auth_tag = crypto_aead_chacha20poly1305_ietf_encrypt(
+            b'', b'', pairing_nonce(b"PR-Msg02"), response_key)
+        self.shared_secret = derive_session_key(
+            shared_secret, salt=salt, info=b"Pair-Resume-Shared-Secret-Info")
+        self.sessions[new_session_id] = self.shared_secret
+        return [(ktlv.kTLVType_State, pack('<B', 2)),
+                (ktlv.kTLVType_Method,
+                 pack('<B', constants.PairingKTLVMethodValues.Resume)),
+                (ktlv.kTLVType_SessionID, new_session_id),
+                (ktlv.kTLVType_EncryptedData, auth_tag)]
+
+    def _verify_start(self, request: Dict[str, bytes]) -> List[Tuple[int, bytes]]:
+        private_key = X25519PrivateKey.generate()
+        public_key = private_key.public_key().public_bytes(
+            Encoding.Raw, PublicFormat.Raw)
+        controller_key = request['kTLVType_PublicKey']
+        shared_secret = private_key.exchange(
+            X25519PublicKey.from_public_bytes(controller_key))
+        session_key = derive_session_key(
+            shared_secret,
+            salt=b"Pair-Verify-Encrypt-Salt",
+            info=b"Pair-Verify-Encrypt-Info")
+        signature = self.signing_key.sign(public_key + self.pairing_id +
+                                          controller_key)
+        encrypted = crypto_aead_chacha20poly1305_ietf_encrypt(
+            prepare_ktlvs([(ktlv.kTLVType_Identifier, self.pairing_id),
+                           (ktlv.kTLVType_Signature, signature)]), b'',
+            pairing_nonce(b"PV-Msg02"), session_key)
+        self._verify = {
+            'public_key': public_key,
+            'controller_key': controller_key,
+            'shared_secret': shared_secret,
+            'session_key': session_key
+        }
+        return [(ktlv.kTLVType_State, pack('<B', 2)),
+                (ktlv.kTLVType_PublicKey, public_key),
+                (ktlv.kTLVType_EncryptedData, encrypted)]
+
+    def _verify_finish(self, request: Dict[str, bytes]) -> List[Tuple[int, bytes]]:
+        decrypted = utils.parse_ktlvs(
+            crypto_aead_chacha20poly1305_ietf_decrypt(
+                request['kTLVType_EncryptedData'], b'',
+                pairing_nonce(b"PV-Msg03"), self._verify['session_key']))
+        controller_id = decrypted['kTLVType_Identifier']
+        if controller_id not in self.controllers:
+            return [(ktlv.kTLVType_State, pack('<B', 4)),
+                    (ktlv.kTLVType_Error, pack('<B', 2))]
+        ed25519.VerifyingKey(self.controllers[controller_id]).verify(
+            decrypted['kTLVType_Signature'],
+            self._verify['controller_key'] + controller_id +
+            self._verify['public_key'])
+        self.shared_secret = self._verify['shared_secret']
+        self.sessions[derive_resume_session_id(
+            self.shared_secret)] = self.shared_secret
+        return [(ktlv.kTLVType_State, pack('<B', 4))]
+
+    def pairings(self, request: Dict[str, bytes]) -> List[Tuple[int, bytes]]:
+        """Answer add, remove and list pairings requests."""
+        method = request['kTLVType_Method'][0]
+        response = [(ktlv.kTLVType_State, pack('<B', 2))]
+        if method == constants.PairingKTLVMethodValues.Add_Pairing:
+            controller_id = request['kTLVType_Identifier']
+            ltpk = request['kTLVType_PublicKey']
+            if self.controllers.get(controller_id, ltpk) != ltpk:
+                return response + [(ktlv.kTLVType_Error, pack('<B', 1))]
+            self.controllers[controller_id] = ltpk
+            self.permissions[controller_id] = request['kTLVType_Permissions'][0]
+        elif method == constants.PairingKTLVMethodValues.Remove_Pairing:
+            self.controllers.pop(request['kTLVType_Identifier'], None)
+            self.permissions.pop(request['kTLVType_Identifier'], None)
+        else:
+            for i, (controller_id, ltpk) in enumerate(
+                    sorted(self.controllers.items())):
+                if i:
+                    response.append((ktlv.kTLVType_Separator, b''))
+                response += [(ktlv.kTLVType_Identifier, controller_id),
+                             (ktlv.kTLVType_PublicKey, ltpk),
+                             (ktlv.kTLVType_Permissions,
+                              pack('<B', self.permissions[controller_id]))]
+        return response
@@ -0,0 +1,142 @@
+import pytest
+
+from pyhomekit import constants
+from pyhomekit.admin import PairingAdmin
+from pyhomekit.pairing import (PairingEntry, PairingError, PairVerifyError,
+                               add_pairing_request, list_pairings_request,
+                               parse_pairings_response, remove_pairing_request)
+
+from .accessory import Accessory, exchange, prepare_ktlvs
+
+admin_id = b'AA:AA:AA:AA:AA:AA'
+admin_ltpk = bytes(32)
+new_admin_id = b'BB:BB:BB:BB:BB:BB'
+new_admin_ltpk = bytes(range(32))
+
+
+class RadioAccessory:
+    """Stands for a pair verified HapAccessory, in memory."""
+
+    def __init__(self, address, unreachable=False):
+        self.address = address
+        self.unreachable = unreachable
+        self.accessory = Accessory(pairing_id=address.encode())
+        self.accessory.controllers[admin_id] = admin_ltpk
+        self.accessory.permissions[admin_id] = (
+            constants.PairingPermissions.Admin)
+        self.connected = False
+
+    def connect(self):
+        if self.unreachable:
+            raise OSError("Accessory unreachable")
+        self.connected = True
+
+    def disconnect(self):
+        self.connected = False
+
+    def pair_verify(self, pairing_id, storage_folder, session_cache=None):
+        if pairing_id not in self.accessory.controllers:
+            raise PairVerifyError(2)
+
+    def _write_pairings(self, ktlvs):
+        return parse_pairings_response(
+            prepare_ktlvs(self.accessory.pairings(exchange(ktlvs))))
+
+    def add_pairing(self, pairing_id, public_key, permissions):
+        self._write_pairings(
+            add_pairing_request(pairing_id, public_key, permissions))
+
+    def remove_pairing(self, pairing_id):
+        self._write_pairings(remove_pairing_request(pairing_id))
+
+    def list_pairings(self):
+        return self._write_pairings(list_pairings_request())
+
+
+def test_list_pairings_response():
+    accessory = Accessory()
+    accessory.controllers = {admin_id: admin_ltpk, new_admin_id: bytes(32)}
+    accessory.permissions = {admin_id: 1, new_admin_id: 0}
+    assert parse_pairings_response(
+        prepare_ktlvs(accessory.pairings(exchange(
+            list_pairings_request())))) == [
+                PairingEntry(admin_id, admin_ltpk, 1),
+                PairingEntry(new_admin_id, bytes(32), 0)
+            ]
+
+    error = prepare_ktlvs(
+        accessory.pairings(
+            exchange(add_pairing_request(admin_id, new_admin_ltpk))))
+    with pytest.raises(PairingError) as e:
+        parse_pairings_response(error)
+    assert e.value.name == 'kTLVError_Unknown'
+
+
+def test_rotate_admin(tmpdir):
+    fleet = [RadioAccessory('11:22:33:44:55:{:02X}'.format(i))
+             for i in range(5)]
+    admin = PairingAdmin(admin_id, str(tmpdir), io_workers=3)
+
+    report = admin.rotate_admin(fleet, new_admin_id, new_admin_ltpk)
+    assert len(report.succeeded) == 5
+    assert report.throughput > 0
+    for radio in fleet:
+        assert radio.accessory.controllers == {new_admin_id: new_admin_ltpk}
+
+    report = PairingAdmin(new_admin_id, str(tmpdir)).list_pairings(fleet)
+    assert report.pairings() == {
+        radio.address: [PairingEntry(new_admin_id, new_admin_ltpk, 1)]
+        for radio in fleet
+    }
+
+
+def test_resume_batch(tmpdir):
+    fleet = [RadioAccessory('11:22:33:44:55:{:02X}'.format(i))
+             for i in range(4)]
+    fleet[2].unreachable = True
+    stages = []
+    admin = PairingAdmin(
+        admin_id,
+        str(tmpdir),
+        progress=lambda address, stage: stages.append((address, stage)))
+
+    report = admin.add_pairing(
+        fleet, new_admin_id, new_admin_ltpk, batch='add-new-admin')
+    assert [result.address for result in report.failed] == [fleet[2].address]
+    assert isinstance(report.failed[0].error, OSError)
+    assert (fleet[2].address, 'failed') in stages
+
+    fleet[2].unreachable = False
+    report = admin.add_pairing(
+        fleet, new_admin_id, new_admin_ltpk, batch='add-new-admin')
+    assert [result.address for result in report.succeeded] == [
+        fleet[2].address
+    ]
+    assert len(report.skipped) == 3
+    assert all(new_admin_id in radio.accessory.controllers for radio in fleet)
+    assert len(admin.journal('add-new-admin')) == 4
+    assert not any(radio.connected for radio in fleet)
+
+
+def test_resume_rotation_after_own_pairing_removed(tmpdir):
+    fleet = [RadioAccessory('11:22:33:44:55:{:02X}'.format(i))
+             for i in range(3)]
+    admin = PairingAdmin(admin_id, str(tmpdir))
+    # Interrupted after the removal of the old admin of fleet[0], before
+    # the journal recorded it
+    fleet[0].accessory.controllers = {new_admin_id: new_admin_ltpk}
+    admin.journal('rotate').record(fleet[0].address, 1)
+
+    report = admin.rotate_admin(fleet, new_admin_id, new_admin_ltpk,
+                                batch='rotate')
+    assert len(report.succeeded) == 3
+    journal = admin.journal('rotate')
+    assert all(journal.operations_done(radio.address) == 2 for radio in fleet)
+
+    report = admin.rotate_admin(fleet, new_admin_id, new_admin_ltpk,
+                                batch='rotate')
+    assert len(report.skipped) == 3
+
+    # Without the journal, the rejection is an error
+    report = admin.rotate_admin(fleet[:1], new_admin_id, new_admin_ltpk)
+    assert isinstance(report.failed[0].error, PairVerifyError)
@@ -0,0 +1,48 @@
+from pyhomekit.advertising import (AccessoryRegistry, gsn_incremented,
+                                   parse_manufacturer_data)
+
+
+def manufacturer_data(gsn: int, config_number: int=1) -> bytes:
+    return (bytes([0x4C, 0x00, 0x06, 0x2D, 0x00]) +
+            bytes([0x11, 0x22, 0x33, 0x44, 0x55, 0x66]) +
+            (6).to_bytes(2, 'little') + gsn.to_bytes(2, 'little') +
+            bytes([config_number, 0x02]))
+
+
+def test_parse_manufacturer_data():
+    advertisement = parse_manufacturer_data(manufacturer_data(gsn=300))
+    assert advertisement.device_id == '11:22:33:44:55:66'
+    assert advertisement.category == 6
+    assert advertisement.gsn == 300
+    assert advertisement.config_number == 1
+    assert advertisement.compatible_version == 2
+    assert advertisement.advertising_interval == 1
+    assert parse_manufacturer_data(b'\x4c\x00\x10\x05') is None
+
+
+def test_gsn_incremented():
+    assert gsn_incremented(1, 2)
+    assert gsn_incremented(65535, 1)
+    assert not gsn_incremented(2, 2)
+    assert not gsn_incremented(3, 2)
+
+
+def test_registry_dirty_on_gsn_increment():
+    registry = AccessoryRegistry()
+    address = 'aa:bb:cc:dd:ee:ff'
+    assert not registry.update(address, parse_manufacturer_data(manufacturer_data(5)))
+    assert not registry.update(address, parse_manufacturer_data(manufacturer_data(5)))
+    assert not registry.dirty()
+
+    assert registry.update(address, parse_manufacturer_data(manufacturer_data(6)))
+    assert [a.device_id for a in registry.dirty()] == ['11:22:33:44:55:66']
+    registry.mark_clean('11:22:33:44:55:66')
+    assert not registry.dirty()
+
+    # Stale advertisement
+    assert not registry.update(address, parse_manufacturer_data(manufacturer_data(5)))
+    assert registry.get('11:22:33:44:55:66').advertisement.gsn == 6
+
+    # Firmware update resets the GSN
+    assert registry.update(address, parse_manufacturer_data(manufacturer_data(1, 2)))
+    assert registry.get('11:22:33:44:55:66').config_changed
@@ -0,0 +1,120 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from pyhomekit import crypto, pairing
+from pyhomekit.commissioning import Commissioner, crypto_process_pool
+from pyhomekit.keystore import get_keystore
+from pyhomekit.pairing import EphemeralKeyPool, SRPPairSetup, run_pair_setup
+
+from .accessory import Accessory, exchange
+from .test_pair_verify import controller_id, verify
+
+
+class RadioAccessory:
+    """Stands for a HapAccessory, with the accessory side in memory."""
+
+    def __init__(self, address, setup_code='111-22-333'):
+        self.address = address
+        self.accessory = Accessory(
+            pairing_id=address.encode(), setup_code=setup_code)
+
+    def connect(self):
+        pass
+
+    def pair(self, pairing_id, storage_folder, setup_code, executor=None,
+             on_stage=None, ephemeral_pool=None):
+        session = SRPPairSetup(pairing_id, storage_folder, setup_code,
+                               ephemeral_pool=ephemeral_pool)
+        run_pair_setup(
+            session,
+            lambda ktlvs: exchange(self.accessory.pair_setup(exchange(ktlvs))),
+            executor, on_stage)
+        return session
+
+
+def worker_state():
+    pool = pairing._ephemeral_pool
+    return (crypto.get_provider().name, bool(pairing.g_pow._table),
+            pool is not None and pool.size)
+
+
+def test_crypto_process_pool():
+    providers = crypto.available_providers()
+    try:
+        crypto.set_provider(providers[-1])
+        with crypto_process_pool(max_workers=1, ephemeral_keys=2) as executor:
+            assert executor.submit(worker_state).result() == (
+                providers[-1].name, True, 2)
+    finally:
+        crypto.set_provider(None)
+
+
+def test_pair_setup_then_verify(tmpdir):
+    radio = RadioAccessory('11:22:33:44:55:66')
+    with crypto_process_pool(max_workers=1) as executor:
+        session = radio.pair(controller_id, str(tmpdir), '111-22-333',
+                             executor)
+    assert session.accessory_pairing_id == b'11:22:33:44:55:66'
+    assert radio.accessory.controllers[controller_id] == (
+        session.verifying_key.to_bytes())
+
+    verified = verify(radio.accessory, str(tmpdir))
+    assert verified.shared_secret == radio.accessory.shared_secret
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Thread pool recording the arguments of the submitted calls."""
+
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.calls = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.calls.append((fn, args))
+        return super().submit(fn, *args, **kwargs)
+
+
+def test_executor_generates_ephemeral_key(tmpdir):
+    radio = RadioAccessory('11:22:33:44:55:66')
+    ephemeral_pool = EphemeralKeyPool(size=1)
+    try:
+        with RecordingExecutor() as executor:
+            session = radio.pair(controller_id, str(tmpdir), '111-22-333',
+                                 executor, ephemeral_pool=ephemeral_pool)
+    finally:
+        ephemeral_pool.close()
+    assert session.accessory_pairing_id == b'11:22:33:44:55:66'
+    [(fn, args)] = executor.calls
+    assert fn is pairing.compute_srp_proof
+    # No ephemeral secret is sent to the executor
+    assert args[3] is None
+
+
+def test_commission_fleet(tmpdir):
+    fleet = [RadioAccessory('11:22:33:44:55:{:02X}'.format(i))
+             for i in range(4)]
+    fleet.append(RadioAccessory('11:22:33:44:55:FF', setup_code='999-99-999'))
+    stages = []
+    commissioner = Commissioner(
+        controller_id,
+        str(tmpdir),
+        io_workers=3,
+        progress=lambda address, stage: stages.append((address, stage)))
+
+    report = commissioner.commission(
+        [(radio, '111-22-333') for radio in fleet])
+
+    assert [result.address for result in report.succeeded] == [
+        radio.address for radio in fleet[:4]
+    ]
+    assert [result.address for result in report.failed] == ['11:22:33:44:55:FF']
+    assert report.throughput > 0
+    assert set(report.mean_stage_times()) == {
+        'connect', 'srp_start', 'srp_proof', 'srp_verify',
+        'exchange_request', 'exchange'
+    }
+    assert ('11:22:33:44:55:00', 'paired') in stages
+    assert ('11:22:33:44:55:FF', 'failed') in stages
+    assert len(get_keystore(str(tmpdir))) == 4
+    # The fleet shares one controller key
+    assert len({radio.accessory.controllers[controller_id]
+                for radio in fleet[:4]}) == 1
@@ -0,0 +1,47 @@
+import ed25519
+import pytest
+
+from pyhomekit import crypto
+
+providers = [provider.name for provider in crypto.available_providers()]
+
+
+@pytest.fixture(params=providers)
+def provider(request):
+    return crypto.providers[request.param]()
+
+
+def test_ed25519_package_keys(provider):
+    signing_key, verifying_key = ed25519.create_keypair()
+    message = b'device info'
+    assert provider.sign(signing_key.to_bytes(),
+                         message) == signing_key.sign(message)
+    assert provider.public_key(
+        signing_key.to_bytes()) == verifying_key.to_bytes()
+
+
+def test_select_provider(monkeypatch):
+    timings = {'sodium': 2.0, 'cryptography': 1.0}
+    monkeypatch.setattr(crypto, 'time_provider',
+                        lambda provider, number: timings[provider.name])
+    assert crypto.select_provider(providers).name == min(
+        providers, key=timings.get)
+
+
+def test_default_provider(monkeypatch):
+    monkeypatch.setattr(crypto, 'time_provider', None)
+    monkeypatch.delenv(crypto.provider_env_variable, raising=False)
+    assert crypto.default_provider().name == providers[0]
+    monkeypatch.setenv(crypto.provider_env_variable, providers[-1])
+    assert crypto.default_provider().name == providers[-1]
+    monkeypatch.setenv(crypto.provider_env_variable, 'rot13')
+    with pytest.raises(ValueError):
+        crypto.default_provider()
+
+
+def test_set_provider():
+    try:
+        crypto.set_provider(providers[0])
+        assert crypto.get_provider().name == providers[0]
+    finally:
+        crypto.set_provider(None)
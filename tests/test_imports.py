@@ -0,0 +1,30 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_imports import heavy_modules, measure
+from pyhomekit import crypto
+
+
+@pytest.mark.parametrize(
+    'module', ['pyhomekit.pairing', 'pyhomekit.ble', 'pyhomekit.commissioning'])
+def test_heavy_dependencies_imported_on_first_use(module):
+    elapsed, imported = measure(module)
+    assert not imported.intersection(heavy_modules)
+    # Generous, only catches an eager import of a heavy dependency
+    assert elapsed < 1
+
+
+def test_lazy_module():
+    provider = crypto.CryptographyProvider()
+    assert len(provider.hkdf_sha512(b'secret', b'', b'', 8)) == 8
+    # Attributes are copied once the module is imported
+    assert 'HKDF' in vars(crypto.hkdf)
+
+
+def test_srp_constants_computed_on_first_use():
+    code = ("from pyhomekit import pairing; "
+            "print(pairing.srp._values is None, pairing.g_pow._table == [])")
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert output.split() == [b'True', b'True']
@@ -0,0 +1,59 @@
+import os
+
+import ed25519
+import pytest
+
+from pyhomekit import keystore as keystore_module
+from pyhomekit.keystore import Keystore, get_keystore
+
+
+def test_pairings_persist(tmpdir):
+    keystore = Keystore(str(tmpdir))
+    _, verifying_key = ed25519.create_keypair()
+    keystore.add_pairing(b'11:22:33:44:55:66', verifying_key.to_bytes())
+    keystore.add_pairing(b'11:22:33:44:55:77', bytes(32))
+    keystore.remove_pairing(b'11:22:33:44:55:77')
+
+    reloaded = Keystore(str(tmpdir))
+    assert list(reloaded) == [b'11:22:33:44:55:66']
+    assert b'11:22:33:44:55:66' in reloaded
+    assert reloaded.accessory_ltpk(
+        b'11:22:33:44:55:66') == verifying_key.to_bytes()
+    assert reloaded.verifying_key(
+        b'11:22:33:44:55:66') is reloaded.verifying_key(b'11:22:33:44:55:66')
+    with pytest.raises(ValueError, match="^Unknown accessory 11:22:33:44:55:77"):
+        reloaded.accessory_ltpk(b'11:22:33:44:55:77')
+
+    # No temporary files left behind
+    assert sorted(os.listdir(str(tmpdir))) == ['pairings.json']
+
+
+def test_batch_writes_once(tmpdir, monkeypatch):
+    keystore = Keystore(str(tmpdir))
+    writes = []
+    write = keystore_module.atomic_write
+    monkeypatch.setattr(keystore_module, 'atomic_write',
+                        lambda *args: writes.append(write(*args)))
+    with keystore.batch():
+        for i in range(100):
+            keystore.add_pairing('{:02X}'.format(i).encode(), bytes(32))
+    assert len(writes) == 1
+    assert len(Keystore(str(tmpdir))) == 100
+
+
+def test_controller_key(tmpdir):
+    keystore = Keystore(str(tmpdir))
+    with pytest.raises(ValueError):
+        keystore.controller_signing_key()
+    signing_key = keystore.controller_signing_key(create=True)
+    assert keystore.controller_signing_key() is signing_key
+    assert Keystore(str(tmpdir)).controller_signing_key() == signing_key
+    assert oct(os.stat(keystore.secret_key_path).st_mode & 0o777) == '0o600'
+
+
+def test_legacy_pairing_import(tmpdir):
+    tmpdir.join('accessory_pairing_id').write_binary(b'11:22:33:44:55:66')
+    tmpdir.join('accessory_ltpk').write_binary(bytes(32))
+    keystore = get_keystore(str(tmpdir))
+    assert keystore.accessory_ltpk(b'11:22:33:44:55:66') == bytes(32)
+    assert get_keystore(str(tmpdir)) is keystore
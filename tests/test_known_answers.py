@@ -0,0 +1,92 @@
+"""Known-answer tests of the primitives used by the pairing procedures."""
+
+from cryptography.hazmat.primitives.asymmetric.x25519 import (X25519PrivateKey,
+                                                              X25519PublicKey)
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+
+import pytest
+
+from pyhomekit import crypto, pairing
+from pyhomekit.pairing import compute_srp_proof
+
+from .test_pairing import (a, A, B, S, K, s, test_password, test_username)
+
+# RFC 8032 section 7.1, test 1
+seed = bytes.fromhex(
+    '9d61b19deffd5a60ba844af492ec2cc44449c5697b326919703bac031cae7f60')
+public_key = bytes.fromhex(
+    'd75a980182b10ab7d54bfed3c964073a0ee172f3daa62325af021a68f707511a')
+signature = bytes.fromhex(
+    'e5564300c360ac729086e2cc806e828a84877f1eb8e5d974d873e06522490155'
+    '5fb8821590a33bacc61e39701cf9b46bd25bf5f0595bbe24655141438e7a100b')
+
+
+@pytest.fixture(params=[
+    provider.name for provider in crypto.available_providers()])
+def provider(request):
+    return crypto.providers[request.param]()
+
+
+def test_hkdf_sha512(provider):
+    # RFC 5869 test case 1 inputs, with SHA-512
+    okm = provider.hkdf_sha512(b'\x0b' * 22, bytes(range(13)),
+                               bytes(range(0xf0, 0xfa)), 42)
+    assert okm == bytes.fromhex(
+        '832390086cda71fb47625bb5ceb168e4c8e26a1a16ed34d9fc7fe92c1481579338'
+        'da362cb8d9f925d7cb')
+
+
+def test_chacha20_poly1305(provider):
+    # RFC 8439 section 2.8.2
+    key = bytes(range(0x80, 0xa0))
+    nonce = bytes.fromhex('070000004041424344454647')
+    aad = bytes.fromhex('50515253c0c1c2c3c4c5c6c7')
+    plaintext = (b"Ladies and Gentlemen of the class of '99: If I could offer "
+                 b"you only one tip for the future, sunscreen would be it.")
+    ciphertext = provider.encrypt(key, nonce, plaintext, aad)
+    assert ciphertext[:16] == bytes.fromhex('d31a8d34648e60db7b86afbc53ef7ec2')
+    assert ciphertext[-16:] == bytes.fromhex(
+        '1ae10b594f09e26a7e902ecbd0600691')
+    assert provider.decrypt(key, nonce, ciphertext, aad) == plaintext
+    with pytest.raises(ValueError):
+        provider.decrypt(key, nonce, ciphertext, b'')
+
+
+@pytest.mark.parametrize('secret_key', [seed, seed + public_key])
+def test_ed25519(provider, secret_key):
+    assert provider.public_key(secret_key) == public_key
+    assert provider.sign(secret_key, b'') == signature
+    assert provider.verify(public_key, signature, b'')
+    assert not provider.verify(public_key, signature, b'x')
+
+
+def test_x25519():
+    # RFC 7748 section 6.1
+    alice = X25519PrivateKey.from_private_bytes(
+        bytes.fromhex('77076d0a7318a57d3c16c17251b26645'
+                      'df4c2f87ebc0992ab177fba51db92c2a'))
+    bob_public = bytes.fromhex('de9edb7d7b7dc1b4d35b61c2ece43537'
+                               '3f8343c85b78674dadfc7e146f882b4f')
+    assert alice.public_key().public_bytes(
+        Encoding.Raw, PublicFormat.Raw) == bytes.fromhex(
+            '8520f0098930a754748b7ddcb43ef75a0dbf3a0d26381af4eba4a98eaa9b4e6a')
+    assert alice.exchange(
+        X25519PublicKey.from_public_bytes(bob_public)) == bytes.fromhex(
+            '4a5d9d5ba4ce2de1728e3bf480350f25e07e21c947d19e3376f09b3c1e161742')
+
+
+def test_srp_proof(monkeypatch):
+    # SRP test vectors of the HAP specification, with a fixed private key
+    monkeypatch.setattr(pairing, 'random_int', lambda n_bits: a)
+    monkeypatch.setattr(pairing, 'USERNAME', test_username)
+    salt = s.to_bytes(16, 'big')
+    proof = compute_srp_proof(salt, B, test_password)
+    assert proof.A == A
+    assert proof.S == S
+    assert int.from_bytes(proof.K, 'big') == K
+
+
+def test_srp_proof_with_ephemeral_key(monkeypatch):
+    monkeypatch.setattr(pairing, 'USERNAME', test_username)
+    proof = compute_srp_proof(s.to_bytes(16, 'big'), B, test_password, (a, A))
+    assert proof.S == S
@@ -0,0 +1,248 @@
+import asyncio
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from struct import pack
+
+import pytest
+
+from pyhomekit import constants, registry
+from pyhomekit.ble import HapAccessoryLock, read_all
+from pyhomekit.session import SecureSession
+from pyhomekit.utils import HapBleError, iterate_tvl, prepare_tlv
+
+shared_secret = bytes(range(32))
+current_state = registry.characteristic_uuids['lock-mechanism.current-state']
+target_state = registry.characteristic_uuids['lock-mechanism.target-state']
+
+
+class Descriptor:
+    def __init__(self, handle):
+        self.handle = handle
+
+
+class Characteristic:
+    def __init__(self, handle):
+        self.handle = handle
+
+    def getHandle(self):
+        return self.handle
+
+    def getDescriptors(self, uuid):
+        assert uuid == constants.characteristic_ID_descriptor_UUID
+        return [Descriptor(self.handle + 1)]
+
+
+class Peripheral:
+    """GATT side of a lock, answering HAP reads and writes in memory."""
+
+    def __init__(self, secured=True):
+        self.session = SecureSession.from_shared_secret(
+            shared_secret, accessory=True) if secured else None
+        # Value handle and instance ID of each characteristic
+        self.handles = {current_state: 0x10, target_state: 0x20}
+        self.values = {0x10: b'\x00', 0x20: b'\x00'}
+        # Pending response of each characteristic
+        self.responses = {}
+        self.operations = []
+        self.latency = 0
+
+    def getCharacteristics(self, uuid):
+        return [Characteristic(self.handles[uuid])]
+
+    def writeCharacteristic(self, handle, data, withResponse):
+        self.operations.append('write')
+        self.respond(handle, self.decrypt(data))
+
+    def encrypt(self, pdu):
+        return pdu if self.session is None else self.session.encrypt(pdu)
+
+    def decrypt(self, pdu):
+        return pdu if self.session is None else self.session.decrypt(pdu)
+
+    def respond(self, handle, pdu):
+        op_code, tid = pdu[1], pdu[2]
+        body = {t: v for t, _, v in iterate_tvl(pdu[7:])}
+        response_body = b''
+        if op_code == constants.HapBleOpCodes.Characteristic_Write:
+            self.values[handle] = body[constants.HapParamTypes.Value]
+            if handle == 0x20:  # The mechanism follows the target state
+                self.values[0x10] = self.values[0x20]
+        elif op_code == constants.HapBleOpCodes.Characteristic_Read:
+            response_body = b''.join(
+                prepare_tlv(constants.HapParamTypes.Value,
+                            self.values[handle]))
+        response = pack('<BBB', 0b10, tid, 0)
+        if response_body:
+            response += pack('<H', len(response_body)) + response_body
+        self.responses[handle] = self.encrypt(response)
+
+    def readCharacteristic(self, handle):
+        self.operations.append('read')
+        time.sleep(self.latency)
+        if handle in (0x11, 0x21):  # Characteristic Instance ID
+            return pack('<H', handle)
+        return self.responses.pop(handle)
+
+
+def test_lock():
+    peripheral = Peripheral()
+    lock = HapAccessoryLock('AA:BB:CC:DD:EE:FF', peripheral=peripheral)
+    with pytest.raises(HapBleError):
+        lock.lock()
+
+    lock.secure_session = SecureSession.from_shared_secret(shared_secret)
+    assert len(lock.prepare()) == 2
+    assert peripheral.operations == ['read', 'read']
+
+    peripheral.operations = []
+    result = lock.lock()
+    assert peripheral.operations == ['write', 'read']
+    assert result.target_state == 1 and result.elapsed > 0
+    assert lock.lock_current_state() == 1
+
+    lock.unlock()
+    assert lock.lock_target_state() == 0
+    assert lock.lock_current_state() == 0
+    assert lock.get_characteristic('lock-mechanism.target-state') is (
+        lock.hap_characteristic(target_state))
+
+
+class BusyPeripheral(Peripheral):
+    """Rejects the first request with Max_Procedures."""
+
+    def __init__(self):
+        super().__init__()
+        self.transaction_ids = []
+
+    def respond(self, handle, pdu):
+        tid = pdu[2]
+        self.transaction_ids.append(tid)
+        if len(self.transaction_ids) > 1:
+            return super().respond(handle, pdu)
+        self.responses[handle] = self.encrypt(pack(
+            '<BBB', 0b10, tid, constants.HapBleStatusCodes.Max_Procedures))
+
+
+def test_replay_with_new_transaction_id():
+    peripheral = BusyPeripheral()
+    lock = HapAccessoryLock('AA:BB:CC:DD:EE:FF', peripheral=peripheral)
+    lock.secure_session = SecureSession.from_shared_secret(shared_secret)
+    lock.prepare()
+    lock.hap_characteristic(current_state).backpressure_wait_time = 0
+
+    assert lock.lock_current_state() == 0
+    rejected, replayed = peripheral.transaction_ids
+    assert rejected != replayed
+
+
+def test_secured_procedures_do_not_interleave():
+    peripheral = Peripheral()
+    lock = HapAccessoryLock('AA:BB:CC:DD:EE:FF', max_procedures=4,
+                            peripheral=peripheral)
+    lock.secure_session = SecureSession.from_shared_secret(shared_secret)
+    lock.prepare()
+    for _ in range(10):
+        lock.concurrency.on_success()
+    assert lock.concurrency_limit == 4
+
+    peripheral.latency = 0.001
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        states = list(executor.map(lambda _: lock.lock_current_state(),
+                                   range(32)))
+    assert states == [0] * 32
+
+
+def test_unsecured_procedures_do_not_interleave():
+    peripheral = Peripheral(secured=False)
+    lock = HapAccessoryLock('AA:BB:CC:DD:EE:FF', max_procedures=4,
+                            peripheral=peripheral)
+    lock.prepare()
+    for _ in range(10):
+        lock.concurrency.on_success()
+    assert lock.concurrency_limit == 4
+
+    peripheral.latency = 0.001
+    peripheral.values[0x20] = b'\x01'
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        states = list(executor.map(
+            lambda i: (lock.lock_target_state()
+                       if i % 2 else lock.lock_current_state()), range(40)))
+    assert states == [0, 1] * 20
+
+
+def test_iter_value_releases_procedure_slot():
+    lock = HapAccessoryLock('AA:BB:CC:DD:EE:FF', peripheral=Peripheral())
+    lock.secure_session = SecureSession.from_shared_secret(shared_secret)
+    characteristic = lock.hap_characteristic(current_state)
+    characteristic._cid = b'\x10\x00'
+
+    with characteristic.iter_value() as fragments:
+        assert next(fragments) == b'\x00'
+        assert lock.concurrency.in_flight == 1
+    assert lock.concurrency.in_flight == 0
+
+    async def read_first():
+        async with characteristic.aiter_value() as fragments:
+            async for fragment in fragments:
+                return fragment
+
+    assert asyncio.run(read_first()) == b'\x00'
+    assert lock.concurrency.in_flight == 0
+
+
+def test_read_many():
+    peripheral = Peripheral()
+    lock = HapAccessoryLock('AA:BB:CC:DD:EE:FF', peripheral=peripheral)
+    lock.secure_session = SecureSession.from_shared_secret(shared_secret)
+    lock.lock_target_state()
+    peripheral.values[0x20] = b'\x01'
+    # Not a GATT characteristic of the lock
+    name = registry.characteristic_uuids['name']
+
+    result = lock.read_many([
+        current_state, name,
+        lock.hap_characteristic(target_state), target_state.upper()
+    ])
+    # Cached characteristics first, duplicates read once
+    assert [read.characteristic.uuid for read in result.results] == [
+        target_state, current_state, name]
+    assert [read.value for read in result.succeeded] == [
+        {'value': 1}, {'value': 0}]
+    failed, = result.failed
+    assert failed.characteristic.uuid == name
+    assert isinstance(failed.error, KeyError) and failed.value is None
+    assert str(result).startswith('3 reads, 1 failed')
+
+
+class MeetingPeripheral(Peripheral):
+    """Waits for the other accessories on its first read."""
+
+    def __init__(self, barrier):
+        super().__init__()
+        self.barrier = barrier
+
+    def readCharacteristic(self, handle):
+        if not self.operations.count('read'):
+            self.barrier.wait()
+        return super().readCharacteristic(handle)
+
+
+def test_read_all():
+    # Both accessories must be read at once to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    peripherals = [MeetingPeripheral(barrier), MeetingPeripheral(barrier)]
+    peripherals[1].values[0x10] = b'\x01'
+    locks = []
+    for i, peripheral in enumerate(peripherals):
+        lock = HapAccessoryLock('AA:BB:CC:DD:EE:0{}'.format(i),
+                                peripheral=peripheral)
+        lock.secure_session = SecureSession.from_shared_secret(shared_secret)
+        locks.append(lock)
+
+    result = read_all(locks, [current_state, target_state])
+    assert len(result.results) == 4 and not result.failed
+    by_accessory = result.by_accessory()
+    assert [[read.value['value'] for read in by_accessory[lock.address]]
+            for lock in locks] == [[0, 0], [1, 0]]
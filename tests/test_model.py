@@ -0,0 +1,148 @@
+import sys
+
+from struct import pack
+
+import pytest
+
+from pyhomekit import constants, registry
+from pyhomekit.ble import HapCharacteristic, HapServiceCharacteristic
+from pyhomekit.model import (CharacteristicSignature, ServiceGraph,
+                             ServiceRecord, ValueEncoder)
+
+lock_mechanism = '00000045-0000-1000-8000-0026bb765291'
+lock_current_state = '0000001d-0000-1000-8000-0026bb765291'
+
+
+def tlv(param_type, value):
+    return pack('<BB', param_type, len(value)) + value
+
+
+def uuid_bytes(uuid):
+    return bytes.fromhex(uuid.replace('-', ''))[::-1]
+
+
+signature_body = b''.join([
+    tlv(constants.HapParamTypes.Characteristic_Type,
+        uuid_bytes(lock_current_state)),
+    tlv(constants.HapParamTypes.Service_Instance_ID, pack('<H', 16)),
+    tlv(constants.HapParamTypes.Service_Type, uuid_bytes(lock_mechanism)),
+    tlv(constants.HapParamTypes.HAP_Characteristic_Properties_Descriptor,
+        pack('<H', 0x0013)),
+    tlv(constants.HapParamTypes.GATT_Presentation_Format_Descriptor,
+        pack('<BbHbH', 0x04, 0, 0x2700, 1, 0)),
+    tlv(constants.HapParamTypes.GATT_Valid_Range, pack('<BB', 0, 3)),
+])
+
+
+def test_signature_from_response():
+    characteristic = HapCharacteristic(accessory=None, uuid=lock_current_state)
+    signature = CharacteristicSignature.from_attributes(
+        characteristic._parse_response(signature_body))
+    assert signature == CharacteristicSignature(
+        characteristic_type=lock_current_state,
+        service_type=lock_mechanism,
+        service_instance_id=16,
+        properties=0x0013,
+        format_code=0x04,
+        unit_code=0x2700,
+        min_value=0,
+        max_value=3)
+    assert signature.hap_format == 'uint8'
+    assert signature.hap_unit == 'unitless'
+
+    characteristic._signature = signature
+    value = characteristic._parse_response(
+        tlv(constants.HapParamTypes.Value, b'\x01'))
+    assert value == {'value': 1}
+
+
+def test_compact_records():
+    characteristic = HapCharacteristic(accessory=None, uuid=lock_current_state)
+    characteristic._signature = CharacteristicSignature.from_attributes(
+        characteristic._parse_response(signature_body))
+    service = ServiceRecord(lock_mechanism, 16, (lock_current_state, ))
+
+    for record in (characteristic, characteristic._signature, service):
+        assert not hasattr(record, '__dict__')
+    # UUIDs are shared, whichever response they come from
+    uuid = sys.intern(lock_current_state)
+    assert characteristic.uuid is uuid
+    assert characteristic._signature.characteristic_type is uuid
+    assert service.characteristics[0] is uuid
+
+
+def test_uuid_cache():
+    raw = uuid_bytes(lock_current_state)
+    uuid = constants.to_uuid(raw)
+    assert uuid == lock_current_state
+    assert constants.to_uuid(bytearray(raw)) is uuid
+    assert uuid is sys.intern(lock_current_state)
+    assert str(constants.to_uuid_object(raw)) == lock_current_state
+    assert constants.to_uuid_object(bytes(raw)) is constants.to_uuid_object(raw)
+    assert constants.uuid_bytes(lock_current_state.upper()) == raw
+
+
+def test_value_encoder():
+    characteristic = HapCharacteristic(accessory=None, uuid=lock_current_state)
+    encoder = characteristic.value_encoder
+    assert encoder(3) == b'\x03'
+    for value in (4, -1, 1.5, '1'):
+        with pytest.raises(ValueError):
+            encoder(value)
+    assert encoder.encode_many([0, 1, 2]) == [b'\x00', b'\x01', b'\x02']
+    assert encoder is characteristic.type_signature.value_encoder
+
+    temperature = ValueEncoder('float', 10, 38, 0.1)
+    assert temperature(21.5) == pack('<f', 21.5)
+    with pytest.raises(ValueError):
+        temperature(21.55)
+    brightness = ValueEncoder('int', 0, 100, 5)
+    assert brightness.encode_many([0, 5, 100]) == [
+        pack('<i', value) for value in (0, 5, 100)
+    ]
+    with pytest.raises(ValueError):
+        brightness.encode_many([0, 7])
+    assert ValueEncoder('uint16')(0xFFFF) == b'\xff\xff'
+    with pytest.raises(ValueError):
+        ValueEncoder('uint16')(0x10000)
+    with pytest.raises(ValueError):
+        ValueEncoder('uint16', 0, 1000).encode_many([1, 1001])
+    for value in (1e40, -1e40, float('nan'), float('inf')):
+        with pytest.raises(ValueError):
+            ValueEncoder('float')(value)
+        with pytest.raises(ValueError):
+            ValueEncoder('float').encode_many([0.5, value])
+    assert ValueEncoder('string')('Lock') == b'Lock'
+    assert ValueEncoder('data')(b'\x01\x02') == b'\x01\x02'
+
+
+def test_service_graph():
+    # Service signature read response body: properties and linked services
+    characteristic = HapServiceCharacteristic(
+        accessory=None,
+        uuid=constants.service_signature_characteristic_UUID,
+        value_handle=0x20)
+    attributes = characteristic._parse_response(
+        tlv(constants.HapParamTypes.HAP_Service_Properties, pack('<H', 1)) +
+        tlv(constants.HapParamTypes.HAP_Linked_Services, pack('<HH', 32, 48)))
+    assert attributes == {
+        'hap_service_properties': 1,
+        'hap_linked_services': (32, 48)
+    }
+
+    lock = ServiceRecord(
+        lock_mechanism,
+        16, (lock_current_state, ),
+        properties=attributes['hap_service_properties'],
+        linked_services=attributes['hap_linked_services'])
+    management = ServiceRecord(registry.service_uuids['lock-management'], 32)
+    secondary_lock = ServiceRecord(lock_mechanism, 64)
+    graph = ServiceGraph([secondary_lock, management, lock])
+
+    assert len(graph) == 3
+    assert graph.service(16) is lock
+    assert graph.service(17) is None
+    assert graph.service_of_type(lock_mechanism.upper()) is lock
+    assert graph.services_of_type(lock_mechanism) == [lock, secondary_lock]
+    assert graph.characteristic_service(lock_current_state) is lock
+    assert graph.linked_services(lock) == [management]
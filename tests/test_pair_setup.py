@@ -0,0 +1,150 @@
+from struct import pack
+
+import pytest
+
+from pyhomekit import pair_setup
+from pyhomekit.keystore import Keystore
+from pyhomekit.pair_setup import ResumablePairSetup
+from pyhomekit.pairing import PairSetupError, SRPPairSetup
+
+from .accessory import Accessory, exchange, ktlv
+from .test_pair_verify import controller_id
+
+
+class FlakyLink:
+    """Link to an in-memory accessory, which drops on the planned states.
+
+    Each planned drop is a (state, delivered) pair: the request of that
+    state is lost, or delivered with its response lost."""
+
+    def __init__(self, accessory, drops=(), lose_state=False):
+        self.accessory = accessory
+        self.drops = list(drops)
+        self.lose_state = lose_state
+        self.requests = []
+
+    def send(self, ktlvs):
+        request = exchange(ktlvs)
+        state = request['kTLVType_State'][0]
+        self.requests.append(state)
+        drop = next((d for d in self.drops if d[0] == state), None)
+        if drop is not None:
+            self.drops.remove(drop)
+            if drop[1]:
+                self.accessory.pair_setup(request)
+            raise OSError("Link lost")
+        if state in (3, 5) and not self.accessory._setup:
+            return exchange([(ktlv.kTLVType_State, pack('<B', state + 1)),
+                             (ktlv.kTLVType_Error, pack('<B', 1))])
+        return exchange(self.accessory.pair_setup(request))
+
+    def reconnect(self):
+        if self.lose_state:
+            self.accessory._setup = {}
+
+
+@pytest.fixture
+def keystore(tmpdir):
+    return Keystore(str(tmpdir))
+
+
+@pytest.fixture
+def proofs(monkeypatch):
+    """Count the SRP proof computations."""
+    calls = []
+    compute_srp_proof = pair_setup.compute_srp_proof
+
+    def counted(*args):
+        calls.append(args)
+        return compute_srp_proof(*args)
+
+    monkeypatch.setattr(pair_setup, 'compute_srp_proof', counted)
+    return calls
+
+
+def resumable(link, keystore, **kwargs):
+    session = SRPPairSetup(
+        controller_id, keystore.storage_folder, '111-22-333',
+        keystore=keystore)
+    kwargs.setdefault('sleep', lambda delay: None)
+    return ResumablePairSetup(
+        session, link.send, reconnect=link.reconnect, **kwargs)
+
+
+@pytest.mark.parametrize('state', [3, 5])
+@pytest.mark.parametrize('delivered', [False, True])
+def test_resume_failed_step(keystore, proofs, state, delivered):
+    accessory = Accessory()
+    link = FlakyLink(accessory, drops=[(state, delivered)])
+    stages = []
+    session = resumable(link, keystore, on_stage=stages.append).run()
+
+    assert session.accessory_pairing_id == accessory.pairing_id
+    assert link.requests == {3: [1, 3, 3, 5], 5: [1, 3, 5, 5]}[state]
+    assert len(proofs) == 1
+    assert stages[-1] == 'paired'
+
+
+def test_restart_when_accessory_lost_state(keystore, proofs):
+    link = FlakyLink(Accessory(), drops=[(5, False)], lose_state=True)
+    setup = resumable(link, keystore)
+    setup.run()
+    assert link.requests == [1, 3, 5, 5, 1, 3, 5]
+    assert setup.restarts == 1
+    assert len(proofs) == 2
+
+
+def test_backoff(keystore):
+    accessory = Accessory()
+    link = FlakyLink(accessory)
+    responses = [[(ktlv.kTLVType_State, pack('<B', 2)),
+                  (ktlv.kTLVType_Error, pack('<B', 3)),
+                  (ktlv.kTLVType_RetryDelay, pack('<H', 300))]]
+
+    def send(ktlvs):
+        if responses:
+            return exchange(responses.pop())
+        return link.send(ktlvs)
+
+    delays = []
+    session = SRPPairSetup(controller_id, keystore.storage_folder,
+                           '111-22-333', keystore=keystore)
+    ResumablePairSetup(session, send, sleep=delays.append).run()
+    assert delays == [300]
+    assert accessory.pairing_id in keystore
+
+
+def test_fatal_errors_are_not_retried(keystore):
+    link = FlakyLink(Accessory(setup_code='999-99-999'))
+    with pytest.raises(PairSetupError) as error:
+        resumable(link, keystore).run()
+    assert error.value.name == 'kTLVError_Authentication'
+    assert link.requests == [1, 3]
+
+
+def test_resume_from_checkpoint(keystore, proofs):
+    accessory = Accessory()
+    link = FlakyLink(accessory, drops=[(5, False)] * 2)
+    with pytest.raises(OSError):
+        resumable(link, keystore, checkpoint='accessory',
+                  max_retries=1).run()
+    assert keystore.load_checkpoint('accessory') is not None
+
+    # Another process resumes the pair setup at M5
+    setup = resumable(link, Keystore(keystore.storage_folder),
+                      checkpoint='accessory')
+    assert setup.stage == 'exchange'
+    setup.run()
+    assert link.requests == [1, 3, 5, 5, 5]
+    assert len(proofs) == 1
+    assert keystore.load_checkpoint('accessory') is None
+
+
+def test_checkpoint_is_encrypted(keystore):
+    keystore.save_checkpoint('11:22:33:44:55:66', b'secret state')
+    assert keystore.load_checkpoint('11:22:33:44:55:66') == b'secret state'
+    path = keystore._checkpoint_path('11:22:33:44:55:66')
+    with open(path, 'rb') as checkpoint_file:
+        assert b'secret' not in checkpoint_file.read()
+    with pytest.raises(ValueError):
+        keystore.load_checkpoint('11_22_33_44_55_66')
@@ -0,0 +1,94 @@
+import ed25519
+import pytest
+
+from pyhomekit.advertising import HapAdvertisement
+from pyhomekit.ble import HapAccessory
+from pyhomekit.pairing import (BroadcastKeyManager, PairVerifyError,
+                               SessionCache, SRPPairVerify,
+                               derive_broadcast_key)
+
+from .accessory import Accessory, exchange
+
+controller_id = b'AA:BB:CC:DD:EE:FF'
+
+
+@pytest.fixture
+def paired(tmpdir):
+    accessory = Accessory()
+    signing_key, verifying_key = ed25519.create_keypair()
+    accessory.controllers[controller_id] = verifying_key.to_bytes()
+    tmpdir.join('secret-key').write_binary(signing_key.to_bytes())
+    tmpdir.join('accessory_pairing_id').write_binary(accessory.pairing_id)
+    tmpdir.join('accessory_ltpk').write_binary(accessory.ltpk.to_bytes())
+    return accessory, str(tmpdir)
+
+
+def verify(accessory, storage_folder, ticket=None):
+    session = SRPPairVerify(controller_id, storage_folder, resume_ticket=ticket)
+    response = accessory.pair_verify(
+        exchange(session.m1_generate_verify_start_request()))
+    if not session.m2_receive_start_response(exchange(response)):
+        response = accessory.pair_verify(
+            exchange(session.m3_generate_verify_finish_request()))
+        session.m4_receive_verify_finish_response(exchange(response))
+    return session
+
+
+def test_pair_verify_and_resume(paired):
+    accessory, storage_folder = paired
+    cache = SessionCache()
+
+    session = verify(accessory, storage_folder)
+    assert not session.resumed
+    assert session.shared_secret == accessory.shared_secret
+    cache.put('accessory', session.session_ticket())
+
+    resumed = verify(accessory, storage_folder, cache.pop('accessory'))
+    assert resumed.resumed
+    assert resumed.shared_secret == accessory.shared_secret
+    assert resumed.shared_secret != session.shared_secret
+
+    # A session ID can only be resumed once: falls back to pair verify
+    fallback = verify(accessory, storage_folder, session.session_ticket())
+    assert not fallback.resumed
+    assert fallback.shared_secret == accessory.shared_secret
+
+
+def test_unknown_controller(paired):
+    accessory, storage_folder = paired
+    del accessory.controllers[controller_id]
+    with pytest.raises(PairVerifyError) as error:
+        verify(accessory, storage_folder)
+    assert error.value.name == 'kTLVError_Authentication'
+
+
+def test_session_cache_expiry(paired):
+    accessory, storage_folder = paired
+    cache = SessionCache(max_age=-1)
+    cache.put('accessory', verify(accessory, storage_folder).session_ticket())
+    assert cache.pop('accessory') is None
+
+
+def test_pair_verify_adds_broadcast_key(paired, monkeypatch):
+    accessory, storage_folder = paired
+    hap_accessory = HapAccessory('11:22:33:44:55:66', peripheral=object())
+    monkeypatch.setattr(
+        hap_accessory, '_pair_verify',
+        lambda pairing_id, folder, ticket: verify(accessory, folder, ticket))
+    key_manager = BroadcastKeyManager()
+    advertisement = HapAdvertisement(
+        device_id='11:22:33:44:55:66', status_flags=0, category=6, gsn=7,
+        config_number=1, compatible_version=2, advertising_interval=3)
+
+    with pytest.raises(ValueError):
+        hap_accessory.pair_verify(controller_id, storage_folder,
+                                  key_manager=key_manager)
+    session = hap_accessory.pair_verify(
+        controller_id, storage_folder, key_manager=key_manager,
+        advertisement=advertisement)
+
+    advertising_id = bytes.fromhex('112233445566')
+    controller_ltpk = session.keystore.controller_signing_key(
+    ).get_verifying_key().to_bytes()
+    assert key_manager._keys[advertising_id] == (derive_broadcast_key(
+        accessory.shared_secret, controller_ltpk), 7)
@@ -1,4 +1,14 @@
-from pyhomekit.pairing import H, N, g
+import time
+
+from struct import pack
+
+from libnacl import crypto_aead_chacha20poly1305_ietf_encrypt
+
+from pyhomekit.bigint import FixedBasePow, powmod
+from pyhomekit.pairing import (H, H_bytes, N, g, BroadcastKeyManager,
+                               EphemeralKeyPool, SrpConstants,
+                               broadcast_nonce, compute_srp_proof,
+                               derive_broadcast_key, set_ephemeral_pool)
 
 # N_HEX = """FFFFFFFF FFFFFFFF C90FDAA2 2168C234 C4C6628B 80DC1CD1 29024E08
 #            8A67CC74 020BBEA6 3B139B22 514A0879 8E3404DD EF9519B3 CD3A431B
@@ -109,3 +119,80 @@ def test_SRP_test_vectors():
     K_calc = H(S)
     assert K_calc == K
     M1 = H(H(N) ^ H(g), H(test_username), s, A, B, K)
+
+
+def test_H_bytes():
+    assert H_bytes(s, A, pad=True) == H(s, A, pad=True).to_bytes(64, 'big')
+    assert H_bytes('alice', 'password123', sep=b':') == H_bytes(
+        b'alice:password123')
+    srp = SrpConstants()
+    assert srp._values is None
+    assert int.from_bytes(srp.H_N_xor_H_g, 'big') == H(N) ^ H(g)
+    assert srp.H_USERNAME == H_bytes('Pair-Setup')
+    assert srp.k == H(N, g, pad=True)
+    K_bytes = H_bytes(S)
+    assert int.from_bytes(K_bytes, 'big') == K
+    assert len(H_bytes(H(N) ^ H(g), H(test_username), s, A, B, K_bytes)) == 64
+
+
+def test_SRP_fixed_base_test_vectors():
+    g_pow = FixedBasePow(g, N, exponent_bits=512)
+    assert g_pow(a) == A
+    assert g_pow(0) == 1
+    k = H(N, g, pad=True)
+    assert (k * v + g_pow(b)) % N == B
+    x = H(s, H(test_username, test_password, sep=b":"))
+    assert g_pow(x) == pow(g, x, N)
+    assert powmod((B - k * g_pow(x)) % N, a + u * x, N) == S
+    # Larger exponents fall back to powmod
+    assert g_pow(u * x) == pow(g, u * x, N)
+
+
+def test_broadcast_notification_decrypt():
+    advertising_id = bytes.fromhex('112233445566')
+    shared_secret = bytes(range(32))
+    controller_ltpk = bytes(range(32, 64))
+    key = derive_broadcast_key(shared_secret, controller_ltpk)
+
+    gsn = 12
+    plaintext = pack('<H', gsn) + b'\x2a\x00' + pack('<Q', 21)
+    encrypted = crypto_aead_chacha20poly1305_ietf_encrypt(
+        plaintext, advertising_id, broadcast_nonce(gsn), key)
+    payload = encrypted[:12] + encrypted[12:16]
+
+    key_manager = BroadcastKeyManager()
+    assert key_manager.decrypt(advertising_id, payload, last_gsn=10) is None
+    key_manager.add_key(advertising_id, shared_secret, controller_ltpk, gsn=10)
+    assert key_manager.decrypt(advertising_id, payload, last_gsn=10) == (
+        gsn, b'\x2a\x00', pack('<Q', 21))
+    tampered = payload[:15] + bytes([payload[15] ^ 1])
+    assert key_manager.decrypt(advertising_id, tampered, last_gsn=10) is None
+
+
+def test_ephemeral_key_pool():
+    pool = EphemeralKeyPool(size=2)
+    try:
+        pool.start()
+        keys = [pool.take() for _ in range(5)]
+        assert len({a for a, _ in keys}) == 5
+        assert all(pow(g, a, N) == A for a, A in keys)
+        assert len(pool) <= 2
+    finally:
+        pool.close()
+    assert len(pool) == 0
+
+
+def test_process_ephemeral_pool():
+    pool = EphemeralKeyPool(size=1)
+    try:
+        set_ephemeral_pool(pool)
+        while not len(pool):
+            time.sleep(0.01)
+        a, A = pool._keys[0]
+        proof = compute_srp_proof(b'\x01' * 16, 5, '111-22-333')
+        assert (proof.a, proof.A) == (a, A)
+    finally:
+        set_ephemeral_pool(None)
+    assert len(pool) == 0
+    proof = compute_srp_proof(b'\x01' * 16, 5, '111-22-333')
+    assert pow(g, proof.a, N) == proof.A
@@ -0,0 +1,108 @@
+import pytest
+
+from pyhomekit import constants, registry
+from pyhomekit.ble import HapCharacteristic
+from tools import gen_hap_types
+
+lock_current_state = '0000001d-0000-1000-8000-0026bb765291'
+
+
+def test_generated_registry_is_up_to_date():
+    with open(gen_hap_types.output_path, encoding='utf-8') as registry_file:
+        assert gen_hap_types.generate() == registry_file.read()
+
+
+def test_characteristic_types():
+    characteristic = registry.characteristic_type(lock_current_state)
+    assert characteristic.name == 'Lock Current State'
+    assert characteristic.format_code == constants.format_name_to_code['uint8']
+    assert (characteristic.min_value, characteristic.max_value,
+            characteristic.step_value) == (0, 3, 1)
+    assert characteristic.valid_values == (0, 1, 2, 3)
+    assert characteristic.properties == (
+        constants.HapCharacteristicProperties.Secure_Read |
+        constants.HapCharacteristicProperties.Notify_Connected)
+
+    temperature = registry.characteristic_type(
+        registry.characteristic_uuids['temperature.current'])
+    assert temperature.unit_code == constants.unit_name_to_code['celsius']
+    assert temperature.step_value == 0.1
+
+    lock_mechanism = registry.service_type(
+        registry.service_uuids['lock-mechanism'])
+    assert lock_mechanism.required_characteristics == (
+        lock_current_state.upper(),
+        registry.characteristic_uuids['lock-mechanism.target-state'])
+
+
+def test_known_types_are_decoded_without_signature_read():
+    characteristic = HapCharacteristic(accessory=None, uuid=lock_current_state)
+    assert characteristic.type_signature.hap_format == 'uint8'
+    assert characteristic._signature is None
+    assert characteristic._parse_response(b'\x01\x01\x03') == {'value': 3}
+
+
+def test_uint16_format():
+    assert constants.format_code_to_name[0x06] == 'uint16'
+    assert constants.format_name_to_converter['uint16'](b'\x01\x02') == 0x0201
+
+
+def names(uuids):
+    return [registry.characteristic_type(uuid).name for uuid in uuids]
+
+
+def test_service_characteristics_split_around_labels():
+    garage = registry.service_type(
+        registry.service_uuids['garage-door-opener'])
+    assert names(garage.required_characteristics) == [
+        'Current Door State', 'Target Door State', 'Obstruction Detected']
+    assert names(garage.optional_characteristics) == [
+        'Lock Current State', 'Lock Target State', 'Name']
+
+    thermostat = registry.service_type(registry.service_uuids['thermostat'])
+    assert names(thermostat.required_characteristics) == [
+        'Current Heating Cooling State', 'Target Heating Cooling State',
+        'Current Temperature', 'Target Temperature',
+        'Temperature Display Units']
+    assert names(thermostat.optional_characteristics) == [
+        'Cooling Threshold Temperature', 'Current Relative Humidity',
+        'Heating Threshold Temperature', 'Name', 'Target Relative Humidity']
+
+    temperature = registry.service_type(
+        registry.service_uuids['sensor.temperature'])
+    assert names(temperature.required_characteristics) == [
+        'Current Temperature']
+    assert names(temperature.optional_characteristics) == [
+        'Name', 'Status Active', 'Status Fault', 'Status Low Battery',
+        'Status Tampered']
+
+
+def test_service_characteristics_over_page_breaks():
+    characteristics = {
+        'switch': (['On'], ['Name']),
+        'speaker': (['Mute'], ['Name', 'Volume']),
+        'vertical-slat': (['Current Slat State', 'Slat Type'], [
+            'Name', 'Swing Mode', 'Current Tilt Angle', 'Target Tilt Angle'
+        ]),
+        'air-purifier': ([
+            'Active', 'Current Air Purifier State', 'Target Air Purifier State'
+        ], ['Name', 'Rotation Speed', 'Swing Mode', 'Lock Physical Controls']),
+        'protocol.information.service': (['Version'], []),
+    }
+    for service_name, (required, optional) in characteristics.items():
+        service = registry.service_type(registry.service_uuids[service_name])
+        assert names(service.required_characteristics) == required
+        assert names(service.optional_characteristics) == optional
+
+
+def test_unsplittable_characteristics():
+    record = {
+        'Name': 'Fan',
+        'references': ['On', 'Rotation Direction', 'Rotation Speed'],
+        'reference_labels': {
+            'Required Characteristics': 0,
+            'Optional Characteristics': 0,
+        },
+    }
+    with pytest.raises(ValueError):
+        gen_hap_types.split_references(record)
@@ -0,0 +1,63 @@
+from struct import pack
+
+import pytest
+from libnacl import crypto_aead_chacha20poly1305_ietf_encrypt
+
+from pyhomekit.pairing import derive_control_keys
+from pyhomekit.session import SecureSession, tag_size
+
+shared_secret = bytes(range(32))
+
+
+@pytest.fixture
+def sessions():
+    return (SecureSession.from_shared_secret(shared_secret),
+            SecureSession.from_shared_secret(shared_secret, accessory=True))
+
+
+def test_counter_nonce(sessions):
+    controller, _ = sessions
+    write_key, _ = derive_control_keys(shared_secret)
+    for counter, size in enumerate((0, 7, 496, 1000)):
+        message = bytes(range(256)) * 4
+        message = message[:size]
+        expected = crypto_aead_chacha20poly1305_ietf_encrypt(
+            message, b'', b'\x00' * 4 + pack('<Q', counter), write_key)
+        assert controller.encrypt(message) == expected
+    assert controller.write_counter == 4
+    assert controller.read_counter == 0
+
+
+def test_round_trip(sessions):
+    controller, accessory = sessions
+    for size in (0, 20, 496):
+        message = bytes(size)
+        assert accessory.decrypt(controller.encrypt(message)) == message
+        assert controller.decrypt(accessory.encrypt(message)) == message
+
+
+def test_in_place(sessions):
+    controller, accessory = sessions
+    message = b'\x00\x01\x42\x02\x00'
+    buffer = bytearray(message) + bytearray(tag_size)
+    length = controller.encrypt_in_place(buffer, len(message))
+    assert length == len(message) + tag_size
+    assert buffer[:len(message)] != message
+    assert accessory.decrypt_in_place(buffer, length) == len(message)
+    assert buffer[:len(message)] == message
+
+    with pytest.raises(ValueError):
+        controller.encrypt_in_place(bytearray(message), len(message))
+
+
+def test_authentication(sessions):
+    controller, accessory = sessions
+    ciphertext = bytearray(controller.encrypt(b'PDU'))
+    ciphertext[0] ^= 1
+    with pytest.raises(ValueError):
+        accessory.decrypt(bytes(ciphertext))
+
+    # Out of order messages do not decrypt
+    controller.encrypt(b'skipped')
+    with pytest.raises(ValueError):
+        accessory.decrypt(controller.encrypt(b'PDU'))
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from pyhomekit import registry
+from pyhomekit.advertising import AccessoryRegistry, HapAdvertisement
+from pyhomekit.ble import HapAccessory
+from pyhomekit.keystore import Keystore
+from pyhomekit.model import (CharacteristicSignature, GattHandles,
+                             ServiceGraph, ServiceRecord)
+from pyhomekit.pairing import SessionCache, SessionTicket
+from pyhomekit.snapshot import Snapshot, save_snapshot
+
+address = 'aa:bb:cc:dd:ee:ff'
+lock_mechanism = registry.service_uuids['lock-mechanism']
+current_state = registry.characteristic_uuids['lock-mechanism.current-state']
+name = registry.characteristic_uuids['name']
+
+
+def advertised(config_number):
+    accessories = AccessoryRegistry()
+    accessories.update(address,
+                       HapAdvertisement('AA:BB:CC:DD:EE:FF', 0, 6, 1,
+                                        config_number, 2, 1))
+    return accessories
+
+
+def accessory_model():
+    accessory = HapAccessory(address, peripheral=object())
+    accessory._characteristics[current_state] = GattHandles(0x10, 0x11)
+    accessory._characteristics[name] = GattHandles(0x20)
+    characteristic = accessory.hap_characteristic(current_state)
+    characteristic._cid = b'\x10\x00'
+    characteristic._signature = CharacteristicSignature(
+        characteristic_type=current_state.lower(),
+        service_type=lock_mechanism.lower(),
+        service_instance_id=16,
+        properties=0x0013,
+        format_code=0x04,
+        unit_code=0x2700,
+        min_value=0,
+        max_value=3,
+        valid_values=b'\x00\x01\x02\x03')
+    accessory.publish_value(b'\x10\x00', 1)
+    accessory.publish_value(b'\x20\x00', 'Front door')
+    accessory.service_graph = ServiceGraph([
+        ServiceRecord(lock_mechanism, 16, (current_state, ), 1, (32, ))
+    ])
+    return accessory
+
+
+def test_snapshot_round_trip(tmpdir):
+    keystore = Keystore(str(tmpdir))
+    session_cache = SessionCache()
+    ticket = SessionTicket(bytes(8), bytes(range(32)), 1e9)
+    session_cache.put(address, ticket)
+    path = os.path.join(str(tmpdir), 'controller.snapshot')
+    accessory = accessory_model()
+    save_snapshot(path, [accessory], keystore, session_cache, advertised(3))
+
+    restored_cache = SessionCache(max_age=float('inf'))
+    restored = HapAccessory(address.upper(), peripheral=object())
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 1 and address.upper() in snapshot
+        assert snapshot.restore(restored, 3, keystore, restored_cache)
+
+    assert restored_cache.pop(address.upper()) == ticket
+    characteristic = restored.hap_characteristic(current_state)
+    assert characteristic._cid == b'\x10\x00'
+    assert characteristic._signature == accessory.hap_characteristic(
+        current_state)._signature
+    assert characteristic.uuid is accessory.hap_characteristic(
+        current_state).uuid
+    assert restored.gatt_handles(name).cid_handle is None
+    assert restored.values == accessory.values
+    assert list(restored.service_graph) == list(accessory.service_graph)
+
+
+def test_snapshot_config_number_changed(tmpdir):
+    keystore = Keystore(str(tmpdir))
+    session_cache = SessionCache()
+    ticket = SessionTicket(bytes(8), bytes(range(32)), 1e12)
+    session_cache.put(address, ticket)
+    path = os.path.join(str(tmpdir), 'controller.snapshot')
+    save_snapshot(path, [accessory_model()], keystore, session_cache,
+                  advertised(3))
+
+    restored_cache = SessionCache()
+    restored = HapAccessory(address, peripheral=object())
+    with Snapshot(path) as snapshot:
+        assert not snapshot.restore(restored, 4, keystore, restored_cache)
+    # The session does not depend on the configuration
+    assert restored_cache.pop(address) == ticket
+    assert not restored._characteristics and restored.service_graph is None
+
+    with open(path, 'r+b') as snapshot_file:
+        snapshot_file.write(b'XXXX')
+    with pytest.raises(ValueError):
+        Snapshot(path)
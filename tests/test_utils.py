@@ -0,0 +1,100 @@
+import asyncio
+import threading
+
+import pytest
+
+from pyhomekit import constants
+from pyhomekit.utils import (AdaptiveConcurrencyLimit, AsyncIteratorInExecutor,
+                             HapBleError, TlvStreamParser, parse_ktlvs,
+                             parse_tlvs, prepare_tlv)
+
+
+def test_concurrency_limit_aimd():
+    limit = AdaptiveConcurrencyLimit(max_limit=8, initial_limit=4)
+    limit.on_backpressure()
+    assert limit.limit == 2
+    limit.on_backpressure()
+    limit.on_backpressure()
+    assert limit.limit == 1
+    limit.on_success()
+    assert limit.limit == 2
+    for _ in range(3):
+        limit.on_success()
+    assert limit.limit == 3
+    for _ in range(100):
+        limit.on_success()
+    assert limit.limit == 8
+
+
+def test_concurrency_limit_slots():
+    limit = AdaptiveConcurrencyLimit(max_limit=1)
+    assert limit.acquire(timeout=0)
+    assert not limit.acquire(timeout=0)
+    released = threading.Timer(0.01, limit.release)
+    released.start()
+    assert limit.acquire(timeout=1)
+    assert limit.in_flight == 1
+    limit.release()
+    with limit.slot():
+        assert limit.in_flight == 1
+    assert limit.in_flight == 0
+
+
+def test_tlv_stream_parser():
+    value = bytes(range(256)) * 3
+    data = b''.join(prepare_tlv(1, value)) + b''.join(prepare_tlv(9, b'\x01'))
+    parser = TlvStreamParser()
+    tlvs = []
+    for start in range(0, len(data), 100):
+        tlvs.extend(parser.feed(data[start:start + 100]))
+    parser.close()
+    assert b''.join(v for t, v in tlvs if t == 1) == value
+    assert tlvs[-1] == (9, b'\x01')
+
+    parser.feed(b'\x01\x05abc')
+    with pytest.raises(HapBleError):
+        parser.close()
+
+
+def test_parse_tlvs():
+    public_key = bytes(range(256)) + b'\x00'
+    data = b''.join(
+        prepare_tlv(constants.PairingKTlvValues.kTLVType_State, b'\x02'))
+    data += b''.join(
+        prepare_tlv(constants.PairingKTlvValues.kTLVType_PublicKey,
+                    public_key))
+    tlvs = parse_tlvs(data)
+    assert tlvs[constants.PairingKTlvValues.kTLVType_State] == b'\x02'
+    assert tlvs[constants.PairingKTlvValues.kTLVType_PublicKey] == public_key
+    assert parse_ktlvs(data) == {
+        'kTLVType_State': b'\x02',
+        'kTLVType_PublicKey': public_key
+    }
+    with pytest.raises(HapBleError):
+        parse_ktlvs(b'\x20\x00')
+
+
+def test_code_tables():
+    assert constants.op_code_names[
+        constants.HapBleOpCodes.Characteristic_Read] == 'Characteristic_Read'
+    assert constants.HapBleStatusCodes(2).name == 'Max_Procedures'
+    assert constants.HAP_param_converters[
+        constants.HapParamTypes.Service_Instance_ID](b'\x10\x00') == 16
+    assert constants.pairing_tlv_names[0xFF] == 'kTLVType_Separator'
+    assert constants.pairing_tlv_names[0x20] is None
+
+
+def test_deprecated_code_lookups():
+    with pytest.deprecated_call():
+        assert constants.HapBleOpCodes()(3) == 'Characteristic_Read'
+    with pytest.deprecated_call():
+        assert constants.PairingKTlvValues()(0xFF) == 'kTLVType_Separator'
+    assert constants.HapBleOpCodes(3) is (
+        constants.HapBleOpCodes.Characteristic_Read)
+
+
+def test_async_iterator_in_executor():
+    async def collect():
+        return [item async for item in AsyncIteratorInExecutor(iter(range(3)))]
+
+    assert asyncio.run(collect()) == [0, 1, 2]
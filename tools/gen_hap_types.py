@@ -0,0 +1,336 @@
+"""Generate pyhomekit/hap_types.py from the text of the HAP specification.
+
+The properties tables of the Apple-defined services and characteristics are
+parsed from data/hap_spec.txt. The text is extracted from the PDF, so the
+tables are broken over pages, with their labels and values in varying order:
+each value is assigned to the pending label it can be a value of, and the
+characteristics of a service to the group of its label, see
+split_references. Run from the repository root after updating the
+specification:
+
+    python -m tools.gen_hap_types
+"""
+
+import itertools
+import logging
+import os
+import re
+import sys
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple  # NOQA pylint: disable=W0611
+
+from pyhomekit import constants
+
+logger = logging.getLogger(__name__)
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+spec_path = os.path.join(root, 'data', 'hap_spec.txt')
+output_path = os.path.join(root, 'pyhomekit', 'hap_types.py')
+
+heading_re = re.compile(r'^\d+(\.\d+)+ (\S.*)$')
+uuid_re = re.compile(r'^[0-9A-F]{8}-0000-1000-8000-0026BB765291$')
+type_re = re.compile(r'^public\.hap\.(characteristic|service)\.(\S+)$')
+page_ref_re = re.compile(r'^(.+) \(page \d+\)$')
+number_re = re.compile(r'^-?\d+(\.\d+)?$')
+valid_value_re = re.compile(r'^\d+(-\d+)?$')
+
+labels = ('UUID', 'Type', 'Permissions', 'Format', 'Unit', 'Minimum Value',
+          'Maximum Value', 'Step Value', 'Maximum Length', 'Valid Values',
+          'Required Characteristics', 'Optional Characteristics')
+numeric_labels = ('Minimum Value', 'Maximum Value', 'Step Value',
+                  'Maximum Length', 'Valid Values')
+
+# Number of required characteristics of the services whose table layout
+# does not tell it, e.g. the labels listed before all the characteristics
+split_overrides = {
+    'Accessory Information': 6,
+    'Air Purifier': 3,
+    'Microphone': 1,
+    'Slat': 2,
+    'Speaker': 1,
+}
+
+# Characteristics referred to by another name in the service tables
+characteristic_aliases = {
+    'Protocol Version Characteristic': 'Version',
+}
+
+# HAP characteristic properties of the permissions of the specification
+permission_to_properties = {
+    'Read': constants.HapCharacteristicProperties.Read,
+    'Write': constants.HapCharacteristicProperties.Write,
+    'Paired Read': constants.HapCharacteristicProperties.Secure_Read,
+    'Paired Write': constants.HapCharacteristicProperties.Secure_Write,
+    'Notify': constants.HapCharacteristicProperties.Notify_Connected,
+}
+
+
+def spec_lines(text: str) -> Iterator[str]:
+    """Yield the stripped non empty lines, without the page breaks.
+
+    A page ends with a copyright line and the page number, and the next page
+    starts with the chapter as running header, followed by the current
+    section unless the chapter starts on that page."""
+    lines = (line.strip() for line in text.splitlines() if line.strip())
+    chapter = None
+    for line in lines:
+        if not line.startswith('2017-06-07') or 'Copyright' not in line:
+            yield line
+            continue
+        next(lines, None)  # Page number
+        previous_chapter, chapter = chapter, next(lines, '')
+        line = next(lines, '')
+        if chapter != previous_chapter or not heading_re.match(line):
+            yield line
+
+
+def to_number(value: str) -> Any:
+    return float(value) if '.' in value else int(value)
+
+
+def increasing(values: List[Any]) -> bool:
+    return all(a < b for a, b in zip(values, values[1:]))
+
+
+def consistent(record: Dict[str, Any]) -> bool:
+    """Whether the values of a table can be right."""
+    valid_values = record['Valid Values']
+    low = record.get('Minimum Value')
+    high = record.get('Maximum Value')
+    if not valid_values or not increasing(valid_values):
+        return False
+    if record.get('Step Value', 1) <= 0:
+        return False
+    if low is not None and high is not None:
+        return low <= high and low <= valid_values[0] and (
+            valid_values[-1] <= high)
+    return True
+
+
+def resolve_numbers(record: Dict[str, Any], pending: List[str]) -> None:
+    """Assign the numbers of a table with valid values.
+
+    The columns of the valid values and of the other values are mixed, e.g.
+    0, 3, 1, 0, 1, 2, 3 or 0, 1, 2, 2, 1 for the labels Maximum Value, Step
+    Value and Valid Values: the first consistent split is kept."""
+    numbers = record.pop('numbers')
+    if not numbers:
+        return
+    scalars = [label for label in pending if label != 'Valid Values']
+    for positions in itertools.combinations(range(len(numbers)), len(scalars)):
+        candidate = dict(record)
+        candidate.update(
+            zip(scalars, (numbers[position] for position in positions)))
+        candidate['Valid Values'] = [
+            number for position, number in enumerate(numbers)
+            if position not in positions
+        ]
+        if consistent(candidate):
+            record.update(candidate)
+            return
+    logger.warning("Inconsistent values of %s: %s.", record['Name'], numbers)
+
+
+def split_references(record: Dict[str, Any]) -> None:
+    """Split the characteristics of a service into its required and optional.
+
+    The labels are either in the middle of their characteristics, e.g. one
+    name, the label, then two names, or before them, or both before all the
+    names when the table continues on the next page. The boundary between
+    the groups is the one the layout gives, the closest to the centers of
+    the labels if several do. Raises ValueError if the layout does not give
+    it and the table is not in split_overrides. Without labels, the
+    characteristics are required."""
+    names = record.pop('references', [])
+    positions = sorted(
+        record.pop('reference_labels', {}).items(), key=lambda item: item[1])
+    if len(positions) < 2:
+        label = positions[0][0] if positions else 'Required Characteristics'
+        record[label] = names
+        return
+    (first, first_position), (second, second_position) = positions
+    total = len(names)
+
+    def middle(position: int, start: int, stop: int) -> bool:
+        return position - start == (stop - start - 1) // 2
+
+    def distance(boundary: int) -> float:
+        return (abs(first_position - boundary / 2) +
+                abs(second_position - (boundary + total) / 2))
+
+    centered = [
+        boundary for boundary in range(1, total)
+        if middle(first_position, 0, boundary) and
+        middle(second_position, boundary, total)]
+    if record['Name'] in split_overrides:
+        boundary = split_overrides[record['Name']]
+    elif centered:
+        boundary = min(centered, key=distance)
+    elif first_position == 0 and 0 < second_position < total:
+        # Each label before its characteristics
+        boundary = second_position
+    elif first_position == second_position and total == 2:
+        # The labels, then one characteristic of each
+        boundary = 1
+    else:
+        raise ValueError("Can not split the characteristics of {}: {}".format(
+            record['Name'], names))
+    record[first] = names[:boundary]
+    record[second] = names[boundary:]
+
+
+def parse_permissions(value: str) -> Optional[int]:
+    properties = 0
+    for permission in value.split(','):
+        if permission.strip() not in permission_to_properties:
+            return None
+        properties |= permission_to_properties[permission.strip()]
+    return int(properties)
+
+
+def parse_records(text: str) -> List[Dict[str, Any]]:
+    """Parse the properties table of each section."""
+    records = []  # type: List[Dict[str, Any]]
+    record = {}  # type: Dict[str, Any]
+    pending = []  # type: List[str]
+
+    def finish() -> None:
+        if 'numbers' in record:
+            resolve_numbers(record, pending)
+        if 'references' in record or 'reference_labels' in record:
+            split_references(record)
+        if 'UUID' in record and 'Type' in record:
+            records.append(record)
+
+    for line in spec_lines(text):
+        heading = heading_re.match(line)
+        if heading:
+            finish()
+            record = {'Name': heading.group(2)}
+            pending = []
+        elif line in labels:
+            if line in ('Required Characteristics',
+                        'Optional Characteristics'):
+                # Number of characteristics before the label
+                record.setdefault('reference_labels', {})[line] = len(
+                    record.get('references', ()))
+            else:
+                pending.append(line)
+                if line == 'Valid Values':
+                    record['numbers'] = []
+        elif uuid_re.match(line) and 'UUID' in pending:
+            pending.remove('UUID')
+            record['UUID'] = line
+        elif type_re.match(line) and 'Type' in pending:
+            pending.remove('Type')
+            record['Type'] = line
+        elif page_ref_re.match(line) and 'Type' in record:
+            record.setdefault('references', []).append(
+                page_ref_re.match(line).group(1))
+        elif line in constants.format_name_to_code and 'Format' in pending:
+            pending.remove('Format')
+            record['Format'] = line
+        elif line in constants.unit_name_to_code and 'Unit' in pending:
+            pending.remove('Unit')
+            record['Unit'] = line
+        elif parse_permissions(line) is not None and 'Permissions' in pending:
+            pending.remove('Permissions')
+            record['Permissions'] = parse_permissions(line)
+        elif valid_value_re.match(line) and 'numbers' in record:
+            if '-' not in line:
+                record['numbers'].append(int(line))
+        elif number_re.match(line):
+            label = next((label for label in pending
+                          if label in numeric_labels), None)
+            if label is not None:
+                record[label] = to_number(line)
+                pending.remove(label)
+    finish()
+    return records
+
+
+def build_registry(text: str) -> Tuple[List[Tuple], List[Tuple]]:
+    """Rows of the characteristic and service types, sorted by UUID."""
+    characteristics = []  # type: List[Tuple]
+    services = []  # type: List[Tuple]
+    by_name = {}  # type: Dict[str, str]
+    records = parse_records(text)
+    for record in records:
+        kind, type_name = type_re.match(record['Type']).groups()
+        if kind == 'characteristic':
+            by_name[record['Name']] = record['UUID']
+            characteristics.append((
+                record['UUID'],
+                type_name,
+                record['Name'],
+                constants.format_name_to_code[record.get('Format', 'data')],
+                constants.unit_name_to_code.get(record.get('Unit')),
+                record.get('Permissions', 0),
+                record.get('Minimum Value'),
+                record.get('Maximum Value'),
+                record.get('Step Value'),
+                record.get('Maximum Length'),
+                tuple(record.get('Valid Values', ())),
+            ))
+
+    for record in records:
+        kind, type_name = type_re.match(record['Type']).groups()
+        if kind != 'service':
+            continue
+        service = [record['UUID'], type_name, record['Name']]
+        for label in ('Required Characteristics', 'Optional Characteristics'):
+            uuids = []
+            for name in record.get(label, ()):
+                name = characteristic_aliases.get(name, name)
+                if name not in by_name:
+                    raise ValueError("Unknown characteristic {} of {}".format(
+                        name, record['Name']))
+                uuids.append(by_name[name])
+            service.append(tuple(uuids))
+        services.append(tuple(service))
+    return sorted(characteristics), sorted(services)
+
+
+def render(characteristics: List[Tuple], services: List[Tuple]) -> str:
+    lines = [
+        '"""Apple-defined service and characteristic types.',
+        '',
+        'Generated from data/hap_spec.txt by tools/gen_hap_types.py, do not',
+        'edit. See pyhomekit.registry for lookups.',
+        '"""',
+        '# flake8: noqa',
+        '',
+        '# UUID, type, name, format code, unit code, properties, minimum value,',
+        '# maximum value, step value, maximum length, valid values',
+        'characteristics = (',
+    ]
+    for row in characteristics:
+        lines.append('    {!r},'.format(row))
+    lines += [
+        ')',
+        '',
+        '# UUID, type, name, required characteristics, optional characteristics',
+        'services = (',
+    ]
+    for row in services:
+        lines.append('    {!r},'.format(row))
+    lines += [')', '']
+    return '\n'.join(lines)
+
+
+def generate(path: str=spec_path) -> str:
+    """Return the source of the hap_types module."""
+    with open(path, encoding='utf-8') as spec_file:
+        return render(*build_registry(spec_file.read()))
+
+
+def main() -> None:
+    logging.basicConfig()
+    source = generate()
+    with open(output_path, 'w', encoding='utf-8') as output_file:
+        output_file.write(source)
+    print("Wrote", output_path, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()